@@ -0,0 +1,131 @@
+"""
+Access log estructurado y no bloqueante para el API Gateway de TaskNotes.
+
+El request solo arma un dict con los campos y lo encola (`QueueHandler` sin
+formateo previo); un `QueueListener` en un hilo aparte formatea (JSON o texto)
+y escribe a stdout. Si la cola se llena se descartan líneas en vez de frenar
+el event loop. Los bodies no se registran salvo que se habilite explícitamente.
+"""
+
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+ACCESS_LOGGER_NAME = "gateway.access"
+
+
+def _render_value(value: Any) -> Any:
+    # El decode del body ocurre aquí, en el hilo del listener
+    if isinstance(value, (bytes, bytearray)):
+        try:
+            return bytes(value).decode("utf-8")
+        except UnicodeDecodeError:
+            return "(non-text)"
+    return value
+
+
+def _fields(record: logging.LogRecord) -> Dict[str, Any]:
+    fields = record.msg if isinstance(record.msg, dict) else {"message": record.getMessage()}
+    out = {"ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat()}
+    for key, value in fields.items():
+        if value is not None:
+            out[key] = _render_value(value)
+    return out
+
+
+class JsonAccessFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        return json.dumps(_fields(record), ensure_ascii=False, default=str)
+
+
+class TextAccessFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        parts = []
+        for key, value in _fields(record).items():
+            text = str(value)
+            if " " in text or '"' in text:
+                text = json.dumps(text, ensure_ascii=False)
+            parts.append(f"{key}={text}")
+        return " ".join(parts)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler que no formatea en el hilo del request y descarta si la cola está llena"""
+
+    def __init__(self, log_queue: "queue.Queue"):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Los campos son primitivos; el formateo queda para el listener
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class AccessLogger:
+    def __init__(
+        self,
+        mode: str = "json",
+        sample_rate: float = 1.0,
+        log_bodies: bool = False,
+        max_body_bytes: int = 200,
+        queue_size: int = 10000,
+        stream=None,
+    ):
+        self.sample_rate = min(1.0, max(0.0, sample_rate))
+        self.log_bodies = log_bodies
+        self.max_body_bytes = max(0, max_body_bytes)
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max(1, queue_size))
+        self.handler = DroppingQueueHandler(self._queue)
+        output = logging.StreamHandler(stream or sys.stdout)
+        output.setFormatter(TextAccessFormatter() if mode == "text" else JsonAccessFormatter())
+        self._listener = logging.handlers.QueueListener(self._queue, output, respect_handler_level=False)
+        self._started = False
+        self.logger = logging.getLogger(ACCESS_LOGGER_NAME)
+        self.logger.setLevel(logging.INFO)
+        self.logger.propagate = False
+        self.logger.handlers = [self.handler]
+
+    @property
+    def dropped(self) -> int:
+        return self.handler.dropped
+
+    def start(self) -> None:
+        if not self._started:
+            self._listener.start()
+            self._started = True
+
+    def stop(self) -> None:
+        """Vacía la cola y detiene el hilo escritor"""
+        if self._started:
+            self._listener.stop()
+            self._started = False
+
+    def should_log(self, status_code: int) -> bool:
+        # Los errores de servidor se registran siempre, sin muestreo
+        return status_code >= 500 or self.sample_rate >= 1.0 or random.random() < self.sample_rate
+
+    def body_field(self, body: Optional[bytes]) -> Optional[bytes]:
+        """Fragmento del body (sin decodificar) solo si está habilitado; si no, redactado"""
+        if not body or not self.log_bodies:
+            return None
+        return body[: self.max_body_bytes]
+
+    def log(self, fields: Dict[str, Any], status_code: int) -> None:
+        if self.should_log(status_code):
+            self.logger.info(fields)
+
+
+def elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 2)
@@ -0,0 +1,146 @@
+"""
+Balanceo de carga de upstreams para el API Gateway de TaskNotes.
+
+Estrategias (`LoadBalancer.strategy`):
+- `round_robin`: rotación simple (comportamiento original).
+- `least_outstanding`: upstream con menos requests en curso.
+- `p2c`: power-of-two-choices; compara dos upstreams al azar usando la latencia
+  EWMA ponderada por requests en curso.
+
+Los upstreams que acumulan errores (5xx / fallos de conexión) se expulsan
+temporalmente (eyección pasiva) y se readmiten al vencer el plazo o cuando un
+health check activo responde OK.
+"""
+
+import asyncio
+import logging
+import random
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+STRATEGIES = ("round_robin", "least_outstanding", "p2c")
+
+
+class UpstreamState:
+    __slots__ = ("url", "outstanding", "ewma_latency", "consecutive_failures", "ejections", "ejected_until")
+
+    def __init__(self, url: str):
+        self.url = url
+        self.outstanding = 0
+        self.ewma_latency = 0.0
+        self.consecutive_failures = 0
+        self.ejections = 0
+        self.ejected_until = 0.0
+
+    def is_available(self, now: float) -> bool:
+        return now >= self.ejected_until
+
+    def cost(self) -> float:
+        # Upstreams sin mediciones aún compiten con costo mínimo
+        return (self.ewma_latency or 0.001) * (self.outstanding + 1)
+
+
+class LoadBalancer:
+    def __init__(
+        self,
+        service: str,
+        urls: List[str],
+        strategy: str = "p2c",
+        ewma_alpha: float = 0.3,
+        eject_after_failures: int = 5,
+        eject_seconds: float = 30.0,
+        max_eject_seconds: float = 300.0,
+    ):
+        if strategy not in STRATEGIES:
+            logger.warning(f"Estrategia de balanceo desconocida '{strategy}', usando round_robin")
+            strategy = "round_robin"
+        self.service = service
+        self.strategy = strategy
+        self.upstreams: List[UpstreamState] = [UpstreamState(u) for u in urls]
+        self._by_url: Dict[str, UpstreamState] = {u.url: u for u in self.upstreams}
+        self.ewma_alpha = min(1.0, max(0.01, ewma_alpha))
+        self.eject_after_failures = max(1, eject_after_failures)
+        self.eject_seconds = max(0.0, eject_seconds)
+        self.max_eject_seconds = max(self.eject_seconds, max_eject_seconds)
+        self._rr_idx = 0
+
+    def _candidates(self) -> List[UpstreamState]:
+        now = time.monotonic()
+        available = [u for u in self.upstreams if u.is_available(now)]
+        if available:
+            return available
+        # Todos expulsados: fail-open hacia el que se readmite antes
+        return [min(self.upstreams, key=lambda u: u.ejected_until)]
+
+    def choose(self) -> UpstreamState:
+        candidates = self._candidates()
+        if len(candidates) == 1:
+            chosen = candidates[0]
+        elif self.strategy == "least_outstanding":
+            chosen = min(candidates, key=lambda u: u.outstanding)
+        elif self.strategy == "p2c":
+            a, b = random.sample(candidates, 2)
+            chosen = a if a.cost() <= b.cost() else b
+        else:
+            chosen = candidates[self._rr_idx % len(candidates)]
+            self._rr_idx = (self._rr_idx + 1) % len(candidates)
+        return chosen
+
+    def acquire(self) -> str:
+        upstream = self.choose()
+        upstream.outstanding += 1
+        return upstream.url
+
+    def release(self, url: str) -> None:
+        upstream = self._by_url.get(url)
+        if upstream is not None and upstream.outstanding > 0:
+            upstream.outstanding -= 1
+
+    def observe(self, url: str, latency: Optional[float], ok: bool) -> None:
+        """Registrar resultado de un request (latencia hasta headers y éxito)"""
+        upstream = self._by_url.get(url)
+        if upstream is None:
+            return
+        if latency is not None:
+            if upstream.ewma_latency == 0.0:
+                upstream.ewma_latency = latency
+            else:
+                upstream.ewma_latency += self.ewma_alpha * (latency - upstream.ewma_latency)
+        if ok:
+            upstream.consecutive_failures = 0
+            upstream.ejections = 0
+            return
+        upstream.consecutive_failures += 1
+        if upstream.consecutive_failures >= self.eject_after_failures and upstream.is_available(time.monotonic()):
+            self.eject(upstream)
+
+    def eject(self, upstream: UpstreamState) -> None:
+        upstream.ejections += 1
+        # Backoff exponencial en expulsiones repetidas
+        duration = min(self.max_eject_seconds, self.eject_seconds * (2 ** (upstream.ejections - 1)))
+        upstream.ejected_until = time.monotonic() + duration
+        upstream.consecutive_failures = 0
+        logger.warning(f"Upstream {upstream.url} ({self.service}) expulsado por {duration:.0f}s")
+
+    def readmit(self, upstream: UpstreamState) -> None:
+        if upstream.ejected_until:
+            logger.info(f"Upstream {upstream.url} ({self.service}) readmitido")
+        upstream.ejected_until = 0.0
+        upstream.consecutive_failures = 0
+
+    async def run_health_checks(self, probe: Callable[[str], Awaitable[bool]], interval: float) -> None:
+        """Health checks activos: expulsa al fallar y readmite al recuperarse"""
+        while True:
+            for upstream in self.upstreams:
+                try:
+                    healthy = await probe(upstream.url)
+                except Exception:
+                    healthy = False
+                if healthy:
+                    if not upstream.is_available(time.monotonic()):
+                        self.readmit(upstream)
+                elif upstream.is_available(time.monotonic()):
+                    self.eject(upstream)
+            await asyncio.sleep(interval)
@@ -0,0 +1,143 @@
+"""
+Protección ante upstreams degradados para el API Gateway de TaskNotes.
+
+- `CircuitBreaker`: por servicio, con estados closed / open / half_open. Abre
+  cuando la tasa de error en la ventana móvil supera el umbral (con un mínimo
+  de requests), rechaza rápido mientras está abierto y deja pasar unas pocas
+  pruebas en half_open antes de volver a cerrar.
+- `RetryBudget`: presupuesto global de reintentos/hedging proporcional al
+  tráfico real, para que los reintentos no amplifiquen una caída.
+"""
+
+import time
+from collections import deque
+from typing import Deque, List
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        service: str,
+        window_seconds: int = 10,
+        min_requests: int = 20,
+        error_rate_threshold: float = 0.5,
+        open_seconds: float = 15.0,
+        half_open_max_calls: int = 3,
+    ):
+        self.service = service
+        self.window_seconds = max(1, window_seconds)
+        self.min_requests = max(1, min_requests)
+        self.error_rate_threshold = min(1.0, max(0.0, error_rate_threshold))
+        self.open_seconds = max(0.0, open_seconds)
+        self.half_open_max_calls = max(1, half_open_max_calls)
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self._half_open_calls = 0
+        self._half_open_successes = 0
+        # Buckets de 1s: [segundo, total, errores]
+        self._buckets: Deque[List[int]] = deque()
+
+    def _prune(self, now_second: int) -> None:
+        while self._buckets and self._buckets[0][0] <= now_second - self.window_seconds:
+            self._buckets.popleft()
+
+    def _counts(self) -> tuple:
+        total = failures = 0
+        for _, t, f in self._buckets:
+            total += t
+            failures += f
+        return total, failures
+
+    def current_state(self) -> str:
+        if self.state == OPEN and time.monotonic() - self.opened_at >= self.open_seconds:
+            self.state = HALF_OPEN
+            self.opened_at = time.monotonic()
+            self._half_open_calls = 0
+            self._half_open_successes = 0
+        return self.state
+
+    def retry_after(self) -> int:
+        return max(1, int(self.open_seconds - (time.monotonic() - self.opened_at)) + 1)
+
+    def allow(self) -> bool:
+        state = self.current_state()
+        if state == CLOSED:
+            return True
+        if state == HALF_OPEN:
+            # Pruebas que nunca reportaron resultado (p.ej. canceladas) no bloquean para siempre
+            if self._half_open_calls >= self.half_open_max_calls and time.monotonic() - self.opened_at >= self.open_seconds:
+                self._half_open_calls = 0
+                self.opened_at = time.monotonic()
+            if self._half_open_calls < self.half_open_max_calls:
+                self._half_open_calls += 1
+                return True
+        return False
+
+    def record(self, ok: bool) -> None:
+        state = self.current_state()
+        if state == HALF_OPEN:
+            if not ok:
+                self._open()
+                return
+            self._half_open_successes += 1
+            if self._half_open_successes >= self.half_open_max_calls:
+                self._close()
+            return
+        if state == OPEN:
+            return
+        now_second = int(time.monotonic())
+        self._prune(now_second)
+        if not self._buckets or self._buckets[-1][0] != now_second:
+            self._buckets.append([now_second, 0, 0])
+        bucket = self._buckets[-1]
+        bucket[1] += 1
+        if not ok:
+            bucket[2] += 1
+            total, failures = self._counts()
+            if total >= self.min_requests and failures / total >= self.error_rate_threshold:
+                self._open()
+
+    def _open(self) -> None:
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self._buckets.clear()
+
+    def _close(self) -> None:
+        self.state = CLOSED
+        self._buckets.clear()
+
+
+class RetryBudget:
+    def __init__(self, ratio: float = 0.1, min_retries_per_second: float = 5.0, window_seconds: int = 10):
+        self.ratio = max(0.0, ratio)
+        self.min_retries_per_second = max(0.0, min_retries_per_second)
+        self.window_seconds = max(1, window_seconds)
+        # Buckets de 1s: [segundo, requests, reintentos]
+        self._buckets: Deque[List[int]] = deque()
+
+    def _current(self) -> List[int]:
+        now_second = int(time.monotonic())
+        while self._buckets and self._buckets[0][0] <= now_second - self.window_seconds:
+            self._buckets.popleft()
+        if not self._buckets or self._buckets[-1][0] != now_second:
+            self._buckets.append([now_second, 0, 0])
+        return self._buckets[-1]
+
+    def record_request(self) -> None:
+        self._current()[1] += 1
+
+    def try_withdraw(self) -> bool:
+        bucket = self._current()
+        requests = sum(b[1] for b in self._buckets)
+        retries = sum(b[2] for b in self._buckets)
+        allowed = self.min_retries_per_second * self.window_seconds + self.ratio * requests
+        if retries + 1 > allowed:
+            return False
+        bucket[2] += 1
+        return True
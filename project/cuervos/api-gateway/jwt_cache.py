@@ -0,0 +1,149 @@
+"""
+Cachés de autenticación para el API Gateway de TaskNotes.
+
+- `JWKSStore`: mantiene el JWKS del auth-service con TTL, refresco ante `kid`
+  desconocido y un único fetch en vuelo (single-flight). Las claves se guardan
+  ya construidas (objetos `jose.jwk`) indexadas por `kid`.
+- `VerifiedTokenCache`: LRU acotado de hash(token) -> claims ya verificados,
+  válido solo hasta el `exp` del token.
+"""
+
+import asyncio
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+from jose import jwk
+
+logger = logging.getLogger(__name__)
+
+
+class JWKSStore:
+    def __init__(self, url: str, ttl_seconds: float = 300.0, min_refresh_interval: float = 10.0, timeout: float = 5.0):
+        self.url = url
+        self.ttl = max(1.0, ttl_seconds)
+        # Evita martillar al auth-service con tokens de `kid` inexistente
+        self.min_refresh_interval = max(0.0, min_refresh_interval)
+        self.timeout = timeout
+        self.raw_keys: List[dict] = []
+        self._keys: Dict[str, Any] = {}
+        self._fetched_at = 0.0
+        self._last_attempt = 0.0
+        self._inflight: Optional[asyncio.Task] = None
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def has_keys(self) -> bool:
+        return bool(self._keys)
+
+    def _is_stale(self) -> bool:
+        return (time.monotonic() - self._fetched_at) > self.ttl
+
+    def _can_attempt(self) -> bool:
+        return (time.monotonic() - self._last_attempt) >= self.min_refresh_interval
+
+    async def _await_inflight(self) -> None:
+        """Quien llega durante un fetch espera ese mismo fetch en vez de seguir sin claves"""
+        inflight = self._inflight
+        if inflight is not None and not inflight.done():
+            await asyncio.shield(inflight)
+
+    async def get_key(self, kid: Optional[str]) -> Optional[Any]:
+        """Devuelve la clave construida para `kid`, refrescando si está vencida o no existe"""
+        await self._await_inflight()
+        if self._is_stale() and self._can_attempt():
+            await self.refresh()
+        key = self._keys.get(kid)
+        if key is None and self._can_attempt():
+            # Posible rotación de claves: refrescar una vez
+            await self.refresh()
+            key = self._keys.get(kid)
+        return key
+
+    async def get_jwks(self) -> List[dict]:
+        await self._await_inflight()
+        if self._is_stale() and self._can_attempt():
+            await self.refresh()
+        return self.raw_keys
+
+    def start_refresh(self) -> asyncio.Future:
+        """Lanza el fetch sin esperarlo (o devuelve el que ya está en vuelo)"""
+        if self._inflight is None or self._inflight.done():
+            self._inflight = asyncio.ensure_future(self._fetch())
+        return self._inflight
+
+    async def refresh(self) -> None:
+        """Single-flight: requests concurrentes esperan el mismo fetch"""
+        await asyncio.shield(self.start_refresh())
+
+    async def _fetch(self) -> None:
+        self._last_attempt = time.monotonic()
+        try:
+            if self._client is None or self._client.is_closed:
+                self._client = httpx.AsyncClient(timeout=self.timeout)
+            response = await self._client.get(self.url)
+            if response.status_code != 200:
+                logger.warning(f"JWKS respondió {response.status_code}")
+                return
+            raw_keys = response.json().get("keys", [])
+            keys: Dict[str, Any] = {}
+            for key in raw_keys:
+                try:
+                    keys[key.get("kid")] = jwk.construct(key, key.get("alg") or "RS256")
+                except Exception as e:
+                    logger.warning(f"Clave JWKS inválida (kid={key.get('kid')}): {e}")
+            self.raw_keys = raw_keys
+            self._keys = keys
+            self._fetched_at = time.monotonic()
+        except Exception as e:
+            # Se conservan las claves previas; se reintenta tras min_refresh_interval
+            logger.warning(f"Error obteniendo JWKS: {e}")
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class VerifiedTokenCache:
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max(0, max_entries)
+        self._entries: "OrderedDict[bytes, Tuple[dict, float]]" = OrderedDict()
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode("utf-8")).digest()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, token: str) -> Optional[dict]:
+        if not self.max_entries:
+            return None
+        key = self._key(token)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        claims, exp = entry
+        if time.time() >= exp:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return claims
+
+    def put(self, token: str, claims: dict) -> None:
+        if not self.max_entries:
+            return
+        exp = claims.get("exp")
+        if exp is None:
+            return
+        key = self._key(token)
+        self._entries[key] = (claims, float(exp))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
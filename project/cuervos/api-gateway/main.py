@@ -5,12 +5,29 @@ import httpx
 import os
 from typing import Optional, List, Dict
 import logging
-from jose import jwt, JWTError, jwk
+from jose import jwt, JWTError
 import json
+import base64
 import socketio
 from sio_server import sio, socket_app
-from fastapi.responses import Response
-from prometheus_client import Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST
+from jwt_cache import JWKSStore, VerifiedTokenCache
+from ratelimit import MemoryRateLimitStore, RedisRateLimitStore, parse_overrides
+from balancer import LoadBalancer
+from breaker import CircuitBreaker, RetryBudget, STATE_VALUES
+from singleflight import SingleFlight
+from access_log import AccessLogger, elapsed_ms
+from response_cache import (
+    CachedResponse,
+    INVALIDATION_MAP,
+    SERVICE_ENTITIES,
+    ResponseCache,
+    etag_matches,
+    make_etag,
+    run_invalidation_consumer,
+)
+from fastapi.responses import Response, StreamingResponse
+from starlette.background import BackgroundTask
+from prometheus_client import Counter, Gauge, Histogram, generate_latest, CONTENT_TYPE_LATEST
 import time
 import asyncio
 from collections import defaultdict
@@ -27,6 +44,25 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Access log estructurado y no bloqueante (cola + hilo escritor). Bodies redactados por defecto.
+ACCESS_LOG_ENABLED = os.getenv("ACCESS_LOG_ENABLED", "true").lower() == "true"
+ACCESS_LOG = AccessLogger(
+    mode=os.getenv("ACCESS_LOG_FORMAT", "json").lower(),
+    sample_rate=float(os.getenv("ACCESS_LOG_SAMPLE_RATE", "1.0")),
+    log_bodies=os.getenv("ACCESS_LOG_BODIES", "false").lower() == "true",
+    max_body_bytes=int(os.getenv("ACCESS_LOG_MAX_BODY_BYTES", "200")),
+    queue_size=int(os.getenv("ACCESS_LOG_QUEUE_SIZE", "10000")),
+)
+
+@app.on_event("startup")
+async def start_access_log():
+    if ACCESS_LOG_ENABLED:
+        ACCESS_LOG.start()
+
+@app.on_event("shutdown")
+async def stop_access_log():
+    ACCESS_LOG.stop()
+
 # Configurar CORS
 app.add_middleware(
     CORSMiddleware,
@@ -60,6 +96,10 @@ REQUEST_LATENCY = Histogram(
 )
 
 # MÃ©tricas de rate limiting
+ACCESS_LOG_DROPPED = Gauge(
+    "gateway_access_log_dropped",
+    "Líneas de access log descartadas por cola llena desde el arranque",
+)
 RATE_LIMIT_ALLOWED = Counter(
     "gateway_rate_limit_allowed_total",
     "Requests permitidas por el rate limiter",
@@ -81,27 +121,55 @@ DEFAULT_LIMITS = {
     "DELETE": int(os.getenv("RATE_LIMIT_DELETE_PER_WINDOW", "20")),
 }
 
-class TokenBucket:
-    def __init__(self, capacity: int, window_seconds: int):
-        self.capacity = max(1, capacity)
-        self.window = max(1, window_seconds)
-        self.tokens = float(self.capacity)
-        self.refill_rate = float(self.capacity) / float(self.window)
-        self.last = time.perf_counter()
-
-    def consume(self, amount: float = 1.0) -> bool:
-        now = time.perf_counter()
-        elapsed = now - self.last
-        # Refill por tiempo transcurrido
-        self.tokens = min(self.capacity, self.tokens + elapsed * self.refill_rate)
-        self.last = now
-        if self.tokens >= amount:
-            self.tokens -= amount
-            return True
-        return False
-
-# Buckets en memoria: por endpoint/mÃ©todo y por clave (usuario o IP)
-BUCKETS: Dict[str, Dict[str, Dict[str, TokenBucket]]] = defaultdict(lambda: defaultdict(dict))
+# Overrides por ruta: RATE_LIMIT_OVERRIDES="search:POST=200,tags=500"
+RATE_LIMIT_OVERRIDES = parse_overrides(os.getenv("RATE_LIMIT_OVERRIDES", ""))
+RATE_LIMIT_MAX_ENTRIES = int(os.getenv("RATE_LIMIT_MAX_ENTRIES", "100000"))
+RATE_LIMIT_IDLE_SECONDS = float(os.getenv("RATE_LIMIT_IDLE_SECONDS", str(max(2 * RATE_LIMIT_WINDOW_SECONDS, 60))))
+RATE_LIMIT_SHARDS = int(os.getenv("RATE_LIMIT_SHARDS", "16"))
+# memory (por réplica) o redis (compartido entre réplicas detrás de nginx-lb)
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory").lower()
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL", "redis://redis:6379/0")
+
+RATE_LIMIT_ENTRIES = Gauge(
+    "gateway_rate_limit_entries",
+    "Buckets de rate limiting en memoria",
+)
+RATE_LIMIT_EVICTIONS = Gauge(
+    "gateway_rate_limit_evictions",
+    "Buckets desalojados (inactivos o por límite de entradas) desde el arranque",
+)
+
+RATE_LIMIT_FALLBACKS = Gauge(
+    "gateway_rate_limit_fallbacks",
+    "Consultas de rate limit resueltas en memoria por fallo de Redis desde el arranque",
+)
+RATE_LIMIT_DEGRADED = Gauge(
+    "gateway_rate_limit_degraded",
+    "1 si el rate limit compartido (Redis) está caído y se usa memoria local",
+)
+
+def build_rate_limit_store():
+    memory_store = MemoryRateLimitStore(
+        max_entries=RATE_LIMIT_MAX_ENTRIES,
+        idle_seconds=RATE_LIMIT_IDLE_SECONDS,
+        shards=RATE_LIMIT_SHARDS,
+    )
+    if RATE_LIMIT_BACKEND == "redis":
+        try:
+            return RedisRateLimitStore.from_url(RATE_LIMIT_REDIS_URL, fallback=memory_store)
+        except ImportError:
+            logger.warning("RATE_LIMIT_BACKEND=redis sin paquete 'redis'; usando memoria local")
+    return memory_store
+
+RATE_LIMIT_STORE = build_rate_limit_store()
+
+def get_rate_limit_capacity(endpoint: str, method: str) -> int:
+    override = RATE_LIMIT_OVERRIDES.get((endpoint, method))
+    if override is None:
+        override = RATE_LIMIT_OVERRIDES.get((endpoint, "*"))
+    if override is not None:
+        return override
+    return DEFAULT_LIMITS.get(method, DEFAULT_LIMITS["GET"])
 
 def get_endpoint_label(path: str) -> str:
     return path.split("/")[1] if path and path != "/" and len(path.split("/")) > 1 else "root"
@@ -114,31 +182,19 @@ async def rate_limit_middleware(request: Request, call_next):
     # Derivar clave: usuario si hay token, si no IP
     key_type = "ip"
     key_value = request.client.host if request.client else "unknown"
-    auth_header = request.headers.get("authorization") or request.headers.get("Authorization")
-    if auth_header and auth_header.lower().startswith("bearer "):
-        token = auth_header.split(" ", 1)[1].strip()
-        try:
-            # No verifica firma; solo para obtener 'sub' y diferenciar por usuario
-            unverified_claims = jwt.get_unverified_claims(token)
-            sub = unverified_claims.get("sub")
-            if sub:
-                key_type = "user"
-                key_value = str(sub)
-        except Exception:
-            # Si el token es invÃ¡lido, mantener por IP
-            pass
+    # No verifica firma; solo usa 'sub' del contexto ya parseado para diferenciar por usuario
+    # (si el token es invÃ¡lido, se mantiene por IP)
+    claims = get_auth_context(request).claims
+    sub = claims.get("sub") if claims else None
+    if sub:
+        key_type = "user"
+        key_value = str(sub)
 
     # Obtener lÃ­mites
-    capacity = DEFAULT_LIMITS.get(method, DEFAULT_LIMITS["GET"])
-
-    # Construir/obtener bucket
-    bucket_key = f"{key_type}:{key_value}"
-    bucket = BUCKETS[endpoint][method].get(bucket_key)
-    if bucket is None:
-        bucket = TokenBucket(capacity=capacity, window_seconds=RATE_LIMIT_WINDOW_SECONDS)
-        BUCKETS[endpoint][method][bucket_key] = bucket
+    capacity = get_rate_limit_capacity(endpoint, method)
 
-    if bucket.consume(1.0):
+    bucket_key = f"{endpoint}:{method}:{key_type}:{key_value}"
+    if await RATE_LIMIT_STORE.consume(bucket_key, capacity, RATE_LIMIT_WINDOW_SECONDS):
         RATE_LIMIT_ALLOWED.labels(endpoint=endpoint, method=method, key_type=key_type).inc()
         # Continuar
         return await call_next(request)
@@ -169,7 +225,7 @@ async def metrics_middleware(request: Request, call_next):
         pass
     return response
 
-# Upstreams por servicio (round-robin simple). Lee *_SERVICE_UPSTREAMS como lista CSV.
+# Upstreams por servicio. Lee *_SERVICE_UPSTREAMS como lista CSV.
 def parse_upstreams(env_name: str, default_url: str) -> List[str]:
     raw = os.getenv(env_name, "")
     items = [u.strip() for u in raw.split(",") if u.strip()]
@@ -180,19 +236,185 @@ SERVICE_POOLS: Dict[str, List[str]] = {
     for name, url in SERVICES.items()
 }
 
-# Ãndices y locks para selecciÃ³n concurrente
-ROUND_ROBIN_IDX: Dict[str, int] = {name: 0 for name in SERVICE_POOLS.keys()}
-RR_LOCKS: Dict[str, asyncio.Lock] = {name: asyncio.Lock() for name in SERVICE_POOLS.keys()}
+# Balanceo por servicio: round_robin | least_outstanding | p2c (EWMA), con eyección pasiva
+LB_STRATEGY = os.getenv("LB_STRATEGY", "p2c").lower()
+LB_EWMA_ALPHA = float(os.getenv("LB_EWMA_ALPHA", "0.3"))
+LB_EJECT_CONSECUTIVE_FAILURES = int(os.getenv("LB_EJECT_CONSECUTIVE_FAILURES", "5"))
+LB_EJECT_SECONDS = float(os.getenv("LB_EJECT_SECONDS", "30"))
+LB_MAX_EJECT_SECONDS = float(os.getenv("LB_MAX_EJECT_SECONDS", "300"))
+# Health checks activos (0 = deshabilitados)
+LB_HEALTH_CHECK_INTERVAL_SECONDS = float(os.getenv("LB_HEALTH_CHECK_INTERVAL_SECONDS", "0"))
+LB_HEALTH_CHECK_PATH = os.getenv("LB_HEALTH_CHECK_PATH", "/healthz")
+LB_HEALTH_CHECK_TIMEOUT_SECONDS = float(os.getenv("LB_HEALTH_CHECK_TIMEOUT_SECONDS", "2"))
+
+BALANCERS: Dict[str, LoadBalancer] = {
+    name: LoadBalancer(
+        name,
+        pool,
+        strategy=LB_STRATEGY,
+        ewma_alpha=LB_EWMA_ALPHA,
+        eject_after_failures=LB_EJECT_CONSECUTIVE_FAILURES,
+        eject_seconds=LB_EJECT_SECONDS,
+        max_eject_seconds=LB_MAX_EJECT_SECONDS,
+    )
+    for name, pool in SERVICE_POOLS.items()
+}
+HEALTH_CHECK_TASKS: List[asyncio.Task] = []
+
+UPSTREAM_EWMA_LATENCY = Gauge(
+    "gateway_upstream_ewma_latency_seconds",
+    "Latencia EWMA (hasta headers) por upstream",
+    ["service", "upstream"],
+)
+UPSTREAM_EJECTED = Gauge(
+    "gateway_upstream_ejected",
+    "1 si el upstream está expulsado del balanceo",
+    ["service", "upstream"],
+)
 
 async def choose_upstream(service_name: str) -> str:
-    pool = SERVICE_POOLS.get(service_name)
-    if not pool:
+    """Elige upstream y lo marca en curso; liberar siempre con release_upstream"""
+    balancer = BALANCERS.get(service_name)
+    if balancer is None:
         raise HTTPException(status_code=404, detail=f"Servicio {service_name} no encontrado")
-    async with RR_LOCKS[service_name]:
-        idx = ROUND_ROBIN_IDX[service_name]
-        target = pool[idx % len(pool)]
-        ROUND_ROBIN_IDX[service_name] = (idx + 1) % len(pool)
-        return target
+    base_url = balancer.acquire()
+    UPSTREAM_INFLIGHT.labels(service=service_name, upstream=base_url).inc()
+    return base_url
+
+def observe_upstream(service_name: str, base_url: str, latency: Optional[float], ok: bool):
+    balancer = BALANCERS.get(service_name)
+    if balancer is not None:
+        balancer.observe(base_url, latency, ok)
+
+def release_upstream(service_name: str, base_url: str):
+    balancer = BALANCERS.get(service_name)
+    if balancer is not None:
+        balancer.release(base_url)
+    UPSTREAM_INFLIGHT.labels(service=service_name, upstream=base_url).dec()
+
+def update_balancer_metrics():
+    now = time.monotonic()
+    for service_name, balancer in BALANCERS.items():
+        for upstream in balancer.upstreams:
+            UPSTREAM_EWMA_LATENCY.labels(service=service_name, upstream=upstream.url).set(upstream.ewma_latency)
+            UPSTREAM_EJECTED.labels(service=service_name, upstream=upstream.url).set(0 if upstream.is_available(now) else 1)
+
+# Pool de clientes HTTP por upstream (keep-alive y HTTP/2 cuando el upstream lo negocia vía ALPN).
+# Se crean en el startup y se cierran en el shutdown; evita abrir TCP/TLS en cada request.
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+UPSTREAM_HTTP2 = os.getenv("UPSTREAM_HTTP2", "true").lower() == "true" and HTTP2_AVAILABLE
+UPSTREAM_MAX_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "100"))
+UPSTREAM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_KEEPALIVE_CONNECTIONS", "20"))
+UPSTREAM_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("UPSTREAM_KEEPALIVE_EXPIRY_SECONDS", "30"))
+UPSTREAM_TIMEOUT_SECONDS = float(os.getenv("UPSTREAM_TIMEOUT_SECONDS", "30"))
+
+# Máximo de conexiones por servicio: *_SERVICE_MAX_CONNECTIONS (p.ej. TASKS_SERVICE_MAX_CONNECTIONS)
+SERVICE_MAX_CONNECTIONS: Dict[str, int] = {
+    name: int(os.getenv(f"{name.upper()}_SERVICE_MAX_CONNECTIONS", str(UPSTREAM_MAX_CONNECTIONS)))
+    for name in SERVICE_POOLS.keys()
+}
+
+# Clientes por (servicio, upstream)
+UPSTREAM_CLIENTS: Dict[str, Dict[str, httpx.AsyncClient]] = defaultdict(dict)
+
+UPSTREAM_POOL_CONNECTIONS = Gauge(
+    "gateway_upstream_pool_connections",
+    "Conexiones abiertas en el pool por upstream",
+    ["service", "upstream", "state"],
+)
+UPSTREAM_POOL_MAX_CONNECTIONS = Gauge(
+    "gateway_upstream_pool_max_connections",
+    "Máximo de conexiones configurado por upstream",
+    ["service", "upstream"],
+)
+UPSTREAM_INFLIGHT = Gauge(
+    "gateway_upstream_inflight_requests",
+    "Requests en curso hacia cada upstream",
+    ["service", "upstream"],
+)
+
+def build_upstream_client(service_name: str) -> httpx.AsyncClient:
+    max_connections = max(1, SERVICE_MAX_CONNECTIONS.get(service_name, UPSTREAM_MAX_CONNECTIONS))
+    limits = httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=min(max_connections, UPSTREAM_MAX_KEEPALIVE_CONNECTIONS),
+        keepalive_expiry=UPSTREAM_KEEPALIVE_EXPIRY_SECONDS,
+    )
+    return httpx.AsyncClient(
+        http2=UPSTREAM_HTTP2,
+        limits=limits,
+        timeout=UPSTREAM_TIMEOUT_SECONDS,
+    )
+
+def get_upstream_client(service_name: str, base_url: str) -> httpx.AsyncClient:
+    """Devuelve el cliente compartido del upstream (lo crea si no existe)"""
+    client = UPSTREAM_CLIENTS[service_name].get(base_url)
+    if client is None or client.is_closed:
+        client = build_upstream_client(service_name)
+        UPSTREAM_CLIENTS[service_name][base_url] = client
+        UPSTREAM_POOL_MAX_CONNECTIONS.labels(service=service_name, upstream=base_url).set(
+            SERVICE_MAX_CONNECTIONS.get(service_name, UPSTREAM_MAX_CONNECTIONS)
+        )
+    return client
+
+def update_pool_metrics():
+    """Actualizar gauges de ocupación del pool (se llama al exponer /metrics)"""
+    for service_name, clients in UPSTREAM_CLIENTS.items():
+        for base_url, client in clients.items():
+            active = idle = 0
+            try:
+                # httpx no expone el pool públicamente; httpcore sí expone sus conexiones
+                pool = getattr(client._transport, "_pool", None)
+                for conn in getattr(pool, "connections", []):
+                    if conn.is_idle():
+                        idle += 1
+                    else:
+                        active += 1
+            except Exception:
+                pass
+            UPSTREAM_POOL_CONNECTIONS.labels(service=service_name, upstream=base_url, state="active").set(active)
+            UPSTREAM_POOL_CONNECTIONS.labels(service=service_name, upstream=base_url, state="idle").set(idle)
+
+@app.on_event("startup")
+async def open_upstream_clients():
+    for service_name, pool in SERVICE_POOLS.items():
+        for base_url in pool:
+            get_upstream_client(service_name, base_url)
+    logger.info(f"Pools de upstream inicializados (http2={UPSTREAM_HTTP2})")
+
+async def probe_upstream(service_name: str, base_url: str) -> bool:
+    client = get_upstream_client(service_name, base_url)
+    response = await client.get(f"{base_url}{LB_HEALTH_CHECK_PATH}", timeout=LB_HEALTH_CHECK_TIMEOUT_SECONDS)
+    return 200 <= response.status_code < 400
+
+@app.on_event("startup")
+async def start_health_checks():
+    if LB_HEALTH_CHECK_INTERVAL_SECONDS <= 0:
+        return
+    for service_name, balancer in BALANCERS.items():
+        probe = lambda url, name=service_name: probe_upstream(name, url)
+        HEALTH_CHECK_TASKS.append(asyncio.create_task(balancer.run_health_checks(probe, LB_HEALTH_CHECK_INTERVAL_SECONDS)))
+
+@app.on_event("shutdown")
+async def stop_health_checks():
+    for task in HEALTH_CHECK_TASKS:
+        task.cancel()
+    HEALTH_CHECK_TASKS.clear()
+
+@app.on_event("shutdown")
+async def close_upstream_clients():
+    for clients in UPSTREAM_CLIENTS.values():
+        for client in clients.values():
+            try:
+                await client.aclose()
+            except Exception:
+                pass
+    UPSTREAM_CLIENTS.clear()
 
 # ConfiguraciÃ³n JWT
 JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
@@ -208,53 +430,114 @@ SKIP_JWT_SIGNATURE_VERIFY = os.getenv("SKIP_JWT_SIGNATURE_VERIFY", "false").lowe
 
 security = HTTPBearer(auto_error=False)
 
-# Cache para JWKS
-jwks_cache = {"keys": [], "last_updated": 0}
+class AuthContext:
+    """Token bearer parseado una sola vez por request (header/claims sin verificar + claims verificados)"""
+    __slots__ = ("token", "header", "claims", "verified_claims", "_scopes")
+
+    def __init__(self, token: Optional[str] = None, header: Optional[dict] = None, claims: Optional[dict] = None):
+        self.token = token
+        self.header = header
+        self.claims = claims
+        self.verified_claims: Optional[dict] = None
+        self._scopes: Optional[set] = None
+
+    @property
+    def scopes(self) -> set:
+        if self._scopes is None:
+            self._scopes = set(extract_scopes(self.verified_claims or {}))
+        return self._scopes
 
-async def get_jwks():
-    """Obtener JWKS del auth-service"""
+def _b64url_json(segment: str) -> Optional[dict]:
+    decoded = json.loads(base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4)))
+    return decoded if isinstance(decoded, dict) else None
+
+def parse_auth_context(request: Request) -> AuthContext:
+    auth_header = request.headers.get("authorization")
+    if not auth_header or not auth_header.lower().startswith("bearer "):
+        return AuthContext()
+    token = auth_header.split(" ", 1)[1].strip()
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(JWKS_URL, timeout=5.0)
-            if response.status_code == 200:
-                jwks_data = response.json()
-                jwks_cache["keys"] = jwks_data.get("keys", [])
-                return jwks_cache["keys"]
-    except Exception as e:
-        logger.warning(f"Error obteniendo JWKS: {e}")
-    return jwks_cache["keys"]
+        header_segment, claims_segment, _ = token.split(".", 2)
+        return AuthContext(token, _b64url_json(header_segment), _b64url_json(claims_segment))
+    except Exception:
+        # Token malformado: verify_token lo rechazará con el error de jose
+        return AuthContext(token)
+
+def get_auth_context(request: Request) -> AuthContext:
+    auth = getattr(request.state, "auth", None)
+    if auth is None:
+        auth = parse_auth_context(request)
+        request.state.auth = auth
+    return auth
+
+@app.middleware("http")
+async def auth_context_middleware(request: Request, call_next):
+    # Se parsea antes del rate limiting; verify_token y enforce_policies reutilizan el contexto
+    request.state.auth = parse_auth_context(request)
+    return await call_next(request)
+
+# JWKS con TTL/refresco por `kid` y caché de tokens ya verificados
+JWKS_TTL_SECONDS = float(os.getenv("JWKS_TTL_SECONDS", "300"))
+JWKS_MIN_REFRESH_SECONDS = float(os.getenv("JWKS_MIN_REFRESH_SECONDS", "10"))
+JWT_VERIFIED_CACHE_SIZE = int(os.getenv("JWT_VERIFIED_CACHE_SIZE", "10000"))
+
+JWKS_STORE = JWKSStore(JWKS_URL, ttl_seconds=JWKS_TTL_SECONDS, min_refresh_interval=JWKS_MIN_REFRESH_SECONDS)
+VERIFIED_TOKENS = VerifiedTokenCache(max_entries=JWT_VERIFIED_CACHE_SIZE)
+
+JWT_CACHE_LOOKUPS = Counter(
+    "gateway_jwt_cache_lookups_total",
+    "Consultas a la caché de tokens verificados",
+    ["result"],
+)
+
+@app.on_event("startup")
+async def warm_jwks_store():
+    """Precarga el JWKS en segundo plano; las primeras requests esperan ese mismo fetch"""
+    JWKS_STORE.start_refresh()
+
+@app.on_event("shutdown")
+async def close_jwks_store():
+    await JWKS_STORE.aclose()
+
+@app.on_event("shutdown")
+async def close_rate_limit_store():
+    await RATE_LIMIT_STORE.aclose()
 
-async def verify_token(credentials: Optional[HTTPAuthorizationCredentials] = Depends(security)):
+async def verify_token(request: Request, credentials: Optional[HTTPAuthorizationCredentials] = Depends(security)):
     """Verificar token JWT"""
     if not credentials:
         return None
     
     token = credentials.credentials
-    
+    auth = get_auth_context(request)
+    if auth.token != token:
+        auth = AuthContext(token)
+    if auth.verified_claims is not None:
+        return auth.verified_claims
+
+    cached = VERIFIED_TOKENS.get(token)
+    if cached is not None:
+        JWT_CACHE_LOOKUPS.labels(result="hit").inc()
+        auth.verified_claims = dict(cached)
+        return auth.verified_claims
+    JWT_CACHE_LOOKUPS.labels(result="miss").inc()
+
     try:
-        # Si es RS256, obtener JWKS
+        # Si es RS256, usar la clave ya construida del JWKS (cacheada por kid)
         if JWT_ALGORITHM == "RS256":
-            jwks_keys = await get_jwks()
-            if not jwks_keys:
-                raise HTTPException(status_code=401, detail="No se pudo obtener JWKS")
-            
-            # Decodificar header para obtener kid
-            unverified_header = jwt.get_unverified_header(token)
+            # Header ya decodificado en el contexto; jose lo parsea (y falla) si vino malformado
+            unverified_header = auth.header if auth.header is not None else jwt.get_unverified_header(token)
             kid = unverified_header.get("kid")
-            
-            # Buscar la clave correcta
-            public_key_pem = None
-            for key in jwks_keys:
-                if key.get("kid") == kid:
-                    public_key_pem = jwk.construct(key).to_pem().decode("utf-8")
-                    break
-            
-            if not public_key_pem:
-                raise HTTPException(status_code=401, detail="Clave pÃºblica no encontrada")
+
+            public_key = await JWKS_STORE.get_key(kid)
+            if public_key is None:
+                if not JWKS_STORE.has_keys():
+                    raise HTTPException(status_code=401, detail="No se pudo obtener JWKS")
+                raise HTTPException(status_code=401, detail="Clave pública no encontrada")
             
             payload = jwt.decode(
                 token, 
-                public_key_pem, 
+                public_key, 
                 algorithms=[JWT_ALGORITHM],
                 audience=JWT_AUDIENCE,
                 issuer=JWT_ISSUER,
@@ -270,7 +553,7 @@ async def verify_token(credentials: Optional[HTTPAuthorizationCredentials] = Dep
             # HS256
             # En entorno HS256 (dev/e2e), permitir omitir verificación de firma si está habilitado
             if SKIP_JWT_SIGNATURE_VERIFY:
-                payload = jwt.get_unverified_claims(token)
+                payload = dict(auth.claims) if auth.claims is not None else jwt.get_unverified_claims(token)
                 # Validar exp/iat si existen
                 exp = payload.get("exp")
                 iat = payload.get("iat")
@@ -299,29 +582,40 @@ async def verify_token(credentials: Optional[HTTPAuthorizationCredentials] = Dep
         if ttl > JWT_MAX_TTL_SECONDS:
             raise HTTPException(status_code=401, detail="Token TTL excede mÃ¡ximo permitido")
 
+        VERIFIED_TOKENS.put(token, payload)
+        auth.verified_claims = payload
         return payload
     except JWTError as e:
         logger.warning(f"Error verificando token: {e}")
         raise HTTPException(status_code=401, detail="Token invÃ¡lido")
 
-async def proxy_request(
-    request: Request,
-    service_name: str,
-    path: str = "",
-    token_payload: Optional[dict] = None
-):
-    """Proxy de requests a microservicios"""
-    # Elegir upstream y construir URL
-    base_url = await choose_upstream(service_name)
-    target_url = f"{base_url}{path}"
-    
-    # Preparar headers
+# Modo streaming: el body del request y la respuesta del upstream se reenvían por chunks
+PROXY_STREAMING = os.getenv("PROXY_STREAMING", "true").lower() == "true"
+PROXY_MAX_BODY_BYTES = int(os.getenv("PROXY_MAX_BODY_BYTES", str(10 * 1024 * 1024)))
+
+# Headers hop-by-hop que no deben reenviarse (RFC 7230 6.1)
+HOP_BY_HOP_HEADERS = {
+    "connection",
+    "keep-alive",
+    "proxy-authenticate",
+    "proxy-authorization",
+    "te",
+    "trailers",
+    "transfer-encoding",
+    "upgrade",
+}
+
+def build_proxy_headers(request: Request, token_payload: Optional[dict] = None, keep_content_length: bool = False) -> Dict[str, str]:
+    """Headers a reenviar al upstream (usuario + trace-id)"""
     headers = dict(request.headers)
-    # Remover headers problemÃ¡ticos
+    # Remover headers problemáticos
     headers.pop("host", None)
-    headers.pop("content-length", None)
-    
-    # Agregar informaciÃ³n del usuario si hay token
+    if not keep_content_length:
+        headers.pop("content-length", None)
+    for name in HOP_BY_HOP_HEADERS:
+        headers.pop(name, None)
+
+    # Agregar información del usuario si hay token
     if token_payload:
         headers["X-User-Id"] = str(token_payload.get("sub", ""))
         headers["X-User-Email"] = token_payload.get("email", "")
@@ -336,35 +630,492 @@ async def proxy_request(
         headers.setdefault("Trace-Id", trace_id)
     except Exception:
         pass
-    
-    try:
-        async with httpx.AsyncClient() as client:
-            # Obtener body si existe
-            body = None
-            if request.method in ["POST", "PUT", "PATCH"]:
-                body = await request.body()
-                try:
-                    snippet = body.decode("utf-8")[:200]
-                except Exception:
-                    snippet = "(non-text)"
-                try:
-                    logger.info(f"proxy {service_name} {request.method} -> {target_url} ct={headers.get('content-type','')} size={len(body) if body else 0} body_snippet={snippet}")
-                except Exception:
-                    pass
-            
-            response = await client.request(
-                method=request.method,
-                url=target_url,
-                headers=headers,
-                params=request.query_params,
-                content=body,
-                timeout=30.0
-            )
+    return headers
+
+# Circuit breaker por servicio: abre si la tasa de error en la ventana supera el umbral
+CB_ENABLED = os.getenv("CB_ENABLED", "true").lower() == "true"
+CB_WINDOW_SECONDS = int(os.getenv("CB_WINDOW_SECONDS", "10"))
+CB_MIN_REQUESTS = int(os.getenv("CB_MIN_REQUESTS", "20"))
+CB_ERROR_RATE_THRESHOLD = float(os.getenv("CB_ERROR_RATE_THRESHOLD", "0.5"))
+CB_OPEN_SECONDS = float(os.getenv("CB_OPEN_SECONDS", "15"))
+CB_HALF_OPEN_MAX_CALLS = int(os.getenv("CB_HALF_OPEN_MAX_CALLS", "3"))
+
+# Reintentos y hedging (solo GET/HEAD sin body), acotados por un presupuesto global
+PROXY_MAX_RETRIES = int(os.getenv("PROXY_MAX_RETRIES", "1"))
+PROXY_HEDGE_AFTER_SECONDS = float(os.getenv("PROXY_HEDGE_AFTER_SECONDS", "0"))  # 0 = sin hedging
+RETRY_BUDGET_RATIO = float(os.getenv("RETRY_BUDGET_RATIO", "0.1"))
+RETRY_BUDGET_MIN_PER_SECOND = float(os.getenv("RETRY_BUDGET_MIN_PER_SECOND", "5"))
+IDEMPOTENT_METHODS = {"GET", "HEAD"}
+RETRYABLE_STATUS = {502, 503, 504}
+
+# Deadlines por ruta (`servicio=segundos`); se propagan al upstream en X-Request-Timeout-Ms
+PROXY_DEFAULT_DEADLINE_SECONDS = float(os.getenv("PROXY_DEFAULT_DEADLINE_SECONDS", str(UPSTREAM_TIMEOUT_SECONDS)))
+DEADLINE_HEADER = "X-Request-Timeout-Ms"
+
+def parse_route_seconds(raw: str) -> Dict[str, float]:
+    deadlines: Dict[str, float] = {}
+    for item in raw.split(","):
+        name, _, value = item.partition("=")
+        if not name.strip() or not value.strip():
+            continue
+        try:
+            deadlines[name.strip()] = float(value)
+        except ValueError:
+            logger.warning(f"Deadline inválido: {item}")
+    return deadlines
+
+PROXY_DEADLINES = parse_route_seconds(os.getenv("PROXY_DEADLINES", ""))
+
+BREAKERS: Dict[str, CircuitBreaker] = {
+    name: CircuitBreaker(
+        name,
+        window_seconds=CB_WINDOW_SECONDS,
+        min_requests=CB_MIN_REQUESTS,
+        error_rate_threshold=CB_ERROR_RATE_THRESHOLD,
+        open_seconds=CB_OPEN_SECONDS,
+        half_open_max_calls=CB_HALF_OPEN_MAX_CALLS,
+    )
+    for name in SERVICE_POOLS.keys()
+}
+RETRY_BUDGET = RetryBudget(ratio=RETRY_BUDGET_RATIO, min_retries_per_second=RETRY_BUDGET_MIN_PER_SECOND)
 
-            return response
+CIRCUIT_STATE = Gauge(
+    "gateway_circuit_breaker_state",
+    "Estado del circuit breaker por servicio (0=closed, 1=half_open, 2=open)",
+    ["service"],
+)
+CIRCUIT_REJECTED = Counter(
+    "gateway_circuit_breaker_rejected_total",
+    "Requests rechazados por circuito abierto",
+    ["service"],
+)
+UPSTREAM_RETRIES = Counter(
+    "gateway_upstream_retries_total",
+    "Reintentos y hedges enviados al upstream",
+    ["service", "kind"],
+)
+RETRY_BUDGET_EXHAUSTED = Counter(
+    "gateway_retry_budget_exhausted_total",
+    "Reintentos descartados por presupuesto agotado",
+    ["service"],
+)
+DEADLINE_EXCEEDED = Counter(
+    "gateway_deadline_exceeded_total",
+    "Requests que agotaron su deadline",
+    ["service"],
+)
+
+def update_breaker_metrics():
+    for service_name, breaker in BREAKERS.items():
+        CIRCUIT_STATE.labels(service=service_name).set(STATE_VALUES[breaker.current_state()])
+
+def get_deadline(request: Request, service_name: str) -> float:
+    """Deadline absoluto (monotonic); respeta uno más corto enviado por el cliente"""
+    budget = PROXY_DEADLINES.get(service_name, PROXY_DEFAULT_DEADLINE_SECONDS)
+    incoming = request.headers.get(DEADLINE_HEADER)
+    if incoming and incoming.isdigit():
+        budget = min(budget, int(incoming) / 1000.0)
+    return time.monotonic() + budget
+
+def record_breaker(service_name: str, ok: bool):
+    breaker = BREAKERS.get(service_name)
+    if breaker is not None and CB_ENABLED:
+        breaker.record(ok)
+
+async def send_attempt(request: Request, service_name: str, path: str, headers: Dict[str, str], content, timeout: float):
+    """Un intento contra un upstream; devuelve (respuesta en stream, base_url) sin liberar"""
+    base_url = await choose_upstream(service_name)
+    target_url = f"{base_url}{path}"
+    client = get_upstream_client(service_name, base_url)
+    started = time.perf_counter()
+    try:
+        upstream_request = client.build_request(
+            method=request.method,
+            url=target_url,
+            headers=headers,
+            params=request.query_params,
+            content=content,
+            timeout=timeout,
+        )
+        upstream = await client.send(upstream_request, stream=True)
     except httpx.RequestError as e:
+        observe_upstream(service_name, base_url, None, False)
+        record_breaker(service_name, False)
+        release_upstream(service_name, base_url)
         logger.error(f"Error en proxy request a {target_url}: {e}")
+        raise
+    except BaseException:
+        release_upstream(service_name, base_url)
+        raise
+    ok = upstream.status_code < 500
+    observe_upstream(service_name, base_url, time.perf_counter() - started, ok)
+    record_breaker(service_name, ok)
+    return upstream, base_url
+
+async def discard_attempt(service_name: str, upstream: httpx.Response, base_url: str):
+    try:
+        await upstream.aclose()
+    finally:
+        release_upstream(service_name, base_url)
+
+async def send_hedged(request: Request, service_name: str, path: str, headers: Dict[str, str], timeout: float):
+    """Si el primer intento no responde en PROXY_HEDGE_AFTER_SECONDS, lanza otro y gana el primero"""
+    first = asyncio.create_task(send_attempt(request, service_name, path, headers, None, timeout))
+    done, _ = await asyncio.wait({first}, timeout=PROXY_HEDGE_AFTER_SECONDS)
+    if done or not RETRY_BUDGET.try_withdraw():
+        return await first
+    UPSTREAM_RETRIES.labels(service=service_name, kind="hedge").inc()
+    second = asyncio.create_task(
+        send_attempt(request, service_name, path, headers, None, max(0.001, timeout - PROXY_HEDGE_AFTER_SECONDS))
+    )
+    pending = {first, second}
+    error: Optional[BaseException] = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            winners = [t for t in done if t.exception() is None]
+            for task in done:
+                if task.exception() is not None:
+                    error = task.exception()
+            if winners:
+                # Descartar respuestas que llegaron a la vez que la ganadora
+                for extra in winners[1:]:
+                    await discard_attempt(service_name, *extra.result())
+                return winners[0].result()
+        raise error
+    finally:
+        # El intento perdedor se cancela; send_attempt libera su upstream
+        for task in pending:
+            task.cancel()
+
+async def send_upstream(request: Request, service_name: str, path: str, headers: Dict[str, str], content=None):
+    """Envía al upstream con circuit breaker, deadline y reintentos/hedging para métodos idempotentes.
+
+    Devuelve (respuesta en stream, base_url); el llamador debe cerrarla y liberar el upstream.
+    """
+    breaker = BREAKERS.get(service_name)
+    if breaker is not None and CB_ENABLED and not breaker.allow():
+        CIRCUIT_REJECTED.labels(service=service_name).inc()
+        raise HTTPException(
+            status_code=503,
+            detail=f"Servicio {service_name} no disponible (circuito abierto)",
+            headers={"Retry-After": str(breaker.retry_after())},
+        )
+    deadline = get_deadline(request, service_name)
+    idempotent = request.method in IDEMPOTENT_METHODS and content is None
+    hedge = idempotent and PROXY_HEDGE_AFTER_SECONDS > 0 and len(SERVICE_POOLS.get(service_name, [])) > 1
+    RETRY_BUDGET.record_request()
+
+    def can_retry(attempt: int) -> bool:
+        if not idempotent or attempt >= PROXY_MAX_RETRIES or deadline - time.monotonic() <= 0:
+            return False
+        if breaker is not None and CB_ENABLED and not breaker.allow():
+            return False
+        if not RETRY_BUDGET.try_withdraw():
+            RETRY_BUDGET_EXHAUSTED.labels(service=service_name).inc()
+            return False
+        return True
+
+    attempt = 0
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            DEADLINE_EXCEEDED.labels(service=service_name).inc()
+            raise HTTPException(status_code=504, detail=f"Servicio {service_name} excedió el deadline")
+        headers[DEADLINE_HEADER] = str(max(1, int(remaining * 1000)))
+        try:
+            if hedge and attempt == 0:
+                upstream, base_url = await send_hedged(request, service_name, path, headers, remaining)
+            else:
+                upstream, base_url = await send_attempt(request, service_name, path, headers, content, remaining)
+        except httpx.TimeoutException:
+            if can_retry(attempt):
+                attempt += 1
+                UPSTREAM_RETRIES.labels(service=service_name, kind="retry").inc()
+                continue
+            DEADLINE_EXCEEDED.labels(service=service_name).inc()
+            raise HTTPException(status_code=504, detail=f"Servicio {service_name} no respondió a tiempo")
+        except httpx.RequestError:
+            if can_retry(attempt):
+                attempt += 1
+                UPSTREAM_RETRIES.labels(service=service_name, kind="retry").inc()
+                continue
+            raise HTTPException(status_code=503, detail=f"Servicio {service_name} no disponible")
+        if upstream.status_code in RETRYABLE_STATUS and can_retry(attempt):
+            await discard_attempt(service_name, upstream, base_url)
+            attempt += 1
+            UPSTREAM_RETRIES.labels(service=service_name, kind="retry").inc()
+            continue
+        return upstream, base_url
+
+def annotate_access_log(request: Request, service_name: str, path: str, upstream_status: int,
+                        content_type: Optional[str] = None, body_bytes: Optional[int] = None, body: Optional[bytes] = None):
+    """Solo se anotan los datos; el access log formatea (y redacta) fuera del hot path"""
+    if not ACCESS_LOG_ENABLED:
+        return
+    fields = {"service": service_name, "upstream_path": path, "upstream_status": upstream_status}
+    if request.method in ["POST", "PUT", "PATCH"]:
+        fields.update({"content_type": content_type, "body_bytes": body_bytes, "body": ACCESS_LOG.body_field(body)})
+    request.state.access_log = fields
+
+async def proxy_request(
+    request: Request,
+    service_name: str,
+    path: str = "",
+    token_payload: Optional[dict] = None
+):
+    """Proxy de requests a microservicios"""
+    headers = build_proxy_headers(request, token_payload)
+
+    # Obtener body si existe
+    body = None
+    if request.method in ["POST", "PUT", "PATCH"]:
+        body = await request.body()
+
+    upstream, base_url = await send_upstream(request, service_name, path, headers, body)
+    annotate_access_log(request, service_name, path, upstream.status_code, headers.get("content-type"),
+                        len(body) if body is not None else None, body)
+    try:
+        await upstream.aread()
+        return upstream
+    except httpx.TimeoutException:
+        DEADLINE_EXCEEDED.labels(service=service_name).inc()
+        raise HTTPException(status_code=504, detail=f"Servicio {service_name} no respondió a tiempo")
+    except httpx.RequestError as e:
+        logger.error(f"Error leyendo respuesta de {base_url}{path}: {e}")
         raise HTTPException(status_code=503, detail=f"Servicio {service_name} no disponible")
+    finally:
+        await upstream.aclose()
+        release_upstream(service_name, base_url)
+
+async def limited_body_stream(request: Request, limit: int):
+    """Reenvía el body por chunks cortando si supera el límite configurado"""
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > limit:
+            raise HTTPException(status_code=413, detail="Body demasiado grande")
+        yield chunk
+
+async def proxy_stream(
+    request: Request,
+    service_name: str,
+    path: str = "",
+    token_payload: Optional[dict] = None
+) -> StreamingResponse:
+    """Proxy en modo streaming: no materializa el body ni la respuesta en memoria"""
+    # content-length se conserva para que el upstream no reciba chunked innecesariamente
+    headers = build_proxy_headers(request, token_payload, keep_content_length=True)
+
+    content = None
+    if request.method in ["POST", "PUT", "PATCH"]:
+        declared = request.headers.get("content-length")
+        if declared and declared.isdigit() and int(declared) > PROXY_MAX_BODY_BYTES:
+            raise HTTPException(status_code=413, detail="Body demasiado grande")
+        content = limited_body_stream(request, PROXY_MAX_BODY_BYTES)
+
+    upstream, base_url = await send_upstream(request, service_name, path, headers, content)
+    # En streaming el body no se materializa: se registra el tamaño declarado, sin contenido
+    declared = request.headers.get("content-length")
+    annotate_access_log(request, service_name, path, upstream.status_code, headers.get("content-type"),
+                        int(declared) if declared and declared.isdigit() else None)
+
+    closed = False
+
+    async def close_upstream():
+        nonlocal closed
+        if closed:
+            return
+        closed = True
+        try:
+            await upstream.aclose()
+        finally:
+            release_upstream(service_name, base_url)
+
+    async def relay():
+        try:
+            # Bytes crudos: se respeta content-encoding/content-length del upstream
+            async for chunk in upstream.aiter_raw():
+                yield chunk
+        finally:
+            await close_upstream()
+
+    response = StreamingResponse(relay(), status_code=upstream.status_code, background=BackgroundTask(close_upstream))
+    for name, value in upstream.headers.multi_items():
+        if name.lower() not in HOP_BY_HOP_HEADERS:
+            response.headers.append(name, value)
+    return response
+
+# Coalescing de GETs idénticos en vuelo (mismo usuario, path y query) sobre un único fetch buffered.
+# Opt-in: obliga a bufferizar los GETs, que si no irían por streaming
+REQUEST_COALESCING = os.getenv("REQUEST_COALESCING", "false").lower() == "true"
+COALESCE_MAX_WAITERS = int(os.getenv("COALESCE_MAX_WAITERS", "100"))
+
+IN_FLIGHT_GETS = SingleFlight(max_waiters=COALESCE_MAX_WAITERS)
+
+COALESCED_REQUESTS = Counter(
+    "gateway_coalesced_requests_total",
+    "GETs servidos compartiendo un fetch ya en vuelo",
+    ["service"],
+)
+COALESCE_INFLIGHT = Gauge(
+    "gateway_coalesce_inflight_keys",
+    "Claves de coalescing con fetch en vuelo",
+)
+
+async def fetch_buffered(request: Request, service_name: str, path: str, token_payload: Optional[dict], user_id: str) -> httpx.Response:
+    """Fetch buffered; si hay un GET idéntico en vuelo se comparte su respuesta"""
+    if not (REQUEST_COALESCING and user_id and request.method == "GET"):
+        return await proxy_request(request, service_name, path, token_payload)
+    key = ResponseCache.make_key(user_id, service_name, path, request.query_params.multi_items())
+    proxied, shared = await IN_FLIGHT_GETS.do(key, lambda: proxy_request(request, service_name, path, token_payload))
+    if shared:
+        COALESCED_REQUESTS.labels(service=service_name).inc()
+    return proxied
+
+# Caché de respuestas GET (opt-in por ruta: RESPONSE_CACHE_TTLS="tags=60,categories=60,tasks=15")
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "false").lower() == "true"
+RESPONSE_CACHE_TTLS = parse_route_seconds(os.getenv("RESPONSE_CACHE_TTLS", ""))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+RESPONSE_CACHE_MAX_ENTRY_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRY_BYTES", str(1024 * 1024)))
+# Invalidación por eventos de dominio (mismo exchange que publican los servicios)
+RESPONSE_CACHE_INVALIDATION = os.getenv("RESPONSE_CACHE_INVALIDATION", "true").lower() == "true"
+RABBITMQ_URL = os.getenv("RABBITMQ_URL", "amqp://rabbitmq:5672")
+EVENTS_EXCHANGE = os.getenv("EVENTS_EXCHANGE", "tasknotes.events")
+
+# Las generaciones de invalidación se recuerdan más tiempo del que puede durar un fetch
+RESPONSE_CACHE_GENERATION_WINDOW = 2 * max([PROXY_DEFAULT_DEADLINE_SECONDS, *PROXY_DEADLINES.values()])
+RESPONSE_CACHE = ResponseCache(
+    max_bytes=RESPONSE_CACHE_MAX_BYTES,
+    max_entry_bytes=RESPONSE_CACHE_MAX_ENTRY_BYTES,
+    generation_window=RESPONSE_CACHE_GENERATION_WINDOW,
+)
+CACHE_INVALIDATION_TASKS: List[asyncio.Task] = []
+
+RESPONSE_CACHE_LOOKUPS = Counter(
+    "gateway_response_cache_lookups_total",
+    "Consultas a la caché de respuestas por resultado (hit/miss/bypass)",
+    ["service", "result"],
+)
+RESPONSE_CACHE_NOT_MODIFIED = Counter(
+    "gateway_response_cache_not_modified_total",
+    "Respuestas 304 servidas por coincidencia de ETag",
+    ["service"],
+)
+RESPONSE_CACHE_INVALIDATIONS = Counter(
+    "gateway_response_cache_invalidations_total",
+    "Invalidaciones de la caché de respuestas por origen",
+    ["source"],
+)
+RESPONSE_CACHE_ENTRIES = Gauge(
+    "gateway_response_cache_entries",
+    "Entradas en la caché de respuestas",
+)
+RESPONSE_CACHE_BYTES = Gauge(
+    "gateway_response_cache_bytes",
+    "Bytes de body almacenados en la caché de respuestas",
+)
+
+def on_cache_event(routing_key: str, removed: int):
+    RESPONSE_CACHE_INVALIDATIONS.labels(source="event").inc()
+
+@app.on_event("startup")
+async def start_cache_invalidation():
+    if not (RESPONSE_CACHE_ENABLED and RESPONSE_CACHE_TTLS and RESPONSE_CACHE_INVALIDATION):
+        return
+    try:
+        import aio_pika  # noqa: F401
+    except ImportError:
+        logger.warning("Caché de respuestas sin 'aio-pika': solo expira por TTL e invalidación local")
+        return
+    CACHE_INVALIDATION_TASKS.append(
+        asyncio.create_task(run_invalidation_consumer(RESPONSE_CACHE, RABBITMQ_URL, EVENTS_EXCHANGE, on_event=on_cache_event))
+    )
+
+@app.on_event("shutdown")
+async def stop_cache_invalidation():
+    for task in CACHE_INVALIDATION_TASKS:
+        task.cancel()
+    CACHE_INVALIDATION_TASKS.clear()
+
+# El body de httpx ya viene decodificado: no se reenvían la codificación ni la longitud original
+BUFFERED_SKIP_HEADERS = HOP_BY_HOP_HEADERS | {"content-encoding", "content-length"}
+
+def buffered_response(proxied: httpx.Response) -> Response:
+    """Respuesta buffered con los headers del upstream (etag, cache-control...), salvo hop-by-hop"""
+    response = Response(content=proxied.content, status_code=proxied.status_code)
+    for name, value in proxied.headers.multi_items():
+        if name.lower() not in BUFFERED_SKIP_HEADERS:
+            response.headers.append(name, value)
+    return response
+
+def cache_headers(entry: CachedResponse, status: str) -> Dict[str, str]:
+    # no-cache: el navegador puede guardar la respuesta pero revalida con If-None-Match
+    return {"ETag": entry.etag, "Cache-Control": "private, no-cache", "X-Cache": status}
+
+async def cached_forward(request: Request, service_name: str, path: str, token_payload: dict, user_id: str, ttl: float) -> Response:
+    """GET servido desde la caché de respuestas; en miss se hace el fetch buffered y se guarda"""
+    key = RESPONSE_CACHE.make_key(user_id, service_name, path, request.query_params.multi_items())
+    bypass = "no-cache" in request.headers.get("cache-control", "").lower()
+    entry = None if bypass else RESPONSE_CACHE.get(key)
+    status = "HIT"
+    if entry is None:
+        status = "MISS"
+        RESPONSE_CACHE_LOOKUPS.labels(service=service_name, result="bypass" if bypass else "miss").inc()
+        snapshot = RESPONSE_CACHE.snapshot(user_id, service_name)
+        proxied = await fetch_buffered(request, service_name, path, token_payload, user_id)
+        media_type = proxied.headers.get("content-type")
+        if proxied.status_code != 200 or "no-store" in proxied.headers.get("cache-control", "").lower():
+            return buffered_response(proxied)
+        body = proxied.content
+        entry = CachedResponse(
+            200, media_type, body, proxied.headers.get("etag") or make_etag(body),
+            time.monotonic() + ttl, user_id, service_name,
+        )
+        RESPONSE_CACHE.put(key, entry, snapshot)
+    else:
+        RESPONSE_CACHE_LOOKUPS.labels(service=service_name, result="hit").inc()
+
+    if etag_matches(request.headers.get("if-none-match"), entry.etag):
+        RESPONSE_CACHE_NOT_MODIFIED.labels(service=service_name).inc()
+        return Response(status_code=304, headers=cache_headers(entry, status))
+    return Response(content=entry.body, status_code=entry.status_code, media_type=entry.media_type, headers=cache_headers(entry, status))
+
+def invalidate_after_write(request: Request, service_name: str, user_id: str, status_code: int):
+    """Escrituras propias invalidan de inmediato (no esperan al evento de RabbitMQ)"""
+    entity = SERVICE_ENTITIES.get(service_name)
+    if entity is None or status_code >= 400 or request.method not in ("POST", "PUT", "PATCH", "DELETE"):
+        return
+    RESPONSE_CACHE.invalidate(user_id, INVALIDATION_MAP[entity])
+    RESPONSE_CACHE_INVALIDATIONS.labels(source="write").inc()
+
+async def forward_request(
+    request: Request,
+    service_name: str,
+    path: str = "",
+    token_payload: Optional[dict] = None
+) -> Response:
+    """Reenvía al upstream en modo streaming o buffered según PROXY_STREAMING
+
+    Los GETs autenticados van por caché y/o coalescing, que requieren la respuesta buffered.
+    """
+    user_id = str(token_payload.get("sub", "")) if token_payload else ""
+    cache_enabled = RESPONSE_CACHE_ENABLED and bool(user_id)
+    ttl = RESPONSE_CACHE_TTLS.get(service_name) if cache_enabled else None
+    if ttl and request.method == "GET":
+        return await cached_forward(request, service_name, path, token_payload, user_id, ttl)
+    if REQUEST_COALESCING and user_id and request.method == "GET":
+        proxied = await fetch_buffered(request, service_name, path, token_payload, user_id)
+        return buffered_response(proxied)
+
+    if PROXY_STREAMING:
+        response = await proxy_stream(request, service_name, path, token_payload)
+    else:
+        proxied = await proxy_request(request, service_name, path, token_payload)
+        response = buffered_response(proxied)
+    if cache_enabled:
+        invalidate_after_write(request, service_name, user_id, response.status_code)
+    return response
 
 def extract_scopes(payload: dict) -> List[str]:
     scopes: List[str] = []
@@ -429,7 +1180,7 @@ ACCESS_POLICIES: Dict[str, Dict[str, List[str]]] = {
     },
 }
 
-def enforce_policies(token_payload: dict, endpoint: str, method: str):
+def enforce_policies(token_payload: dict, endpoint: str, method: str, auth: Optional[AuthContext] = None):
     if not ENABLE_SCOPE_ENFORCEMENT:
         return
     if has_admin_role(token_payload):
@@ -437,7 +1188,11 @@ def enforce_policies(token_payload: dict, endpoint: str, method: str):
     required = ACCESS_POLICIES.get(endpoint, {}).get(method.upper(), [])
     if not required:
         return
-    scopes = set(extract_scopes(token_payload))
+    # Reutilizar los scopes ya extraídos en el contexto de la request
+    if auth is not None and auth.verified_claims is token_payload:
+        scopes = auth.scopes
+    else:
+        scopes = set(extract_scopes(token_payload))
     missing = [s for s in required if s not in scopes]
     if missing:
         raise HTTPException(status_code=403, detail=f"Scopes insuficientes: faltan {missing}")
@@ -450,6 +1205,17 @@ async def health_check():
 @app.get("/metrics")
 async def metrics():
     """Exponer mÃ©tricas Prometheus"""
+    update_pool_metrics()
+    update_balancer_metrics()
+    update_breaker_metrics()
+    RESPONSE_CACHE_ENTRIES.set(len(RESPONSE_CACHE))
+    COALESCE_INFLIGHT.set(len(IN_FLIGHT_GETS))
+    ACCESS_LOG_DROPPED.set(ACCESS_LOG.dropped)
+    RESPONSE_CACHE_BYTES.set(RESPONSE_CACHE.bytes)
+    RATE_LIMIT_ENTRIES.set(len(RATE_LIMIT_STORE))
+    RATE_LIMIT_EVICTIONS.set(RATE_LIMIT_STORE.evictions)
+    RATE_LIMIT_FALLBACKS.set(getattr(RATE_LIMIT_STORE, "fallbacks", 0))
+    RATE_LIMIT_DEGRADED.set(1 if getattr(RATE_LIMIT_STORE, "degraded", False) else 0)
     data = generate_latest()
     return Response(content=data, media_type=CONTENT_TYPE_LATEST)
 
@@ -457,9 +1223,7 @@ async def metrics():
 async def get_jwks_endpoint():
     """Endpoint JWKS del API Gateway (proxy al auth-service)"""
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(JWKS_URL, timeout=5.0)
-            return response.json()
+        return {"keys": await JWKS_STORE.get_jwks()}
     except Exception as e:
         logger.error(f"Error obteniendo JWKS: {e}")
         return {"keys": []}
@@ -499,23 +1263,28 @@ async def auth_proxy(request: Request, path: str):
                 profiles_base = await choose_upstream("user_profile")
                 profiles_url = f"{profiles_base}/profiles/"
                 try:
-                    async with httpx.AsyncClient() as client:
-                        profile_resp = await client.post(
-                            profiles_url,
-                            json=payload,
-                            headers=headers,
-                            timeout=10.0,
+                    client = get_upstream_client("user_profile", profiles_base)
+                    started = time.perf_counter()
+                    profile_resp = await client.post(
+                        profiles_url,
+                        json=payload,
+                        headers=headers,
+                        timeout=10.0,
+                    )
+                    observe_upstream("user_profile", profiles_base, time.perf_counter() - started, profile_resp.status_code < 500)
+                    if profile_resp.status_code in (200, 201):
+                        logger.info(f"Perfil creado para usuario {user_id}")
+                    elif profile_resp.status_code == 409:
+                        logger.info(f"Perfil ya existe para usuario {user_id}")
+                    else:
+                        logger.warning(
+                            f"Fallo al crear perfil {user_id}: {profile_resp.status_code} {profile_resp.text}"
                         )
-                        if profile_resp.status_code in (200, 201):
-                            logger.info(f"Perfil creado para usuario {user_id}")
-                        elif profile_resp.status_code == 409:
-                            logger.info(f"Perfil ya existe para usuario {user_id}")
-                        else:
-                            logger.warning(
-                                f"Fallo al crear perfil {user_id}: {profile_resp.status_code} {profile_resp.text}"
-                            )
                 except Exception as e:
+                    observe_upstream("user_profile", profiles_base, None, False)
                     logger.error(f"Error creando perfil en registro: {e}")
+                finally:
+                    release_upstream("user_profile", profiles_base)
     except Exception as e:
         logger.error(f"Intercept registro fallÃ³: {e}")
     return Response(content=proxied.content, status_code=proxied.status_code, media_type=proxied.headers.get("content-type"))
@@ -526,66 +1295,60 @@ async def tasks_proxy(request: Request, path: str, token_payload: dict = Depends
     """Proxy para tasks-service"""
     if not token_payload:
         raise HTTPException(status_code=401, detail="Token requerido")
-    enforce_policies(token_payload, "tasks", request.method)
+    enforce_policies(token_payload, "tasks", request.method, get_auth_context(request))
     prefix = "/tasks"
     forward_path = (f"{prefix}/{path}" if path else f"{prefix}/")
-    proxied = await proxy_request(request, "tasks", forward_path, token_payload)
-    return Response(content=proxied.content, status_code=proxied.status_code, media_type=proxied.headers.get("content-type"))
+    return await forward_request(request, "tasks", forward_path, token_payload)
 
 @app.api_route("/notes/{path:path}", methods=["GET", "POST", "PUT", "DELETE", "PATCH"])
 async def notes_proxy(request: Request, path: str, token_payload: dict = Depends(verify_token)):
     """Proxy para notes-service"""
     if not token_payload:
         raise HTTPException(status_code=401, detail="Token requerido")
-    enforce_policies(token_payload, "notes", request.method)
+    enforce_policies(token_payload, "notes", request.method, get_auth_context(request))
     prefix = "/notes"
     forward_path = (f"{prefix}/{path}" if path else f"{prefix}/")
-    proxied = await proxy_request(request, "notes", forward_path, token_payload)
-    return Response(content=proxied.content, status_code=proxied.status_code, media_type=proxied.headers.get("content-type"))
+    return await forward_request(request, "notes", forward_path, token_payload)
 
 @app.api_route("/tags/{path:path}", methods=["GET", "POST", "PUT", "DELETE", "PATCH"])
 async def tags_proxy(request: Request, path: str, token_payload: dict = Depends(verify_token)):
     """Proxy para tags-service"""
     if not token_payload:
         raise HTTPException(status_code=401, detail="Token requerido")
-    enforce_policies(token_payload, "tags", request.method)
+    enforce_policies(token_payload, "tags", request.method, get_auth_context(request))
     prefix = "/tags"
     forward_path = (f"{prefix}/{path}" if path else prefix)
-    proxied = await proxy_request(request, "tags", forward_path, token_payload)
-    return Response(content=proxied.content, status_code=proxied.status_code, media_type=proxied.headers.get("content-type"))
+    return await forward_request(request, "tags", forward_path, token_payload)
 
 @app.api_route("/categories/{path:path}", methods=["GET", "POST", "PUT", "DELETE", "PATCH"])
 async def categories_proxy(request: Request, path: str, token_payload: dict = Depends(verify_token)):
     """Proxy para categories-service"""
     if not token_payload:
         raise HTTPException(status_code=401, detail="Token requerido")
-    enforce_policies(token_payload, "categories", request.method)
+    enforce_policies(token_payload, "categories", request.method, get_auth_context(request))
     prefix = "/categories"
     forward_path = (f"{prefix}/{path}" if path else prefix)
-    proxied = await proxy_request(request, "categories", forward_path, token_payload)
-    return Response(content=proxied.content, status_code=proxied.status_code, media_type=proxied.headers.get("content-type"))
+    return await forward_request(request, "categories", forward_path, token_payload)
 
 @app.api_route("/user-profile/{path:path}", methods=["GET", "POST", "PUT", "DELETE", "PATCH"])
 async def user_profile_proxy(request: Request, path: str, token_payload: dict = Depends(verify_token)):
     """Proxy para user-profile-service"""
     if not token_payload:
         raise HTTPException(status_code=401, detail="Token requerido")
-    enforce_policies(token_payload, "user-profile", request.method)
+    enforce_policies(token_payload, "user-profile", request.method, get_auth_context(request))
     prefix = "/profiles"
     forward_path = (f"{prefix}/{path}" if path else (prefix + ("/" if request.url.path.endswith("/") else "")))
-    proxied = await proxy_request(request, "user_profile", forward_path, token_payload)
-    return Response(content=proxied.content, status_code=proxied.status_code, media_type=proxied.headers.get("content-type"))
+    return await forward_request(request, "user_profile", forward_path, token_payload)
 
 @app.api_route("/search/{path:path}", methods=["GET", "POST", "PUT", "DELETE", "PATCH"])
 async def search_proxy(request: Request, path: str, token_payload: dict = Depends(verify_token)):
     """Proxy para search-service"""
     if not token_payload:
         raise HTTPException(status_code=401, detail="Token requerido")
-    enforce_policies(token_payload, "search", request.method)
+    enforce_policies(token_payload, "search", request.method, get_auth_context(request))
     # Search service mapea la raÃ­z '/'
     forward_path = (f"/{path}" if path else ("/" if request.url.path.endswith("/") else ""))
-    proxied = await proxy_request(request, "search", forward_path, token_payload)
-    return Response(content=proxied.content, status_code=proxied.status_code, media_type=proxied.headers.get("content-type"))
+    return await forward_request(request, "search", forward_path, token_payload)
 
 # Montar Socket.IO explÃ­citamente bajo la ruta /socket.io
 # app.mount("/socket.io", socketio.ASGIApp(sio, socketio_path="socket.io"))
@@ -609,17 +1372,30 @@ async def trace_id_middleware(request: Request, call_next):
         pass
 
     # Continuar la cadena y aÃ±adir header a la respuesta
+    started = time.perf_counter()
     response = await call_next(request)
     try:
         response.headers["X-Request-ID"] = trace_id
     except Exception:
         pass
 
-    # Log bÃ¡sico con trace-id
-    try:
-        logger.info(f"trace_id={trace_id} method={request.method} path={request.url.path} status={response.status_code}")
-    except Exception:
-        pass
+    # Access log con trace-id (encolado; se escribe en un hilo aparte)
+    if ACCESS_LOG_ENABLED:
+        try:
+            fields = {
+                "trace_id": trace_id,
+                "method": request.method,
+                "path": request.url.path,
+                "status": response.status_code,
+                "duration_ms": elapsed_ms(started),
+                "client": request.client.host if request.client else None,
+            }
+            extra = getattr(request.state, "access_log", None)
+            if extra:
+                fields.update(extra)
+            ACCESS_LOG.log(fields, response.status_code)
+        except Exception:
+            pass
 
     return response
 
@@ -0,0 +1,176 @@
+"""
+Rate limiting (token-bucket) para el API Gateway de TaskNotes.
+
+Backends intercambiables con la misma interfaz `consume(key, capacity, window_seconds)`:
+
+- `MemoryRateLimitStore`: buckets compactos (`__slots__`) repartidos en shards
+  LRU. El refill es perezoso (se calcula al consumir), los buckets inactivos se
+  desalojan de forma incremental y el total de entradas está acotado.
+- `RedisRateLimitStore`: estado compartido entre réplicas del gateway mediante
+  un script Lua atómico. Acepta cualquier cliente con `eval` asíncrono
+  compatible con `redis.asyncio` (o un fake local para pruebas, ver
+  `perf/check_ratelimit_redis.py`). Si Redis falla usa el store en memoria y lo
+  registra una sola vez al degradarse y otra al recuperarse.
+"""
+
+import logging
+import math
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class Bucket:
+    __slots__ = ("tokens", "last")
+
+    def __init__(self, tokens: float, last: float):
+        self.tokens = tokens
+        self.last = last
+
+
+class MemoryRateLimitStore:
+    # Buckets inactivos revisados por acceso (desalojo incremental, O(1) amortizado)
+    EVICT_BATCH = 4
+
+    def __init__(self, max_entries: int = 100000, idle_seconds: float = 120.0, shards: int = 16):
+        self.shard_count = max(1, shards)
+        self.max_per_shard = max(1, max_entries // self.shard_count)
+        self.idle_seconds = max(1.0, idle_seconds)
+        self._shards: List["OrderedDict[str, Bucket]"] = [OrderedDict() for _ in range(self.shard_count)]
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self._shards)
+
+    def _evict(self, shard: "OrderedDict[str, Bucket]", now: float) -> None:
+        # El orden LRU garantiza que los más antiguos están al inicio
+        for _ in range(self.EVICT_BATCH):
+            if not shard:
+                return
+            oldest_key = next(iter(shard))
+            if now - shard[oldest_key].last < self.idle_seconds:
+                break
+            del shard[oldest_key]
+            self.evictions += 1
+        while len(shard) > self.max_per_shard:
+            shard.popitem(last=False)
+            self.evictions += 1
+
+    def consume_now(self, key: str, capacity: int, window_seconds: float, now: Optional[float] = None) -> bool:
+        """Versión síncrona (usada por el gateway y el benchmark)"""
+        if now is None:
+            now = time.monotonic()
+        capacity = max(1, capacity)
+        shard = self._shards[hash(key) % self.shard_count]
+        bucket = shard.get(key)
+        if bucket is None:
+            bucket = Bucket(float(capacity), now)
+            shard[key] = bucket
+            self._evict(shard, now)
+        else:
+            refill_rate = capacity / max(1.0, window_seconds)
+            bucket.tokens = min(capacity, bucket.tokens + (now - bucket.last) * refill_rate)
+            bucket.last = now
+            shard.move_to_end(key)
+        if bucket.tokens >= 1.0:
+            bucket.tokens -= 1.0
+            return True
+        return False
+
+    async def consume(self, key: str, capacity: int, window_seconds: float) -> bool:
+        return self.consume_now(key, capacity, window_seconds)
+
+    async def aclose(self) -> None:
+        return None
+
+
+# KEYS[1]=bucket; ARGV: capacity, refill_rate, now, ttl
+TOKEN_BUCKET_LUA = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local ttl = tonumber(ARGV[4])
+local data = redis.call('HMGET', KEYS[1], 't', 'l')
+local tokens = tonumber(data[1])
+local last = tonumber(data[2])
+if tokens == nil or last == nil then
+  tokens = capacity
+  last = now
+end
+tokens = math.min(capacity, tokens + math.max(0, now - last) * rate)
+local allowed = 0
+if tokens >= 1 then
+  tokens = tokens - 1
+  allowed = 1
+end
+redis.call('HSET', KEYS[1], 't', tostring(tokens), 'l', tostring(now))
+redis.call('EXPIRE', KEYS[1], ttl)
+return allowed
+"""
+
+
+class RedisRateLimitStore:
+    def __init__(self, client, prefix: str = "ratelimit:", fallback: Optional[MemoryRateLimitStore] = None):
+        self.client = client
+        self.prefix = prefix
+        # Si Redis falla, se limita localmente en vez de bloquear o abrir todo
+        self.fallback = fallback or MemoryRateLimitStore()
+        self.degraded = False
+        # Consultas resueltas por el fallback en memoria desde el arranque
+        self.fallbacks = 0
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs) -> "RedisRateLimitStore":
+        import redis.asyncio as redis_asyncio
+        return cls(redis_asyncio.from_url(url), **kwargs)
+
+    def __len__(self) -> int:
+        return len(self.fallback)
+
+    @property
+    def evictions(self) -> int:
+        return self.fallback.evictions
+
+    async def consume(self, key: str, capacity: int, window_seconds: float) -> bool:
+        capacity = max(1, capacity)
+        window = max(1.0, window_seconds)
+        # TTL = tiempo en rellenarse por completo: pasado eso el bucket equivale a uno nuevo
+        ttl = int(math.ceil(window)) + 1
+        try:
+            allowed = await self.client.eval(
+                TOKEN_BUCKET_LUA, 1, self.prefix + key, capacity, capacity / window, time.time(), ttl
+            )
+        except Exception as e:
+            if not self.degraded:
+                self.degraded = True
+                logger.warning(f"Rate limit en Redis no disponible, usando memoria local: {e}")
+            self.fallbacks += 1
+            return self.fallback.consume_now(key, capacity, window)
+        if self.degraded:
+            self.degraded = False
+            logger.info("Rate limit en Redis recuperado")
+        return int(allowed) == 1
+
+    async def aclose(self) -> None:
+        try:
+            await self.client.aclose()
+        except Exception:
+            pass
+
+
+def parse_overrides(raw: str) -> Dict[Tuple[str, str], int]:
+    """Parsea `endpoint:METHOD=N,endpoint=N` (sin método aplica a todos: '*')"""
+    overrides: Dict[Tuple[str, str], int] = {}
+    for item in raw.split(","):
+        item = item.strip()
+        if not item or "=" not in item:
+            continue
+        target, _, value = item.partition("=")
+        endpoint, _, method = target.strip().partition(":")
+        try:
+            overrides[(endpoint.strip(), (method.strip() or "*").upper())] = int(value)
+        except ValueError:
+            logger.warning(f"Override de rate limit inválido: {item}")
+    return overrides
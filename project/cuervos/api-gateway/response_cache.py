@@ -0,0 +1,241 @@
+"""
+Caché de respuestas GET para el API Gateway de TaskNotes.
+
+- `ResponseCache`: LRU acotado por bytes con entradas por (usuario, servicio,
+  path, query normalizada). Cada entrada guarda su ETag para responder 304 a
+  `If-None-Match`. Las invalidaciones usan generaciones por (usuario, servicio)
+  para que un fetch en vuelo no guarde una respuesta ya obsoleta; solo se
+  recuerdan durante `generation_window` segundos (más que cualquier fetch), así
+  el mapa no crece con el número de usuarios.
+- `run_invalidation_consumer`: escucha el exchange `tasknotes.events`
+  (`task.*`, `note.*`, `tag.*`, `category.*`) e invalida las respuestas del
+  usuario afectado. Requiere `aio-pika` (import perezoso).
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Optional, Set, Tuple
+from urllib.parse import urlencode
+
+logger = logging.getLogger(__name__)
+
+# Entidad del evento -> servicios cuyas respuestas pueden quedar obsoletas
+# (tasks/notes embeben nombres de tags y categorías al expandir)
+INVALIDATION_MAP: Dict[str, Tuple[str, ...]] = {
+    "task": ("tasks", "search"),
+    "note": ("notes", "search"),
+    "tag": ("tags", "tasks", "notes", "search"),
+    "category": ("categories", "tasks", "notes", "search"),
+}
+
+# Servicio del gateway -> entidad que modifican sus escrituras
+SERVICE_ENTITIES: Dict[str, str] = {
+    "tasks": "task",
+    "notes": "note",
+    "tags": "tag",
+    "categories": "category",
+}
+
+
+class CachedResponse:
+    __slots__ = ("status_code", "media_type", "body", "etag", "expires_at", "user_id", "service")
+
+    def __init__(self, status_code: int, media_type: Optional[str], body: bytes, etag: str,
+                 expires_at: float, user_id: str, service: str):
+        self.status_code = status_code
+        self.media_type = media_type
+        self.body = body
+        self.etag = etag
+        self.expires_at = expires_at
+        self.user_id = user_id
+        self.service = service
+
+    @property
+    def size(self) -> int:
+        return len(self.body)
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Comparación débil (RFC 7232 2.3.2): se ignora el prefijo W/
+    target = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == target:
+            return True
+    return False
+
+
+class ResponseCache:
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, max_entry_bytes: int = 1024 * 1024,
+                 generation_window: float = 120.0):
+        self.max_bytes = max(0, max_bytes)
+        self.max_entry_bytes = max(0, max_entry_bytes)
+        # Un snapshot más viejo que la ventana ya no se puede validar: su put se descarta
+        self.generation_window = max(1.0, generation_window)
+        self.bytes = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._groups: Dict[Tuple[str, str], Set[str]] = {}
+        # (usuario, servicio) -> (contador, instante); ordenado por última invalidación
+        self._generations: "OrderedDict[Tuple[str, str], Tuple[int, float]]" = OrderedDict()
+        self._service_generations: Dict[str, int] = {}
+        self._counter = 0
+        self._epoch = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def make_key(user_id: str, service: str, path: str, query_items: Iterable[Tuple[str, str]]) -> str:
+        # Query normalizada: mismo orden de parámetros -> misma clave
+        query = urlencode(sorted(query_items))
+        return f"{user_id}|{service}|{path}?{query}"
+
+    def snapshot(self, user_id: str, service: str) -> Tuple[int, int, float]:
+        """Punto de partida de un fetch; al guardar se descarta si hubo invalidaciones posteriores"""
+        return (self._epoch, self._counter, time.monotonic())
+
+    def _is_current(self, snapshot: Tuple[int, int, float], user_id: str, service: str) -> bool:
+        epoch, counter, taken_at = snapshot
+        if epoch != self._epoch or time.monotonic() - taken_at > self.generation_window:
+            return False
+        generation = self._generations.get((user_id, service))
+        if generation is not None and generation[0] > counter:
+            return False
+        return self._service_generations.get(service, 0) <= counter
+
+    def _prune_generations(self) -> None:
+        cutoff = time.monotonic() - self.generation_window
+        while self._generations:
+            oldest = next(iter(self._generations))
+            if self._generations[oldest][1] >= cutoff:
+                break
+            del self._generations[oldest]
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() >= entry.expires_at:
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: str, entry: CachedResponse, snapshot: Tuple[int, int, float]) -> bool:
+        if entry.size > self.max_entry_bytes or entry.size > self.max_bytes:
+            return False
+        if not self._is_current(snapshot, entry.user_id, entry.service):
+            return False
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = entry
+        self._groups.setdefault((entry.user_id, entry.service), set()).add(key)
+        self.bytes += entry.size
+        while self.bytes > self.max_bytes and self._entries:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+        return True
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self.bytes -= entry.size
+        group = self._groups.get((entry.user_id, entry.service))
+        if group is not None:
+            group.discard(key)
+            if not group:
+                del self._groups[(entry.user_id, entry.service)]
+
+    def invalidate(self, user_id: Optional[str], services: Iterable[str]) -> int:
+        """Invalida las respuestas de `services` para un usuario (o para todos si user_id es None)"""
+        removed = 0
+        self._prune_generations()
+        now = time.monotonic()
+        for service in services:
+            self._counter += 1
+            if user_id is None:
+                self._service_generations[service] = self._counter
+                keys = [k for (u, s), group in self._groups.items() if s == service for k in group]
+            else:
+                self._generations[(user_id, service)] = (self._counter, now)
+                self._generations.move_to_end((user_id, service))
+                keys = list(self._groups.get((user_id, service), ()))
+            for key in keys:
+                self._remove(key)
+                removed += 1
+        return removed
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._groups.clear()
+        self._generations.clear()
+        self._service_generations.clear()
+        self.bytes = 0
+        # Tras un clear cualquier snapshot previo queda inválido
+        self._epoch += 1
+
+
+def handle_event(cache: ResponseCache, routing_key: str, body: bytes) -> int:
+    entity = routing_key.split(".", 1)[0]
+    services = INVALIDATION_MAP.get(entity)
+    if not services:
+        return 0
+    user_id = None
+    try:
+        payload = json.loads(body)
+        if isinstance(payload, dict) and payload.get("user_id") is not None:
+            user_id = str(payload["user_id"])
+    except Exception:
+        pass
+    return cache.invalidate(user_id, services)
+
+
+async def run_invalidation_consumer(
+    cache: ResponseCache,
+    url: str,
+    exchange_name: str,
+    on_event: Optional[Callable[[str, int], None]] = None,
+    reconnect_seconds: float = 5.0,
+) -> None:
+    import aio_pika
+
+    while True:
+        try:
+            connection = await aio_pika.connect_robust(url)
+            async with connection:
+                channel = await connection.channel()
+                exchange = await channel.declare_exchange(exchange_name, aio_pika.ExchangeType.TOPIC, durable=True)
+                # Cola exclusiva por réplica: todas las réplicas reciben todas las invalidaciones
+                queue = await channel.declare_queue("", exclusive=True, auto_delete=True)
+                for entity in INVALIDATION_MAP:
+                    await queue.bind(exchange, routing_key=f"{entity}.*")
+                # Eventos perdidos mientras no había conexión: empezar desde cero
+                cache.clear()
+                logger.info(f"Invalidación de caché suscrita a {exchange_name}")
+                async with queue.iterator() as messages:
+                    async for message in messages:
+                        async with message.process():
+                            removed = handle_event(cache, message.routing_key or "", message.body)
+                            if on_event is not None:
+                                on_event(message.routing_key or "", removed)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Consumidor de invalidaciones desconectado: {e}")
+            await asyncio.sleep(reconnect_seconds)
@@ -0,0 +1,46 @@
+"""
+Coalescing (single-flight) de requests idénticos para el API Gateway de TaskNotes.
+
+El primer request de una clave lanza el fetch en una task propia; los
+siguientes que llegan mientras sigue en vuelo esperan el mismo resultado. La
+task no depende del request que la inició, así que si ese cliente se
+desconecta el resto de esperas no se cancela.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+
+class _Call:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Future):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    def __init__(self, max_waiters: int = 100):
+        self.max_waiters = max(0, max_waiters)
+        self._calls: Dict[str, _Call] = {}
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Ejecuta `fn` una vez por clave en vuelo; devuelve (resultado, compartido)"""
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.ensure_future(fn()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _task, k=key, c=call: self._forget(k, c))
+            return await asyncio.shield(call.task), False
+        if call.waiters >= self.max_waiters:
+            # Tope de esperas alcanzado: este request va por su cuenta
+            return await fn(), False
+        call.waiters += 1
+        return await asyncio.shield(call.task), True
+
+    def _forget(self, key: str, call: _Call) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
@@ -85,7 +85,13 @@ db.createCollection('note_history', {
 
 // Índices para rendimiento y búsqueda de texto
 db.notes.createIndex({ user_id: 1 });
-db.notes.createIndex({ title: 'text', content: 'text', tags: 'text' });
+// Mismos índices que asegura notes-service al arrancar (app/database/indexes.py)
+db.notes.createIndex({ user_id: 1, updated_at: -1 }, { name: 'notes_user_updated' });
+db.notes.createIndex(
+  { user_id: 1, title: 'text', content: 'text' },
+  { name: 'notes_user_text', weights: { title: 10, content: 2 }, default_language: 'spanish' }
+);
+db.notes.createIndex({ tag_ids: 1 }, { name: 'notes_tag_ids' });
 db.notes.createIndex({ created_at: -1 });
 db.notes.createIndex({ updated_at: -1 });
 db.notes.createIndex({ category: 1 });
@@ -0,0 +1,54 @@
+import logging
+import os
+
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+from pymongo.errors import OperationFailure
+
+from app.database.mongodb import get_collection
+
+# Índices de `notes` que usan las consultas calientes (listado, búsqueda REST y gRPC).
+# Se aseguran al arrancar; crear un índice que ya existe con las mismas opciones no hace nada.
+NOTES_TEXT_LANGUAGE = os.getenv("NOTES_TEXT_LANGUAGE", "spanish")
+NOTES_TEXT_INDEX = "notes_user_text"
+NOTES_TEXT_WEIGHTS = {"title": 10, "content": 2}
+
+logger = logging.getLogger("indexes")
+
+NOTES_INDEXES = [
+    # Listado por usuario ordenado por fecha de actualización
+    IndexModel([("user_id", ASCENDING), ("updated_at", DESCENDING)], name="notes_user_updated"),
+    # $text siempre va con user_id por igualdad: el prefijo acota el escaneo al usuario
+    IndexModel(
+        [("user_id", ASCENDING), ("title", TEXT), ("content", TEXT)],
+        name=NOTES_TEXT_INDEX,
+        weights=NOTES_TEXT_WEIGHTS,
+        default_language=NOTES_TEXT_LANGUAGE,
+    ),
+    IndexModel([("tag_ids", ASCENDING)], name="notes_tag_ids"),
+]
+
+
+async def _drop_stale_text_index(collection) -> None:
+    """Mongo admite un solo índice de texto por colección: se reemplaza si no es el nuestro"""
+    async for index in collection.list_indexes():
+        if "textIndexVersion" not in index:
+            continue
+        current = (
+            index["name"] == NOTES_TEXT_INDEX
+            and dict(index.get("weights", {})) == NOTES_TEXT_WEIGHTS
+            and index.get("default_language") == NOTES_TEXT_LANGUAGE
+        )
+        if not current:
+            logger.info(f"Reemplazando índice de texto {index['name']} por {NOTES_TEXT_INDEX}")
+            await collection.drop_index(index["name"])
+
+
+async def ensure_indexes() -> None:
+    collection = await get_collection("notes")
+    await _drop_stale_text_index(collection)
+    for model in NOTES_INDEXES:
+        try:
+            await collection.create_indexes([model])
+        except OperationFailure as e:
+            # Un índice con el mismo nombre y otras opciones no debe impedir el arranque
+            logger.warning(f"No se pudo crear el índice {model.document['name']}: {e}")
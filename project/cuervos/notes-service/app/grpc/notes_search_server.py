@@ -2,11 +2,10 @@ import asyncio
 import grpc
 from concurrent import futures
 from typing import List, Optional
-from sqlalchemy.orm import Session
 
 from app.database.mongodb import get_collection
-from app.database.postgres import get_db
-from app.services.expand import expand_category, expand_tags
+from app.services.expand import expand_notes
+from app.services.note_queries import sort_spec, text_filter
 from app.grpc.generated import notes_search_pb2, notes_search_pb2_grpc, common_pb2
 
 
@@ -33,113 +32,90 @@ class NotesSearchServicer(notes_search_pb2_grpc.NotesSearchServiceServicer):
             
             # Obtener conexiones
             collection = await get_collection("notes")
-            db_gen = get_db()
-            db = next(db_gen)
+
+            # Construir query de MongoDB
+            query = {"user_id": request.user_id}
             
-            try:
-                # Construir query de MongoDB
-                query = {"user_id": request.user_id}
-                
-                # Búsqueda de texto
-                if len(request.query) >= 3:
-                    # Usar índice de texto completo
-                    query["$text"] = {"$search": request.query}
-                else:
-                    # Fallback a regex para queries cortas
-                    query["$or"] = [
-                        {"title": {"$regex": request.query, "$options": "i"}},
-                        {"content": {"$regex": request.query, "$options": "i"}},
-                    ]
-                
-                # Filtros opcionales
-                if request.category:
-                    if len(request.category) > 100:
-                        context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
-                        context.set_details("Category name too long")
-                        return notes_search_pb2.SearchNotesResponse()
-                    query["category"] = request.category
+            # Búsqueda de texto: índice de texto o regex anclada para queries cortas
+            if request.query.strip():
+                query.update(text_filter(request.query))
+            
+            # Filtros opcionales
+            if request.category:
+                if len(request.category) > 100:
+                    context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+                    context.set_details("Category name too long")
+                    return notes_search_pb2.SearchNotesResponse()
+                query["category"] = request.category
+            
+            if request.tags:
+                if len(request.tags) > 20:
+                    context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+                    context.set_details("Too many tags")
+                    return notes_search_pb2.SearchNotesResponse()
                 
-                if request.tags:
-                    if len(request.tags) > 20:
+                # Validar longitud de tags
+                for tag in request.tags:
+                    if len(tag) > 50:
                         context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
-                        context.set_details("Too many tags")
+                        context.set_details("Tag name too long")
                         return notes_search_pb2.SearchNotesResponse()
-                    
-                    # Validar longitud de tags
-                    for tag in request.tags:
-                        if len(tag) > 50:
-                            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
-                            context.set_details("Tag name too long")
-                            return notes_search_pb2.SearchNotesResponse()
-                    
-                    query["tags"] = {"$in": list(request.tags)}
-                
-                # Contar total
-                total = await collection.count_documents(query)
-                
-                # Ejecutar búsqueda con paginación
-                cursor = collection.find(query).skip(skip).limit(limit)
                 
-                # Ordenamiento
-                if len(request.query) >= 3 and "$text" in query:
-                    cursor = cursor.sort([
-                        ("score", {"$meta": "textScore"}),
-                        ("updated_at", -1)
-                    ])
-                else:
-                    cursor = cursor.sort("updated_at", -1)
-                
-                notes = await cursor.to_list(length=limit)
+                query["tags"] = {"$in": list(request.tags)}
+            
+            # Contar total
+            total = await collection.count_documents(query)
+            
+            # Ejecutar búsqueda con paginación
+            cursor = collection.find(query).skip(skip).limit(limit)
+            
+            # Ordenamiento: por score si se usó el índice de texto
+            cursor = cursor.sort(sort_spec(request.query))
+            
+            notes = await cursor.to_list(length=limit)
+            
+            # Expandir categorías y tags de toda la página en lote
+            expanded = await expand_notes(
+                [{"category_id": n.get("category_id"), "tag_ids": n.get("tag_ids", [])} for n in notes],
+                request.user_id,
+            )
+
+            # Convertir a formato gRPC
+            search_results = []
+            for note, extra in zip(notes, expanded):
+                # Crear resultado
+                result = notes_search_pb2.NoteSearchResult(
+                    id=str(note.get("_id")),
+                    title=note.get("title", ""),
+                    content=note.get("content", ""),
+                    category_id=note.get("category_id", ""),
+                    tag_ids=note.get("tag_ids", []),
+                    user_id=note.get("user_id", 0),
+                    created_at=note.get("created_at").isoformat() if note.get("created_at") else "",
+                    updated_at=note.get("updated_at").isoformat() if note.get("updated_at") else ""
+                )
                 
-                # Convertir a formato gRPC
-                search_results = []
-                for note in notes:
-                    # Expandir categoría y tags
-                    category = None
-                    if note.get("category_id"):
-                        cat_data = expand_category(note.get("category_id"), db)
-                        if cat_data:
-                            category = common_pb2.CategorySummary(
-                                id=str(cat_data["id"]),
-                                name=cat_data["name"],
-                                color=cat_data.get("color", "")
-                            )
-                    
-                    tags = []
-                    if note.get("tag_ids"):
-                        tags_data = expand_tags(note.get("tag_ids", []), db)
-                        for tag_data in tags_data:
-                            tags.append(common_pb2.TagSummary(
-                                id=str(tag_data["id"]),
-                                name=tag_data["name"],
-                                color=tag_data.get("color", "")
-                            ))
-                    
-                    # Crear resultado
-                    result = notes_search_pb2.NoteSearchResult(
-                        id=str(note.get("_id")),
-                        title=note.get("title", ""),
-                        content=note.get("content", ""),
-                        category_id=note.get("category_id", ""),
-                        tag_ids=note.get("tag_ids", []),
-                        user_id=note.get("user_id", 0),
-                        created_at=note.get("created_at").isoformat() if note.get("created_at") else "",
-                        updated_at=note.get("updated_at").isoformat() if note.get("updated_at") else ""
-                    )
-                    
-                    if category:
-                        result.category.CopyFrom(category)
-                    
-                    result.tags.extend(tags)
-                    search_results.append(result)
+                cat_data = extra["category"]
+                if cat_data:
+                    result.category.CopyFrom(common_pb2.CategorySummary(
+                        id=str(cat_data["id"]),
+                        name=cat_data["name"] or "",
+                        color=cat_data.get("color") or ""
+                    ))
                 
-                return notes_search_pb2.SearchNotesResponse(
-                    notes=search_results,
-                    total=total
+                result.tags.extend(
+                    common_pb2.TagSummary(
+                        id=str(tag_data["id"]),
+                        name=tag_data["name"] or "",
+                        color=tag_data.get("color") or ""
+                    ) for tag_data in extra["tags"]
                 )
-                
-            finally:
-                db.close()
+                search_results.append(result)
+            
+            return notes_search_pb2.SearchNotesResponse(
+                notes=search_results,
+                total=total
+            )
                 
         except Exception as e:
             context.set_code(grpc.StatusCode.INTERNAL)
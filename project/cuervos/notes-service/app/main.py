@@ -38,6 +38,22 @@ def metrics():
 
 @app.on_event("startup")
 async def startup_event():
-    """Inicia el servidor gRPC en paralelo con FastAPI"""
+    """Asegura índices e inicia el servidor gRPC en paralelo con FastAPI y el publicador de eventos"""
+    from app.database.indexes import ensure_indexes
     from app.grpc.notes_search_server import serve_grpc
-    asyncio.create_task(serve_grpc())
\ No newline at end of file
+    from app.services.events import start_publisher
+    from app.services.history import start_history_writer
+    await ensure_indexes()
+    await start_publisher()
+    await start_history_writer()
+    asyncio.create_task(serve_grpc())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    from app.services.events import stop_publisher
+    from app.services.expand import close_client
+    from app.services.history import stop_history_writer
+    # Antes de cerrar se escriben el historial y los eventos que quedan en cola
+    await stop_history_writer()
+    await stop_publisher()
+    await close_client()
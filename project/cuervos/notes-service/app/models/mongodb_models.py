@@ -4,8 +4,15 @@ from bson import ObjectId
 
 # Modelos tipo documento para referencia (no ODM). Usamos dicts con Motor.
 
-def note_doc(title: str, content: str, user_id: int, category_id: Optional[str], tag_ids: List[str]) -> Dict[str, Any]:
+def mongo_now() -> datetime:
+    """Hora UTC con la precisión que guarda Mongo (milisegundos)"""
     now = datetime.utcnow()
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+
+def note_doc(title: str, content: str, user_id: int, category_id: Optional[str], tag_ids: List[str]) -> Dict[str, Any]:
+    # Milisegundos: la respuesta del POST (sin releer) coincide con lo que devuelven los GET
+    now = mongo_now()
     return {
         "title": title,
         "content": content,
@@ -1,12 +1,16 @@
-from typing import Optional
-from fastapi import APIRouter, Depends, HTTPException, Header
+from typing import Optional, Union
+from fastapi import APIRouter, Depends, HTTPException, Header, Query
+from fastapi.responses import JSONResponse
 from bson import ObjectId
+from pymongo import ReturnDocument
 
 from app.database.mongodb import get_collection
-from app.schemas.note_schemas import Note as NoteSchema, NoteCreate, NoteUpdate, PaginatedResponse
-from app.services.expand import expand_category, expand_tags
-from app.models.mongodb_models import note_doc, note_history_doc
+from app.schemas.note_schemas import Note as NoteSchema, NoteCreate, NoteSummary, NoteUpdate, PaginatedResponse
+from app.services.expand import expand_notes
+from app.services.note_queries import SUMMARY_CODEC_OPTIONS, SUMMARY_PROJECTION, sort_spec, summary_item, text_filter
+from app.models.mongodb_models import mongo_now, note_doc, note_history_doc
 from app.services.events import publish_event
+from app.services.history import record_history
 
 router = APIRouter(prefix="/notes", tags=["notes"])
 
@@ -14,19 +18,29 @@ router = APIRouter(prefix="/notes", tags=["notes"])
 def get_current_user_id(x_user_id: Optional[int] = Header(default=None)) -> int:
     return x_user_id or 1
 
-@router.get("/", response_model=PaginatedResponse[NoteSchema])
-async def read_notes(page: int = 1, size: int = 20, search: Optional[str] = None, user_id: int = Depends(get_current_user_id)):
+@router.get("/", response_model=Union[PaginatedResponse[NoteSchema], PaginatedResponse[NoteSummary]])
+async def read_notes(
+    page: int = 1,
+    size: int = 20,
+    search: Optional[str] = None,
+    view: str = Query("full", pattern="^(full|summary)$"),
+    user_id: int = Depends(get_current_user_id),
+):
     collection = await get_collection("notes")
     query = {"user_id": user_id}
-    if search:
-        query["$or"] = [
-            {"title": {"$regex": search, "$options": "i"}},
-            {"content": {"$regex": search, "$options": "i"}},
-            {"tag_ids": {"$in": [search]}},
-        ]
+    if search and search.strip():
+        query.update(text_filter(search))
     skip = (page - 1) * size
     total = await collection.count_documents(query)
-    cursor = collection.find(query).skip(skip).limit(size).sort("updated_at", -1)
+    pages = (total + size - 1) // size
+    if view == "summary":
+        raw_collection = collection.with_options(codec_options=SUMMARY_CODEC_OPTIONS)
+        cursor = raw_collection.find(query, SUMMARY_PROJECTION).skip(skip).limit(size).sort(sort_spec(search or ""))
+        items = [summary_item(raw) for raw in await cursor.to_list(length=size)]
+        await expand_notes(items, user_id)
+        # Ya es JSON válido: se devuelve directo, sin la validación de response_model
+        return JSONResponse({"items": items, "total": total, "page": page, "size": size, "pages": pages})
+    cursor = collection.find(query).skip(skip).limit(size).sort(sort_spec(search or ""))
     notes = await cursor.to_list(length=size)
 
     items = []
@@ -41,18 +55,18 @@ async def read_notes(page: int = 1, size: int = 20, search: Optional[str] = None
             "created_at": n.get("created_at"),
             "updated_at": n.get("updated_at"),
         }
-        note["category"] = expand_category(note.get("category_id"), user_id) if note.get("category_id") else None
-        note["tags"] = expand_tags(note.get("tag_ids", []), user_id)
         items.append(note)
-    pages = (total + size - 1) // size
+    # Categorías y tags de toda la página en una llamada por servicio
+    await expand_notes(items, user_id)
     return {"items": items, "total": total, "page": page, "size": size, "pages": pages}
 
 @router.post("/", response_model=NoteSchema, status_code=201)
 async def create_note(note_in: NoteCreate, user_id: int = Depends(get_current_user_id)):
     collection = await get_collection("notes")
     doc = note_doc(title=note_in.title, content=note_in.content, user_id=user_id, category_id=note_in.category_id, tag_ids=note_in.tag_ids)
-    result = await collection.insert_one(doc)
-    created = await collection.find_one({"_id": result.inserted_id})
+    # insert_one asigna `_id` en doc: no hace falta releer la nota
+    await collection.insert_one(doc)
+    created = doc
     note = {
         "id": str(created.get("_id")),
         "title": created.get("title"),
@@ -63,11 +77,9 @@ async def create_note(note_in: NoteCreate, user_id: int = Depends(get_current_us
         "created_at": created.get("created_at"),
         "updated_at": created.get("updated_at"),
     }
-    note["category"] = expand_category(note.get("category_id"), user_id) if note.get("category_id") else None
-    note["tags"] = expand_tags(note.get("tag_ids", []), user_id)
-    # Historial
-    history_col = await get_collection("note_history")
-    await history_col.insert_one(note_history_doc(note_id=note["id"], title=note["title"], content=note["content"], user_id=user_id, category_id=note.get("category_id"), tag_ids=note.get("tag_ids", []), action="created"))
+    await expand_notes([note], user_id)
+    # Historial (se escribe en lote en segundo plano)
+    await record_history(note_history_doc(note_id=note["id"], title=note["title"], content=note["content"], user_id=user_id, category_id=note.get("category_id"), tag_ids=note.get("tag_ids", []), action="created"))
     publish_event(
         "note.created",
         {
@@ -102,8 +114,7 @@ async def read_note(note_id: str, user_id: int = Depends(get_current_user_id)):
         "created_at": n.get("created_at"),
         "updated_at": n.get("updated_at"),
     }
-    note["category"] = expand_category(note.get("category_id"), user_id) if note.get("category_id") else None
-    note["tags"] = expand_tags(note.get("tag_ids", []), user_id)
+    await expand_notes([note], user_id)
     return note
 
 @router.put("/{note_id}", response_model=NoteSchema)
@@ -113,9 +124,6 @@ async def update_note(note_id: str, patch: NoteUpdate, user_id: int = Depends(ge
         oid = ObjectId(note_id)
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid note ID")
-    n = await collection.find_one({"_id": oid, "user_id": user_id})
-    if not n:
-        raise HTTPException(status_code=404, detail="Note not found")
     update = {}
     if patch.title is not None:
         update["title"] = patch.title
@@ -126,9 +134,15 @@ async def update_note(note_id: str, patch: NoteUpdate, user_id: int = Depends(ge
     if patch.tag_ids is not None:
         update["tag_ids"] = patch.tag_ids
     if update:
-        update["updated_at"] = n.get("updated_at")  # keep last or set now
-    await collection.update_one({"_id": oid}, {"$set": update})
-    n2 = await collection.find_one({"_id": oid})
+        update["updated_at"] = mongo_now()
+        # Actualiza y devuelve la nota resultante en un solo round trip
+        n2 = await collection.find_one_and_update(
+            {"_id": oid, "user_id": user_id}, {"$set": update}, return_document=ReturnDocument.AFTER
+        )
+    else:
+        n2 = await collection.find_one({"_id": oid, "user_id": user_id})
+    if not n2:
+        raise HTTPException(status_code=404, detail="Note not found")
     note = {
         "id": str(n2.get("_id")),
         "title": n2.get("title"),
@@ -139,11 +153,9 @@ async def update_note(note_id: str, patch: NoteUpdate, user_id: int = Depends(ge
         "created_at": n2.get("created_at"),
         "updated_at": n2.get("updated_at"),
     }
-    note["category"] = expand_category(note.get("category_id"), user_id) if note.get("category_id") else None
-    note["tags"] = expand_tags(note.get("tag_ids", []), user_id)
-    # Historial
-    history_col = await get_collection("note_history")
-    await history_col.insert_one(note_history_doc(note_id=note["id"], title=note["title"], content=note["content"], user_id=user_id, category_id=note.get("category_id"), tag_ids=note.get("tag_ids", []), action="updated"))
+    await expand_notes([note], user_id)
+    # Historial (se escribe en lote en segundo plano)
+    await record_history(note_history_doc(note_id=note["id"], title=note["title"], content=note["content"], user_id=user_id, category_id=note.get("category_id"), tag_ids=note.get("tag_ids", []), action="updated"))
     publish_event(
         "note.updated",
         {
@@ -165,12 +177,11 @@ async def delete_note(note_id: str, user_id: int = Depends(get_current_user_id))
         oid = ObjectId(note_id)
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid note ID")
-    n = await collection.find_one({"_id": oid, "user_id": user_id})
+    # Borra y devuelve el documento borrado (para historial y evento) en un solo round trip
+    n = await collection.find_one_and_delete({"_id": oid, "user_id": user_id})
     if not n:
         raise HTTPException(status_code=404, detail="Note not found")
-    await collection.delete_one({"_id": oid})
-    history_col = await get_collection("note_history")
-    await history_col.insert_one(note_history_doc(note_id=str(oid), title=n.get("title"), content=n.get("content"), user_id=user_id, category_id=n.get("category_id"), tag_ids=n.get("tag_ids", []), action="deleted"))
+    await record_history(note_history_doc(note_id=str(oid), title=n.get("title"), content=n.get("content"), user_id=user_id, category_id=n.get("category_id"), tag_ids=n.get("tag_ids", []), action="deleted"))
     publish_event(
         "note.deleted",
         {
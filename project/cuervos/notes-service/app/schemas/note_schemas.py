@@ -46,4 +46,16 @@ class Note(BaseModel):
     category_id: Optional[str] = None
     tag_ids: List[str] = []
     category: Optional[CategorySummary] = None
-    tags: List[TagSummary] = []
\ No newline at end of file
+    tags: List[TagSummary] = []
+
+class NoteSummary(BaseModel):
+    """Elemento del listado `view=summary`: preview recortado en lugar del contenido"""
+    id: str
+    title: str
+    preview: str
+    created_at: datetime
+    updated_at: datetime
+    category_id: Optional[str] = None
+    tag_ids: List[str] = []
+    category: Optional[CategorySummary] = None
+    tags: List[TagSummary] = []
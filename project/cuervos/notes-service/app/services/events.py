@@ -1,26 +1,186 @@
-import os
+import asyncio
 import json
-import pika
+import logging
+import os
+from typing import List, Optional, Tuple
+
+import aio_pika
+from aio_pika.pool import Pool
+from prometheus_client import Counter, Gauge
 
 RABBITMQ_URL = os.getenv("RABBITMQ_URL", "amqp://rabbitmq:5672")
 EXCHANGE_NAME = os.getenv("EVENTS_EXCHANGE", "tasknotes.events")
 
+# Publicador persistente: una conexión AMQP con pool de canales (publisher confirms), exchange
+# declarado una sola vez y una cola acotada en memoria que se publica en lotes. publish_event
+# no bloquea el handler; si la cola se llena el evento se descarta y se cuenta en métricas.
+EVENTS_QUEUE_MAX = int(os.getenv("EVENTS_QUEUE_MAX", "10000"))
+EVENTS_BATCH_SIZE = int(os.getenv("EVENTS_BATCH_SIZE", "100"))
+EVENTS_LINGER_SECONDS = float(os.getenv("EVENTS_LINGER_SECONDS", "0.005"))
+EVENTS_CHANNEL_POOL_SIZE = int(os.getenv("EVENTS_CHANNEL_POOL_SIZE", "4"))
+EVENTS_PUBLISH_TIMEOUT_SECONDS = float(os.getenv("EVENTS_PUBLISH_TIMEOUT_SECONDS", "10"))
+EVENTS_RETRY_MAX_SECONDS = float(os.getenv("EVENTS_RETRY_MAX_SECONDS", "30"))
+EVENTS_SHUTDOWN_TIMEOUT_SECONDS = float(os.getenv("EVENTS_SHUTDOWN_TIMEOUT_SECONDS", "10"))
+
+logger = logging.getLogger("events")
+
+EVENTS_QUEUE_SIZE = Gauge("notes_events_queue_size", "Eventos en memoria pendientes de publicar")
+EVENTS_PUBLISHED = Counter("notes_events_published_total", "Eventos publicados y confirmados por RabbitMQ")
+EVENTS_FAILURES = Counter("notes_events_publish_failures_total", "Publicaciones fallidas (se reintentan)")
+EVENTS_DROPPED = Counter("notes_events_dropped_total", "Eventos descartados (cola llena o publicador detenido)")
+
+Event = Tuple[str, bytes]
+
+
+class EventPublisher:
+    """Publica eventos en RabbitMQ desde una cola en memoria, en lotes y con confirms"""
+
+    def __init__(self, url: str = RABBITMQ_URL, exchange_name: str = EXCHANGE_NAME):
+        self.url = url
+        self.exchange_name = exchange_name
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._connection = None
+        self._channel_pool: Optional[Pool] = None
+        # Eventos de un lote que no se confirmaron; se reintentan antes que la cola
+        self._pending: List[Event] = []
+
+    async def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize=EVENTS_QUEUE_MAX)
+        EVENTS_QUEUE_SIZE.set_function(lambda: (self._queue.qsize() if self._queue else 0) + len(self._pending))
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Vacía la cola (con límite de tiempo) y cierra canales y conexión"""
+        if self._worker is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), EVENTS_SHUTDOWN_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            lost = self._queue.qsize() + len(self._pending)
+            EVENTS_DROPPED.inc(lost)
+            logger.warning(f"Apagado con {lost} eventos sin publicar")
+        self._worker.cancel()
+        try:
+            await self._worker
+        except (asyncio.CancelledError, Exception):
+            pass
+        self._worker = None
+        self._loop = None
+        await self._close_connection()
+
+    def publish(self, routing_key: str, payload: dict) -> None:
+        """Encola el evento sin bloquear; se puede llamar desde cualquier hilo"""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            EVENTS_DROPPED.inc()
+            logger.warning(f"Publicador de eventos detenido, se descarta {routing_key}")
+            return
+        loop.call_soon_threadsafe(self._enqueue, (routing_key, json.dumps(payload).encode("utf-8")))
+
+    def _enqueue(self, event: Event) -> None:
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            EVENTS_DROPPED.inc()
+            logger.warning(f"Cola de eventos llena, se descarta {event[0]}")
+
+    async def _next_batch(self) -> List[Event]:
+        batch = [await self._queue.get()]
+        # Espera breve para juntar más eventos si la cola no alcanza un lote completo
+        if EVENTS_LINGER_SECONDS > 0 and self._queue.qsize() < EVENTS_BATCH_SIZE - 1:
+            await asyncio.sleep(EVENTS_LINGER_SECONDS)
+        while len(batch) < EVENTS_BATCH_SIZE and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _run(self) -> None:
+        attempts = 0
+        while True:
+            batch = self._pending or await self._next_batch()
+            try:
+                failed = await self._publish_batch(batch)
+            except Exception as e:
+                logger.warning(f"RabbitMQ no disponible: {e}")
+                await self._close_connection()
+                failed = batch
+            published = len(batch) - len(failed)
+            EVENTS_PUBLISHED.inc(published)
+            EVENTS_FAILURES.inc(len(failed))
+            self._pending = failed
+            # task_done solo cuando el evento queda confirmado: queue.join() espera a los reintentos
+            for _ in range(published):
+                self._queue.task_done()
+            if failed:
+                attempts += 1
+                await asyncio.sleep(min(EVENTS_RETRY_MAX_SECONDS, 0.5 * (2 ** (attempts - 1))))
+            else:
+                attempts = 0
+
+    async def _ensure_connection(self) -> None:
+        if self._connection is not None and not self._connection.is_closed:
+            return
+        self._connection = await aio_pika.connect_robust(self.url)
+        # El exchange se declara una vez por conexión; los canales del pool solo lo referencian
+        channel = await self._connection.channel()
+        await channel.declare_exchange(self.exchange_name, aio_pika.ExchangeType.TOPIC, durable=True)
+        await channel.close()
+        self._channel_pool = Pool(self._open_channel, max_size=EVENTS_CHANNEL_POOL_SIZE)
+
+    async def _open_channel(self):
+        return await self._connection.channel(publisher_confirms=True)
+
+    async def _close_connection(self) -> None:
+        pool, connection = self._channel_pool, self._connection
+        self._channel_pool, self._connection = None, None
+        for resource in (pool, connection):
+            if resource is not None:
+                try:
+                    await resource.close()
+                except Exception:
+                    pass
+
+    async def _publish_batch(self, batch: List[Event]) -> List[Event]:
+        """Reparte el lote entre los canales del pool; devuelve los eventos no confirmados"""
+        await self._ensure_connection()
+        chunks = [batch[i::EVENTS_CHANNEL_POOL_SIZE] for i in range(EVENTS_CHANNEL_POOL_SIZE)]
+        chunks = [chunk for chunk in chunks if chunk]
+        results = await asyncio.gather(*[self._publish_chunk(chunk) for chunk in chunks], return_exceptions=True)
+        failed: List[Event] = []
+        for chunk, result in zip(chunks, results):
+            failed.extend(chunk if isinstance(result, BaseException) else result)
+        return failed
+
+    async def _publish_chunk(self, chunk: List[Event]) -> List[Event]:
+        async with self._channel_pool.acquire() as channel:
+            exchange = await channel.get_exchange(self.exchange_name, ensure=False)
+            # Los confirms del trozo se esperan juntos: un round-trip por trozo, no por mensaje
+            results = await asyncio.gather(
+                *[
+                    exchange.publish(
+                        aio_pika.Message(body=body, content_type="application/json", delivery_mode=aio_pika.DeliveryMode.PERSISTENT),
+                        routing_key=routing_key,
+                        timeout=EVENTS_PUBLISH_TIMEOUT_SECONDS,
+                    )
+                    for routing_key, body in chunk
+                ],
+                return_exceptions=True,
+            )
+        return [event for event, result in zip(chunk, results) if isinstance(result, BaseException)]
+
+
+publisher = EventPublisher()
+
+
+async def start_publisher() -> None:
+    await publisher.start()
+
 
-def _get_connection_channel():
-    params = pika.URLParameters(RABBITMQ_URL)
-    connection = pika.BlockingConnection(params)
-    channel = connection.channel()
-    channel.exchange_declare(exchange=EXCHANGE_NAME, exchange_type="topic", durable=True)
-    return connection, channel
+async def stop_publisher() -> None:
+    await publisher.stop()
 
 
 def publish_event(routing_key: str, payload: dict) -> None:
-    connection, channel = _get_connection_channel()
-    body = json.dumps(payload)
-    channel.basic_publish(
-        exchange=EXCHANGE_NAME,
-        routing_key=routing_key,
-        body=body,
-        properties=pika.BasicProperties(content_type="application/json", delivery_mode=2),
-    )
-    connection.close()
\ No newline at end of file
+    publisher.publish(routing_key, payload)
@@ -1,59 +1,82 @@
+import asyncio
 import os
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, Iterable, List, Optional
 
 import httpx
 
 # Base URLs de servicios centrales (con valores por defecto para entorno docker)
 TAGS_SERVICE_URL = os.getenv("TAGS_SERVICE_URL", "http://tags-service:8005")
 CATEGORIES_SERVICE_URL = os.getenv("CATEGORIES_SERVICE_URL", "http://categories-service:8006")
+# Timeout por llamada: si un servicio tarda, la nota sale sin expandir en vez de esperar
+EXPAND_TIMEOUT_SECONDS = float(os.getenv("EXPAND_TIMEOUT_SECONDS", "2.0"))
+EXPAND_MAX_CONNECTIONS = int(os.getenv("EXPAND_MAX_CONNECTIONS", "100"))
 
+# Cliente async compartido (keep-alive); se crea en el primer uso y se cierra al apagar
+_client: Optional[httpx.AsyncClient] = None
 
-def expand_category(category_id: Optional[str], user_id: int) -> Dict[str, Any] | None:
-    if not category_id:
-        return None
+
+def _get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=EXPAND_TIMEOUT_SECONDS,
+            limits=httpx.Limits(max_connections=EXPAND_MAX_CONNECTIONS, max_keepalive_connections=EXPAND_MAX_CONNECTIONS),
+        )
+    return _client
+
+
+async def close_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def _key(value: Any) -> Optional[str]:
+    """Id normalizado ('07' -> '7'); None si no es numérico"""
     try:
-        cid = int(category_id)
+        return str(int(value))
     except (ValueError, TypeError):
         return None
 
-    url = f"{CATEGORIES_SERVICE_URL}/internal/categories"
-    headers = {"X-User-Id": str(user_id)}
-    params = {"ids": str(cid)}
-    try:
-        with httpx.Client(timeout=5.0) as client:
-            resp = client.get(url, headers=headers, params=params)
-            if resp.status_code != 200:
-                return None
-            data = resp.json() or []
-            if not data:
-                return None
-            cat = data[0]
-            return {"id": str(cat.get("id")), "name": cat.get("name"), "color": cat.get("color")}
-    except Exception:
-        return None
 
+def _valid_ids(ids: Iterable[Any]) -> List[int]:
+    return sorted({int(key) for key in map(_key, ids) if key is not None})
 
-def expand_tags(tag_ids: List[str], user_id: int) -> List[Dict[str, Any]]:
-    if not tag_ids:
-        return []
-    valid_ids: List[int] = []
-    for tid in tag_ids:
-        try:
-            valid_ids.append(int(tid))
-        except (ValueError, TypeError):
-            continue
-    if not valid_ids:
-        return []
 
-    url = f"{TAGS_SERVICE_URL}/internal/tags"
+async def _fetch(url: str, ids: Iterable[Any], user_id: int) -> Dict[str, Dict[str, Any]]:
+    """Resuelve varios ids con un único GET `?ids=1,2,3`; devuelve id (str) -> resumen"""
+    valid_ids = _valid_ids(ids)
+    if not valid_ids:
+        return {}
     headers = {"X-User-Id": str(user_id)}
     params = {"ids": ",".join(str(i) for i in valid_ids)}
     try:
-        with httpx.Client(timeout=5.0) as client:
-            resp = client.get(url, headers=headers, params=params)
-            if resp.status_code != 200:
-                return []
-            data = resp.json() or []
-            return [{"id": str(t.get("id")), "name": t.get("name"), "color": t.get("color")} for t in data]
+        resp = await _get_client().get(url, headers=headers, params=params, timeout=EXPAND_TIMEOUT_SECONDS)
+        if resp.status_code != 200:
+            return {}
+        data = resp.json() or []
+        return {str(item.get("id")): {"id": str(item.get("id")), "name": item.get("name"), "color": item.get("color")} for item in data}
     except Exception:
-        return []
\ No newline at end of file
+        return {}
+
+
+async def fetch_categories(category_ids: Iterable[Any], user_id: int) -> Dict[str, Dict[str, Any]]:
+    return await _fetch(f"{CATEGORIES_SERVICE_URL}/internal/categories", category_ids, user_id)
+
+
+async def fetch_tags(tag_ids: Iterable[Any], user_id: int) -> Dict[str, Dict[str, Any]]:
+    return await _fetch(f"{TAGS_SERVICE_URL}/internal/tags", tag_ids, user_id)
+
+
+async def expand_notes(notes: List[Dict[str, Any]], user_id: int) -> List[Dict[str, Any]]:
+    """Añade `category` y `tags` a cada nota: una llamada por servicio para toda la página, en paralelo"""
+    categories, tags = await asyncio.gather(
+        fetch_categories((n.get("category_id") for n in notes if n.get("category_id")), user_id),
+        fetch_tags((tid for n in notes for tid in (n.get("tag_ids") or [])), user_id),
+    )
+    for note in notes:
+        note["category"] = categories.get(_key(note.get("category_id")))
+        tag_keys = (_key(tid) for tid in (note.get("tag_ids") or []))
+        note["tags"] = [tags[key] for key in tag_keys if key in tags]
+    return notes
@@ -0,0 +1,95 @@
+import asyncio
+import logging
+import os
+from typing import Any, Dict, List, Optional
+
+from prometheus_client import Counter, Gauge, Histogram
+
+from app.database.mongodb import get_collection
+
+# Escritor de `note_history` en segundo plano: los handlers encolan la entrada y siguen; un worker
+# la inserta con insert_many al juntar HISTORY_BATCH_SIZE entradas o cada HISTORY_FLUSH_INTERVAL_SECONDS.
+# Si la cola se llena, la entrada se inserta directamente (el handler espera, no se pierde historial).
+HISTORY_QUEUE_MAX = int(os.getenv("HISTORY_QUEUE_MAX", "10000"))
+HISTORY_BATCH_SIZE = int(os.getenv("HISTORY_BATCH_SIZE", "200"))
+HISTORY_FLUSH_INTERVAL_SECONDS = float(os.getenv("HISTORY_FLUSH_INTERVAL_SECONDS", "0.5"))
+HISTORY_SHUTDOWN_TIMEOUT_SECONDS = float(os.getenv("HISTORY_SHUTDOWN_TIMEOUT_SECONDS", "10"))
+
+logger = logging.getLogger("history")
+
+HISTORY_QUEUE_SIZE = Gauge("notes_history_queue_size", "Entradas de historial pendientes de escribir")
+HISTORY_BATCH = Histogram(
+    "notes_history_batch_size",
+    "Entradas de historial por insert_many",
+    buckets=(1, 5, 10, 25, 50, 100, 200, 500),
+)
+HISTORY_DIRECT_WRITES = Counter("notes_history_direct_writes_total", "Entradas escritas sin cola (cola llena o writer detenido)")
+HISTORY_FAILURES = Counter("notes_history_write_failures_total", "Entradas de historial que no se pudieron escribir")
+
+_queue: Optional[asyncio.Queue] = None
+_worker: Optional[asyncio.Task] = None
+
+
+async def _insert(entries: List[Dict[str, Any]]) -> None:
+    collection = await get_collection("note_history")
+    try:
+        # ordered=False: un documento inválido no impide escribir el resto del lote
+        await collection.insert_many(entries, ordered=False)
+    except Exception as e:
+        HISTORY_FAILURES.inc(len(entries))
+        logger.warning(f"No se pudo escribir un lote de {len(entries)} entradas de historial: {e}")
+
+
+async def _next_batch() -> List[Dict[str, Any]]:
+    batch = [await _queue.get()]
+    # Sin lote completo se espera el intervalo para juntar más entradas (no afecta al handler)
+    if _queue.qsize() < HISTORY_BATCH_SIZE - 1:
+        await asyncio.sleep(HISTORY_FLUSH_INTERVAL_SECONDS)
+    while len(batch) < HISTORY_BATCH_SIZE and not _queue.empty():
+        batch.append(_queue.get_nowait())
+    return batch
+
+
+async def _run() -> None:
+    while True:
+        batch = await _next_batch()
+        HISTORY_BATCH.observe(len(batch))
+        await _insert(batch)
+        for _ in batch:
+            _queue.task_done()
+
+
+async def start_history_writer() -> None:
+    global _queue, _worker
+    _queue = asyncio.Queue(maxsize=HISTORY_QUEUE_MAX)
+    HISTORY_QUEUE_SIZE.set_function(lambda: _queue.qsize() if _queue else 0)
+    _worker = asyncio.create_task(_run())
+
+
+async def stop_history_writer() -> None:
+    """Escribe lo pendiente (con límite de tiempo) y detiene el worker"""
+    global _queue, _worker
+    if _worker is None:
+        return
+    try:
+        await asyncio.wait_for(_queue.join(), HISTORY_SHUTDOWN_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        logger.warning(f"Apagado con {_queue.qsize()} entradas de historial sin escribir")
+    _worker.cancel()
+    try:
+        await _worker
+    except (asyncio.CancelledError, Exception):
+        pass
+    _queue, _worker = None, None
+
+
+async def record_history(entry: Dict[str, Any]) -> None:
+    """Encola una entrada de `note_history`; solo espera a Mongo si la cola está llena"""
+    if _queue is not None:
+        try:
+            _queue.put_nowait(entry)
+            return
+        except asyncio.QueueFull:
+            pass
+    HISTORY_DIRECT_WRITES.inc()
+    await _insert([entry])
@@ -0,0 +1,63 @@
+import os
+import re
+from typing import Any, Dict, List, Tuple
+
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+
+# Consultas de texto compartidas por GET /notes/ y gRPC SearchNotes.
+# A partir de NOTES_TEXT_MIN_LENGTH caracteres se usa el índice de texto ($text, ordenado por score);
+# por debajo, regex anclada al inicio: '%q%' sin ancla obliga a recorrer todas las notas del usuario.
+NOTES_TEXT_MIN_LENGTH = int(os.getenv("NOTES_TEXT_MIN_LENGTH", "3"))
+NOTES_PREVIEW_CHARS = int(os.getenv("NOTES_PREVIEW_CHARS", "200"))
+
+UPDATED_SORT: List[Tuple[str, Any]] = [("updated_at", -1)]
+SCORE_SORT: List[Tuple[str, Any]] = [("score", {"$meta": "textScore"}), ("updated_at", -1)]
+
+
+def uses_text_index(search: str) -> bool:
+    return len(search.strip()) >= NOTES_TEXT_MIN_LENGTH
+
+
+def text_filter(search: str) -> Dict[str, Any]:
+    """Filtro de búsqueda para combinar con `user_id` (el índice de texto lo lleva como prefijo)"""
+    search = search.strip()
+    if uses_text_index(search):
+        # $text dentro de $or exige que todas las ramas tengan índice: tag_ids usa notes_tag_ids
+        return {"$or": [{"$text": {"$search": search}}, {"tag_ids": search}]}
+    prefix = {"$regex": f"^{re.escape(search)}", "$options": "i"}
+    return {"$or": [{"title": prefix}, {"content": prefix}, {"tag_ids": search}]}
+
+
+def sort_spec(search: str) -> List[Tuple[str, Any]]:
+    return SCORE_SORT if search and uses_text_index(search) else UPDATED_SORT
+
+
+# Listado `view=summary`: el preview se recorta en Mongo, así el contenido completo no viaja
+# ni se decodifica; los documentos llegan como RawBSONDocument (decodificación perezosa)
+SUMMARY_PROJECTION: Dict[str, Any] = {
+    "title": 1,
+    "preview": {"$substrCP": [{"$ifNull": ["$content", ""]}, 0, NOTES_PREVIEW_CHARS]},
+    "category_id": 1,
+    "tag_ids": 1,
+    "created_at": 1,
+    "updated_at": 1,
+}
+SUMMARY_CODEC_OPTIONS = CodecOptions(document_class=RawBSONDocument)
+
+
+def _iso(value: Any) -> Any:
+    return value.isoformat() if value is not None else None
+
+
+def summary_item(raw: RawBSONDocument) -> Dict[str, Any]:
+    """Resumen de nota ya serializable a JSON (no pasa otra vez por Pydantic)"""
+    return {
+        "id": str(raw["_id"]),
+        "title": raw.get("title"),
+        "preview": raw.get("preview") or "",
+        "category_id": raw.get("category_id"),
+        "tag_ids": list(raw.get("tag_ids") or []),
+        "created_at": _iso(raw.get("created_at")),
+        "updated_at": _iso(raw.get("updated_at")),
+    }
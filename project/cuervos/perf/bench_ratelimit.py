@@ -0,0 +1,53 @@
+"""
+Micro-benchmark del rate limiter en memoria del API Gateway.
+
+Mide consultas/seg de `MemoryRateLimitStore` con N claves distintas (por
+defecto 1M) y reporta cuántos buckets quedan tras el desalojo.
+
+Uso:
+    python perf/bench_ratelimit.py --keys 1000000 --max-entries 100000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api-gateway"))
+
+from ratelimit import MemoryRateLimitStore  # noqa: E402
+
+
+def run(keys: int, lookups: int, max_entries: int, shards: int, idle_seconds: float) -> None:
+    store = MemoryRateLimitStore(max_entries=max_entries, idle_seconds=idle_seconds, shards=shards)
+    key_names = [f"tasks:GET:ip:10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}" for i in range(keys)]
+
+    # Fase 1: primera vez de cada clave (inserción + desalojo)
+    start = time.perf_counter()
+    for name in key_names:
+        store.consume_now(name, 100, 60)
+    insert_elapsed = time.perf_counter() - start
+
+    # Fase 2: accesos aleatorios sobre el mismo universo de claves
+    sample = [key_names[random.randrange(keys)] for _ in range(lookups)]
+    start = time.perf_counter()
+    for name in sample:
+        store.consume_now(name, 100, 60)
+    lookup_elapsed = time.perf_counter() - start
+
+    print(f"keys={keys} max_entries={max_entries} shards={shards}")
+    print(f"insert: {keys / insert_elapsed:,.0f} ops/s ({insert_elapsed:.2f}s)")
+    print(f"lookup: {lookups / lookup_elapsed:,.0f} ops/s ({lookup_elapsed:.2f}s)")
+    print(f"entries={len(store)} evictions={store.evictions}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark del rate limiter del gateway")
+    parser.add_argument("--keys", type=int, default=1_000_000)
+    parser.add_argument("--lookups", type=int, default=1_000_000)
+    parser.add_argument("--max-entries", type=int, default=100_000)
+    parser.add_argument("--shards", type=int, default=16)
+    parser.add_argument("--idle-seconds", type=float, default=120.0)
+    args = parser.parse_args()
+    run(args.keys, args.lookups, args.max_entries, args.shards, args.idle_seconds)
@@ -0,0 +1,88 @@
+"""
+Benchmark de `GET /tasks/` del tasks-service: stack sync vs async (TASKS_ASYNC=true).
+
+Lanza N clientes concurrentes (por defecto 200) contra cada URL durante un
+tiempo fijo y reporta throughput, P50/P99 y errores. Pensado para correr contra
+dos instancias del mismo build, una con cada stack:
+
+    TASKS_ASYNC=false uvicorn app.main:app --port 8003
+    TASKS_ASYNC=true  uvicorn app.main:app --port 8013
+
+Uso:
+    python perf/bench_tasks_service.py --target sync=http://localhost:8003 --target async=http://localhost:8013
+"""
+
+import argparse
+import asyncio
+import time
+from typing import List, Tuple
+
+import httpx
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+
+async def worker(client: httpx.AsyncClient, url: str, deadline: float, user_ids: int, worker_id: int,
+                 latencies: List[float], errors: List[int]) -> None:
+    i = worker_id
+    while time.perf_counter() < deadline:
+        headers = {"X-User-Id": str(1 + i % user_ids)}
+        i += 1
+        started = time.perf_counter()
+        try:
+            resp = await client.get(url, headers=headers)
+            if resp.status_code != 200:
+                errors.append(resp.status_code)
+                continue
+        except httpx.HTTPError:
+            errors.append(0)
+            continue
+        latencies.append(time.perf_counter() - started)
+
+
+async def run_target(name: str, base_url: str, concurrency: int, duration: float, warmup: float,
+                     user_ids: int, path: str) -> Tuple[str, int, float, float, float, int]:
+    url = f"{base_url.rstrip('/')}{path}"
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=30.0) as client:
+        if warmup > 0:
+            await asyncio.gather(*[
+                worker(client, url, time.perf_counter() + warmup, user_ids, i, [], [])
+                for i in range(concurrency)
+            ])
+        latencies: List[float] = []
+        errors: List[int] = []
+        started = time.perf_counter()
+        await asyncio.gather(*[
+            worker(client, url, started + duration, user_ids, i, latencies, errors)
+            for i in range(concurrency)
+        ])
+        elapsed = time.perf_counter() - started
+    return (name, len(latencies), len(latencies) / elapsed, percentile(latencies, 50) * 1000,
+            percentile(latencies, 99) * 1000, len(errors))
+
+
+async def main(args) -> None:
+    print(f"concurrency={args.concurrency} duration={args.duration}s path={args.path}")
+    print(f"{'target':<10} {'requests':>9} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for target in args.target:
+        name, _, base_url = target.partition("=")
+        result = await run_target(name, base_url, args.concurrency, args.duration, args.warmup, args.user_ids, args.path)
+        print(f"{result[0]:<10} {result[1]:>9} {result[2]:>9.1f} {result[3]:>9.1f} {result[4]:>9.1f} {result[5]:>7}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark sync vs async del tasks-service")
+    parser.add_argument("--target", action="append", required=True, help="nombre=url_base (repetible)")
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--warmup", type=float, default=5.0)
+    parser.add_argument("--user-ids", type=int, default=50, help="usuarios distintos rotados en X-User-Id")
+    parser.add_argument("--path", default="/tasks/?page=1&size=20")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,122 @@
+"""
+Comprobación del backend Redis del rate limiter del API Gateway.
+
+Sin argumentos usa `FakeRedis`, un fake local de `redis.asyncio` que NO ejecuta Lua:
+solo responde "admitido" o simula una caída (`fail = True`). Valida el código de
+`RedisRateLimitStore` que no depende del script:
+  - fallback     con Redis caído se limita en memoria, se cuenta y se registra una vez
+  - recovery     al volver Redis se sale del modo degradado
+
+Con `--redis-url` además ejecuta TOKEN_BUCKET_LUA en un Redis real (requiere el paquete
+`redis`) y valida la lógica del bucket:
+  - burst        se admiten `capacity` consultas y la siguiente se rechaza
+  - refill       tras esperar, el bucket se rellena a la tasa capacity/window
+  - shared       dos réplicas (dos stores) comparten el mismo bucket
+  - no_fallback  todo lo anterior se resolvió en Redis y no en el fallback en memoria
+
+Sale con código 1 si alguna comprobación falla.
+
+Uso:
+    python perf/check_ratelimit_redis.py
+    python perf/check_ratelimit_redis.py --redis-url redis://localhost:6379/15
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+import uuid
+from typing import Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api-gateway"))
+
+from ratelimit import MemoryRateLimitStore, RedisRateLimitStore, TOKEN_BUCKET_LUA  # noqa: E402
+
+
+class FakeRedis:
+    """Fake de `redis.asyncio` sin Lua: admite todo o falla, para probar fallback/recuperación"""
+
+    def __init__(self):
+        self.fail = False
+        self.calls = 0
+
+    async def eval(self, script: str, numkeys: int, *args):
+        self.calls += 1
+        if self.fail:
+            raise ConnectionError("fake redis caído")
+        if script != TOKEN_BUCKET_LUA or numkeys != 1:
+            raise ValueError("script no soportado por el fake")
+        return 1
+
+    async def aclose(self) -> None:
+        return None
+
+
+async def burst(store, capacity: int) -> int:
+    key = f"check:{uuid.uuid4().hex}"
+    return sum([await store.consume(key, capacity, 60) for _ in range(capacity + 5)])
+
+
+async def check_fallback(check) -> None:
+    """Código del store independiente del script Lua (fake local)"""
+    client = FakeRedis()
+    store = RedisRateLimitStore(client, prefix="ratelimit-check:", fallback=MemoryRateLimitStore())
+    client.fail = True
+    allowed = await burst(store, 10)
+    check("fallback", store.degraded and store.fallbacks == 15 and allowed == 10,
+          f"degraded={store.degraded} fallbacks={store.fallbacks} admitidas={allowed}")
+    client.fail = False
+    await store.consume(f"check:{uuid.uuid4().hex}", 10, 60)
+    check("recovery", not store.degraded and client.calls == 16, f"degraded={store.degraded}")
+    await store.aclose()
+
+
+async def check_bucket(client, check) -> None:
+    """TOKEN_BUCKET_LUA ejecutado por un Redis real"""
+    store = RedisRateLimitStore(client, prefix="ratelimit-check:", fallback=MemoryRateLimitStore())
+    allowed = await burst(store, 10)
+    check("burst", allowed == 10, f"admitidas={allowed} de 15 (capacidad 10)")
+
+    key = f"check:{uuid.uuid4().hex}"
+    for _ in range(5):
+        await store.consume(key, 5, 1)
+    denied = not await store.consume(key, 5, 1)
+    time.sleep(0.5)
+    refilled = await store.consume(key, 5, 1)
+    check("refill", denied and refilled, "bucket vacío se rellena tras 0.5s a 5 tokens/s")
+
+    replica = RedisRateLimitStore(client, prefix="ratelimit-check:", fallback=MemoryRateLimitStore())
+    key = f"check:{uuid.uuid4().hex}"
+    first = sum([await store.consume(key, 6, 60) for _ in range(3)])
+    second = sum([await replica.consume(key, 6, 60) for _ in range(6)])
+    check("shared", first + second == 6, f"réplica A={first} réplica B={second} (capacidad 6 compartida)")
+    # La lógica del bucket solo es válida si se ejecutó en Redis, no en el fallback
+    check("no_fallback", not store.fallbacks and not replica.fallbacks, f"fallbacks={store.fallbacks + replica.fallbacks}")
+    await store.aclose()
+
+
+async def run_checks(redis_url: Optional[str]) -> bool:
+    results = []
+
+    def check(name: str, ok: bool, detail: str = "") -> None:
+        results.append(ok)
+        print(f"{name:<11} {'OK' if ok else 'FALLO':<6} {detail}")
+
+    await check_fallback(check)
+    if redis_url:
+        import redis.asyncio as redis_asyncio
+        await check_bucket(redis_asyncio.from_url(redis_url), check)
+    else:
+        print("burst/refill/shared omitidos: requieren --redis-url (el fake no ejecuta Lua)")
+    return all(results)
+
+
+def main(args) -> int:
+    return 0 if asyncio.run(run_checks(args.redis_url)) else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Comprobación del rate limiter con backend Redis")
+    parser.add_argument("--redis-url", default=None, help="Redis real para validar TOKEN_BUCKET_LUA (burst/refill/shared)")
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,128 @@
+"""
+Comprueba con explain() que las consultas calientes de notes-service usan índices (IXSCAN/TEXT, sin COLLSCAN).
+
+Crea una colección sintética (`notes_explain_bench`) con `NOTES_INDEXES` y construye las
+consultas con `text_filter()`/`sort_spec()`, importados de notes-service (el código que se
+despliega, no una copia). Explica:
+  - list       listado por usuario ordenado por updated_at (GET /notes/ sin search)
+  - text       búsqueda de >= 3 caracteres ($text ordenado por score, o tag_ids)
+  - prefix     búsqueda corta (regex anclada, o tag_ids)
+  - tag        búsqueda por un tag id de >= 3 caracteres (rama tag_ids del $or con $text)
+  - tag_short  búsqueda por un tag id corto (rama tag_ids de la regex)
+
+Sale con código 1 si algún plan ganador contiene COLLSCAN o si las búsquedas por tag id
+no devuelven notas. Requiere las dependencias de notes-service (`pip install -r notes-service/requirements.txt`).
+
+Uso:
+    MONGODB_URL=mongodb://localhost:27017 python perf/explain_notes_queries.py --docs 50000
+"""
+
+import argparse
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+from pymongo import MongoClient
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "notes-service"))
+
+from app.database.indexes import NOTES_INDEXES  # noqa: E402
+from app.services.note_queries import sort_spec, text_filter  # noqa: E402
+
+COLLECTION = "notes_explain_bench"
+WORDS = [
+    "informe", "reunión", "cliente", "factura", "revisar", "desplegar", "backend", "frontend",
+    "diseño", "presupuesto", "migración", "pruebas", "documentación", "entrega", "sprint",
+    "llamar", "proveedor", "contrato", "servidor", "datos", "correo", "equipo", "urgente",
+]
+# Tags sembrados: uno corto (1 carácter) y uno largo (4) por nota, para cubrir ambas ramas
+SHORT_TAG = "7"
+LONG_TAG = "1007"
+
+
+def seed(collection, docs: int, users: int) -> None:
+    collection.drop()
+    now = datetime.utcnow()
+    batch: List[Dict[str, Any]] = []
+    for i in range(docs):
+        batch.append({
+            "title": " ".join(random.choices(WORDS, k=3)),
+            "content": " ".join(random.choices(WORDS, k=40)),
+            "user_id": 1 + i % users,
+            "category_id": str(1 + i % 7),
+            # Módulos coprimos con `users`: cada usuario tiene notas con SHORT_TAG y LONG_TAG
+            "tag_ids": [str(i % 9), str(1000 + i % 31)],
+            "created_at": now - timedelta(seconds=i),
+            "updated_at": now - timedelta(seconds=i),
+        })
+        if len(batch) == 1000:
+            collection.insert_many(batch)
+            batch = []
+    if batch:
+        collection.insert_many(batch)
+    collection.create_indexes(NOTES_INDEXES)
+
+
+def stages(plan: Dict[str, Any]) -> List[str]:
+    """Etapas del plan ganador, de la raíz a las hojas"""
+    found = [plan.get("stage", "?")]
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            found.extend(stages(plan[key]))
+    for child in plan.get("inputStages", []):
+        found.extend(stages(child))
+    return found
+
+
+def explain(collection, query: Dict[str, Any], sort, limit: int = 20) -> List[str]:
+    plan = collection.find(query).sort(sort).limit(limit).explain()
+    return stages(plan["queryPlanner"]["winningPlan"])
+
+
+def search_query(user_id: int, search: str):
+    """Misma consulta que GET /notes/?search= (filtro y orden del código de notes-service)"""
+    return {"user_id": user_id, **text_filter(search)}, sort_spec(search)
+
+
+def main(args) -> int:
+    client = MongoClient(args.url)
+    collection = client[args.db][COLLECTION]
+    seed(collection, args.docs, args.users)
+    print(f"colección {COLLECTION}: {args.docs} notas, {args.users} usuarios")
+
+    checks = {
+        "list": ({"user_id": 1}, sort_spec("")),
+        "text": search_query(1, "informe cliente"),
+        "prefix": search_query(1, "in"),
+        "tag": search_query(1, LONG_TAG),
+        "tag_short": search_query(1, SHORT_TAG),
+    }
+    # Las búsquedas por tag id deben encontrar notas, no solo usar índices
+    must_match = {"tag", "tag_short"}
+    failed = False
+    for name, (query, sort) in checks.items():
+        plan = explain(collection, query, sort)
+        status = "OK"
+        if "COLLSCAN" in plan:
+            status = "COLLSCAN"
+        elif name in must_match and collection.count_documents(query) == 0:
+            status = "SIN_NOTAS"
+        failed = failed or status != "OK"
+        print(f"{name:<10} {status:<9} {' <- '.join(plan)}")
+
+    if not args.keep:
+        collection.drop()
+    client.close()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="explain() de las consultas calientes de notes-service")
+    parser.add_argument("--url", default=os.getenv("MONGODB_URL", "mongodb://localhost:27017"))
+    parser.add_argument("--db", default=os.getenv("MONGODB_DB", "tasknotes"))
+    parser.add_argument("--docs", type=int, default=50_000)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--keep", action="store_true", help="no borrar la colección al terminar")
+    sys.exit(main(parser.parse_args()))
@@ -397,7 +397,7 @@ func startCacheInvalidationSubscriber(redisClient *redis.Client, svc *services.S
         return
     }
     // Bindings relevantes
-    bindings := []string{"note.updated", "note.deleted", "task.updated", "task.deleted"}
+    bindings := []string{"note.updated", "note.deleted", "task.updated", "task.deleted", "task.bulk"}
     for _, rk := range bindings {
         _ = ch.QueueBind(q.Name, rk, "tasknotes.events", false, nil)
     }
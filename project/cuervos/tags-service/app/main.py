@@ -1,5 +1,6 @@
 from fastapi import FastAPI, Request, Response
 from .db import engine, Base
+from .services.events import start_publisher, stop_publisher
 from .routers.tags import router as tags_router, internal_router as internal_tags_router
 from prometheus_client import Counter, Histogram, CONTENT_TYPE_LATEST, generate_latest
 
@@ -41,4 +42,10 @@ app.include_router(internal_tags_router)
 # Create tables on startup
 @app.on_event("startup")
 def on_startup():
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+    Base.metadata.create_all(bind=engine)
+    start_publisher()
+
+@app.on_event("shutdown")
+def on_shutdown():
+    # Flush queued events before exiting
+    stop_publisher()
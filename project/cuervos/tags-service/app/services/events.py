@@ -1,26 +1,214 @@
-import os
+import asyncio
 import json
-import pika
+import logging
+import os
+import threading
+from typing import List, Optional, Tuple
+
+import aio_pika
+from aio_pika.pool import Pool
+from prometheus_client import Counter, Gauge
 
 RABBITMQ_URL = os.getenv("RABBITMQ_URL", "amqp://rabbitmq:5672")
 EXCHANGE_NAME = os.getenv("EVENTS_EXCHANGE", "tasknotes.events")
 
+# Long-lived publisher: one AMQP connection with a pool of channels (publisher confirms), the
+# exchange declared once and a bounded in-memory queue published in batches. Endpoints are sync,
+# so the publisher runs its own event loop in a thread and publish_event enqueues through
+# call_soon_threadsafe without blocking; when the queue is full the event is dropped and counted.
+EVENTS_QUEUE_MAX = int(os.getenv("EVENTS_QUEUE_MAX", "10000"))
+EVENTS_BATCH_SIZE = int(os.getenv("EVENTS_BATCH_SIZE", "100"))
+EVENTS_LINGER_SECONDS = float(os.getenv("EVENTS_LINGER_SECONDS", "0.005"))
+EVENTS_CHANNEL_POOL_SIZE = int(os.getenv("EVENTS_CHANNEL_POOL_SIZE", "4"))
+EVENTS_PUBLISH_TIMEOUT_SECONDS = float(os.getenv("EVENTS_PUBLISH_TIMEOUT_SECONDS", "10"))
+EVENTS_RETRY_MAX_SECONDS = float(os.getenv("EVENTS_RETRY_MAX_SECONDS", "30"))
+EVENTS_SHUTDOWN_TIMEOUT_SECONDS = float(os.getenv("EVENTS_SHUTDOWN_TIMEOUT_SECONDS", "10"))
+
+logger = logging.getLogger("events")
+
+EVENTS_QUEUE_SIZE = Gauge("tags_events_queue_size", "Eventos en memoria pendientes de publicar")
+EVENTS_PUBLISHED = Counter("tags_events_published_total", "Eventos publicados y confirmados por RabbitMQ")
+EVENTS_FAILURES = Counter("tags_events_publish_failures_total", "Publicaciones fallidas (se reintentan)")
+EVENTS_DROPPED = Counter("tags_events_dropped_total", "Eventos descartados (cola llena o publicador detenido)")
+
+Event = Tuple[str, bytes]
+
+
+class EventPublisher:
+    """Publishes events to RabbitMQ from an in-memory queue, in batches and with confirms"""
+
+    def __init__(self, url: str = RABBITMQ_URL, exchange_name: str = EXCHANGE_NAME):
+        self.url = url
+        self.exchange_name = exchange_name
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._connection = None
+        self._channel_pool: Optional[Pool] = None
+        # Events of a batch that were not confirmed; retried before the queue
+        self._pending: List[Event] = []
+
+    async def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize=EVENTS_QUEUE_MAX)
+        EVENTS_QUEUE_SIZE.set_function(lambda: (self._queue.qsize() if self._queue else 0) + len(self._pending))
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Drains the queue (bounded in time) and closes channels and connection"""
+        if self._worker is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), EVENTS_SHUTDOWN_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            lost = self._queue.qsize() + len(self._pending)
+            EVENTS_DROPPED.inc(lost)
+            logger.warning(f"Shutting down with {lost} unpublished events")
+        self._worker.cancel()
+        try:
+            await self._worker
+        except (asyncio.CancelledError, Exception):
+            pass
+        self._worker = None
+        self._loop = None
+        await self._close_connection()
+
+    def publish(self, routing_key: str, payload: dict) -> None:
+        """Enqueues the event without blocking; safe to call from any thread"""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            EVENTS_DROPPED.inc()
+            logger.warning(f"Event publisher stopped, dropping {routing_key}")
+            return
+        loop.call_soon_threadsafe(self._enqueue, (routing_key, json.dumps(payload).encode("utf-8")))
+
+    def _enqueue(self, event: Event) -> None:
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            EVENTS_DROPPED.inc()
+            logger.warning(f"Event queue full, dropping {event[0]}")
+
+    async def _next_batch(self) -> List[Event]:
+        batch = [await self._queue.get()]
+        # Short linger to gather more events when the queue holds less than a full batch
+        if EVENTS_LINGER_SECONDS > 0 and self._queue.qsize() < EVENTS_BATCH_SIZE - 1:
+            await asyncio.sleep(EVENTS_LINGER_SECONDS)
+        while len(batch) < EVENTS_BATCH_SIZE and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _run(self) -> None:
+        attempts = 0
+        while True:
+            batch = self._pending or await self._next_batch()
+            try:
+                failed = await self._publish_batch(batch)
+            except Exception as e:
+                logger.warning(f"RabbitMQ unavailable: {e}")
+                await self._close_connection()
+                failed = batch
+            published = len(batch) - len(failed)
+            EVENTS_PUBLISHED.inc(published)
+            EVENTS_FAILURES.inc(len(failed))
+            self._pending = failed
+            # task_done only once the event is confirmed: queue.join() waits for retries
+            for _ in range(published):
+                self._queue.task_done()
+            if failed:
+                attempts += 1
+                await asyncio.sleep(min(EVENTS_RETRY_MAX_SECONDS, 0.5 * (2 ** (attempts - 1))))
+            else:
+                attempts = 0
+
+    async def _ensure_connection(self) -> None:
+        if self._connection is not None and not self._connection.is_closed:
+            return
+        self._connection = await aio_pika.connect_robust(self.url)
+        # Exchange declared once per connection; pooled channels only reference it
+        channel = await self._connection.channel()
+        await channel.declare_exchange(self.exchange_name, aio_pika.ExchangeType.TOPIC, durable=True)
+        await channel.close()
+        self._channel_pool = Pool(self._open_channel, max_size=EVENTS_CHANNEL_POOL_SIZE)
+
+    async def _open_channel(self):
+        return await self._connection.channel(publisher_confirms=True)
+
+    async def _close_connection(self) -> None:
+        pool, connection = self._channel_pool, self._connection
+        self._channel_pool, self._connection = None, None
+        for resource in (pool, connection):
+            if resource is not None:
+                try:
+                    await resource.close()
+                except Exception:
+                    pass
+
+    async def _publish_batch(self, batch: List[Event]) -> List[Event]:
+        """Spreads the batch over the pooled channels; returns the unconfirmed events"""
+        await self._ensure_connection()
+        chunks = [batch[i::EVENTS_CHANNEL_POOL_SIZE] for i in range(EVENTS_CHANNEL_POOL_SIZE)]
+        chunks = [chunk for chunk in chunks if chunk]
+        results = await asyncio.gather(*[self._publish_chunk(chunk) for chunk in chunks], return_exceptions=True)
+        failed: List[Event] = []
+        for chunk, result in zip(chunks, results):
+            failed.extend(chunk if isinstance(result, BaseException) else result)
+        return failed
+
+    async def _publish_chunk(self, chunk: List[Event]) -> List[Event]:
+        async with self._channel_pool.acquire() as channel:
+            exchange = await channel.get_exchange(self.exchange_name, ensure=False)
+            # Confirms of a chunk are awaited together: one round-trip per chunk, not per message
+            results = await asyncio.gather(
+                *[
+                    exchange.publish(
+                        aio_pika.Message(body=body, content_type="application/json", delivery_mode=aio_pika.DeliveryMode.PERSISTENT),
+                        routing_key=routing_key,
+                        timeout=EVENTS_PUBLISH_TIMEOUT_SECONDS,
+                    )
+                    for routing_key, body in chunk
+                ],
+                return_exceptions=True,
+            )
+        return [event for event, result in zip(chunk, results) if isinstance(result, BaseException)]
+
+
+publisher = EventPublisher()
+_loop_thread: Optional[threading.Thread] = None
+
+
+def start_publisher() -> None:
+    """Starts the publisher in a separate thread with its own event loop"""
+    global _loop_thread
+    started = threading.Event()
+
+    def run() -> None:
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(publisher.start())
+        started.set()
+        loop.run_forever()
+        loop.close()
+
+    _loop_thread = threading.Thread(target=run, name="events-publisher", daemon=True)
+    _loop_thread.start()
+    started.wait()
+
 
-def _get_connection_channel():
-    params = pika.URLParameters(RABBITMQ_URL)
-    connection = pika.BlockingConnection(params)
-    channel = connection.channel()
-    channel.exchange_declare(exchange=EXCHANGE_NAME, exchange_type="topic", durable=True)
-    return connection, channel
+def stop_publisher() -> None:
+    """Flushes queued events and stops the publisher thread"""
+    global _loop_thread
+    loop = publisher._loop
+    if _loop_thread is None or loop is None:
+        return
+    try:
+        asyncio.run_coroutine_threadsafe(publisher.stop(), loop).result(EVENTS_SHUTDOWN_TIMEOUT_SECONDS + 5)
+    except Exception as e:
+        logger.warning(f"Error stopping the event publisher: {e}")
+    loop.call_soon_threadsafe(loop.stop)
+    _loop_thread.join(timeout=5)
+    _loop_thread = None
 
 
 def publish_event(routing_key: str, payload: dict) -> None:
-    connection, channel = _get_connection_channel()
-    body = json.dumps(payload)
-    channel.basic_publish(
-        exchange=EXCHANGE_NAME,
-        routing_key=routing_key,
-        body=body,
-        properties=pika.BasicProperties(content_type="application/json", delivery_mode=2),
-    )
-    connection.close()
\ No newline at end of file
+    publisher.publish(routing_key, payload)
@@ -0,0 +1,22 @@
+import os
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.database.postgres import DATABASE_URL
+
+# Mismo DATABASE_URL que el stack sync, con driver asyncpg
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or DATABASE_URL.replace("+psycopg2", "+asyncpg", 1)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    pool_pre_ping=True,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+)
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False, autoflush=False)
+
+# Dependency
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -15,7 +15,7 @@ _sym_db = _symbol_database.Default()
 from . import common_pb2 as common__pb2
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x12tasks_search.proto\x12\x0ftasknotes.tasks\x1a\x0c\x63ommon.proto\"q\n\x12SearchTasksRequest\x12\r\n\x05query\x18\x01 \x01(\t\x12\x0f\n\x07user_id\x18\x02 \x01(\x05\x12\r\n\x05limit\x18\x03 \x01(\x05\x12\x0c\n\x04skip\x18\x04 \x01(\x05\x12\x10\n\x08\x63\x61tegory\x18\x05 \x01(\t\x12\x0c\n\x04tags\x18\x06 \x03(\t\"V\n\x13SearchTasksResponse\x12\x30\n\x05tasks\x18\x01 \x03(\x0b\x32!.tasknotes.tasks.TaskSearchResult\x12\r\n\x05total\x18\x02 \x01(\x03\"\x93\x02\n\x10TaskSearchResult\x12\n\n\x02id\x18\x01 \x01(\x05\x12\r\n\x05title\x18\x02 \x01(\t\x12\x13\n\x0b\x64\x65scription\x18\x03 \x01(\t\x12\x11\n\tcompleted\x18\x04 \x01(\x08\x12\x10\n\x08priority\x18\x05 \x01(\t\x12\x10\n\x08\x64ue_date\x18\x06 \x01(\t\x12\x33\n\x08\x63\x61tegory\x18\x07 \x01(\x0b\x32!.tasknotes.common.CategorySummary\x12*\n\x04tags\x18\x08 \x03(\x0b\x32\x1c.tasknotes.common.TagSummary\x12\x0f\n\x07user_id\x18\t \x01(\x05\x12\x12\n\ncreated_at\x18\n \x01(\t\x12\x12\n\nupdated_at\x18\x0b \x01(\t2n\n\x12TasksSearchService\x12X\n\x0bSearchTasks\x12#.tasknotes.tasks.SearchTasksRequest\x1a$.tasknotes.tasks.SearchTasksResponseB\"Z github.com/tasknotes/proto/tasksb\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x12tasks_search.proto\x12\x0ftasknotes.tasks\x1a\x0c\x63ommon.proto\"\x9c\x01\n\x12SearchTasksRequest\x12\r\n\x05query\x18\x01 \x01(\t\x12\x0f\n\x07user_id\x18\x02 \x01(\x05\x12\r\n\x05limit\x18\x03 \x01(\x05\x12\x0c\n\x04skip\x18\x04 \x01(\x05\x12\x10\n\x08\x63\x61tegory\x18\x05 \x01(\t\x12\x0c\n\x04tags\x18\x06 \x03(\t\x12)\n\x04mode\x18\x07 \x01(\x0e\x32\x1b.tasknotes.tasks.SearchMode\"V\n\x13SearchTasksResponse\x12\x30\n\x05tasks\x18\x01 \x03(\x0b\x32!.tasknotes.tasks.TaskSearchResult\x12\r\n\x05total\x18\x02 \x01(\x03\"\x93\x02\n\x10TaskSearchResult\x12\n\n\x02id\x18\x01 \x01(\x05\x12\r\n\x05title\x18\x02 \x01(\t\x12\x13\n\x0b\x64\x65scription\x18\x03 \x01(\t\x12\x11\n\tcompleted\x18\x04 \x01(\x08\x12\x10\n\x08priority\x18\x05 \x01(\t\x12\x10\n\x08\x64ue_date\x18\x06 \x01(\t\x12\x33\n\x08\x63\x61tegory\x18\x07 \x01(\x0b\x32!.tasknotes.common.CategorySummary\x12*\n\x04tags\x18\x08 \x03(\x0b\x32\x1c.tasknotes.common.TagSummary\x12\x0f\n\x07user_id\x18\t \x01(\x05\x12\x12\n\ncreated_at\x18\n \x01(\t\x12\x12\n\nupdated_at\x18\x0b \x01(\t*v\n\nSearchMode\x12\x1b\n\x17SEARCH_MODE_UNSPECIFIED\x10\x00\x12\x19\n\x15SEARCH_MODE_SUBSTRING\x10\x01\x12\x16\n\x12SEARCH_MODE_PREFIX\x10\x02\x12\x18\n\x14SEARCH_MODE_FULLTEXT\x10\x03\x32\xcd\x01\n\x12TasksSearchService\x12X\n\x0bSearchTasks\x12#.tasknotes.tasks.SearchTasksRequest\x1a$.tasknotes.tasks.SearchTasksResponse\x12]\n\x11StreamSearchTasks\x12#.tasknotes.tasks.SearchTasksRequest\x1a!.tasknotes.tasks.TaskSearchResult0\x01\x42\"Z github.com/tasknotes/proto/tasksb\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
@@ -23,12 +23,14 @@ _builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'tasks_search_pb2', _globals
 if _descriptor._USE_C_DESCRIPTORS == False:
   _globals['DESCRIPTOR']._options = None
   _globals['DESCRIPTOR']._serialized_options = b'Z github.com/tasknotes/proto/tasks'
-  _globals['_SEARCHTASKSREQUEST']._serialized_start=53
-  _globals['_SEARCHTASKSREQUEST']._serialized_end=166
-  _globals['_SEARCHTASKSRESPONSE']._serialized_start=168
-  _globals['_SEARCHTASKSRESPONSE']._serialized_end=254
-  _globals['_TASKSEARCHRESULT']._serialized_start=257
-  _globals['_TASKSEARCHRESULT']._serialized_end=532
-  _globals['_TASKSSEARCHSERVICE']._serialized_start=534
-  _globals['_TASKSSEARCHSERVICE']._serialized_end=644
+  _globals['_SEARCHMODE']._serialized_start=578
+  _globals['_SEARCHMODE']._serialized_end=696
+  _globals['_SEARCHTASKSREQUEST']._serialized_start=54
+  _globals['_SEARCHTASKSREQUEST']._serialized_end=210
+  _globals['_SEARCHTASKSRESPONSE']._serialized_start=212
+  _globals['_SEARCHTASKSRESPONSE']._serialized_end=298
+  _globals['_TASKSEARCHRESULT']._serialized_start=301
+  _globals['_TASKSEARCHRESULT']._serialized_end=576
+  _globals['_TASKSSEARCHSERVICE']._serialized_start=699
+  _globals['_TASKSSEARCHSERVICE']._serialized_end=904
 # @@protoc_insertion_point(module_scope)
@@ -20,6 +20,11 @@ class TasksSearchServiceStub(object):
                 request_serializer=tasks__search__pb2.SearchTasksRequest.SerializeToString,
                 response_deserializer=tasks__search__pb2.SearchTasksResponse.FromString,
                 )
+        self.StreamSearchTasks = channel.unary_stream(
+                '/tasknotes.tasks.TasksSearchService/StreamSearchTasks',
+                request_serializer=tasks__search__pb2.SearchTasksRequest.SerializeToString,
+                response_deserializer=tasks__search__pb2.TaskSearchResult.FromString,
+                )
 
 
 class TasksSearchServiceServicer(object):
@@ -32,6 +37,13 @@ class TasksSearchServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def StreamSearchTasks(self, request, context):
+        """Resultados uno a uno a medida que salen del cursor (sin tope de 100 ni total)
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_TasksSearchServiceServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -40,6 +52,11 @@ def add_TasksSearchServiceServicer_to_server(servicer, server):
                     request_deserializer=tasks__search__pb2.SearchTasksRequest.FromString,
                     response_serializer=tasks__search__pb2.SearchTasksResponse.SerializeToString,
             ),
+            'StreamSearchTasks': grpc.unary_stream_rpc_method_handler(
+                    servicer.StreamSearchTasks,
+                    request_deserializer=tasks__search__pb2.SearchTasksRequest.FromString,
+                    response_serializer=tasks__search__pb2.TaskSearchResult.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'tasknotes.tasks.TasksSearchService', rpc_method_handlers)
@@ -67,3 +84,20 @@ class TasksSearchService(object):
             tasks__search__pb2.SearchTasksResponse.FromString,
             options, channel_credentials,
             insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def StreamSearchTasks(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(request, target, '/tasknotes.tasks.TasksSearchService/StreamSearchTasks',
+            tasks__search__pb2.SearchTasksRequest.SerializeToString,
+            tasks__search__pb2.TaskSearchResult.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
@@ -1,19 +1,172 @@
 import asyncio
+import functools
+import inspect
+import os
+import time
 import grpc
-from concurrent import futures
-from typing import List
-from sqlalchemy import or_
+from typing import Any, Dict, List, Optional, Tuple
 
-from app.database.postgres import get_db
+from prometheus_client import Counter, Histogram
+
+from app.database.postgres_async import AsyncSessionLocal
 from app.models.postgres_models import Task
 from app.grpc.generated import tasks_search_pb2, tasks_search_pb2_grpc, common_pb2
-from app.services.serialization import expand_category, expand_tags
+from app.services.serialization import (
+    list_categories_async,
+    list_tags_async,
+    resolve_categories_async,
+    resolve_tags_async,
+)
+from app.services.task_queries import (
+    SEARCH_FULLTEXT,
+    SEARCH_PREFIX,
+    SEARCH_SUBSTRING,
+    search_count_stmt,
+    search_filters,
+    search_page_stmt,
+)
+
+# Servidor grpc.aio en el event loop de FastAPI (arranca/para con los hooks de la app)
+GRPC_LISTEN_ADDR = os.getenv("GRPC_LISTEN_ADDR", "[::]:50052")
+# RPCs simultáneas antes de responder RESOURCE_EXHAUSTED (0 = sin límite)
+GRPC_MAX_CONCURRENT_RPCS = int(os.getenv("GRPC_MAX_CONCURRENT_RPCS", "200"))
+GRPC_MAX_MESSAGE_BYTES = int(os.getenv("GRPC_MAX_MESSAGE_BYTES", str(4 * 1024 * 1024)))
+GRPC_KEEPALIVE_TIME_MS = int(os.getenv("GRPC_KEEPALIVE_TIME_MS", "30000"))
+GRPC_KEEPALIVE_TIMEOUT_MS = int(os.getenv("GRPC_KEEPALIVE_TIMEOUT_MS", "10000"))
+GRPC_SHUTDOWN_GRACE_SECONDS = float(os.getenv("GRPC_SHUTDOWN_GRACE_SECONDS", "10"))
+
+# StreamSearchTasks: filas por lote del cursor de servidor (yield_per) y tope de resultados
+GRPC_STREAM_BATCH_SIZE = int(os.getenv("GRPC_STREAM_BATCH_SIZE", "200"))
+GRPC_STREAM_MAX_RESULTS = int(os.getenv("GRPC_STREAM_MAX_RESULTS", "10000"))
+
+SEARCH_MODES = {
+    tasks_search_pb2.SEARCH_MODE_PREFIX: SEARCH_PREFIX,
+    tasks_search_pb2.SEARCH_MODE_FULLTEXT: SEARCH_FULLTEXT,
+}
+
+GRPC_REQUESTS = Counter(
+    "tasks_grpc_requests_total",
+    "Total de RPCs gRPC",
+    ["method", "code"]
+)
+
+GRPC_DURATION = Histogram(
+    "tasks_grpc_request_duration_seconds",
+    "Duración de RPCs gRPC en segundos (streams: hasta el último mensaje)",
+    ["method"]
+)
+
+_server: Optional[grpc.aio.Server] = None
+
+
+def _status(context, failed: bool) -> str:
+    code = context.code()
+    if isinstance(code, grpc.StatusCode) and code != grpc.StatusCode.OK:
+        return code.name
+    return "UNKNOWN" if failed else "OK"
+
+
+def observed(method):
+    """Registra latencia y código de la RPC; admite handlers unarios y de streaming"""
+    def finish(context, started: float, failed: bool, code: Optional[str] = None) -> None:
+        GRPC_DURATION.labels(method=method.__name__).observe(time.perf_counter() - started)
+        GRPC_REQUESTS.labels(method=method.__name__, code=code or _status(context, failed)).inc()
+
+    if inspect.isasyncgenfunction(method):
+        @functools.wraps(method)
+        async def stream_wrapper(self, request, context):
+            started = time.perf_counter()
+            failed, code = True, None
+            try:
+                async for item in method(self, request, context):
+                    yield item
+                failed = False
+            except asyncio.CancelledError:
+                code = "CANCELLED"
+                raise
+            finally:
+                finish(context, started, failed, code)
+        return stream_wrapper
+
+    @functools.wraps(method)
+    async def unary_wrapper(self, request, context):
+        started = time.perf_counter()
+        failed, code = True, None
+        try:
+            response = await method(self, request, context)
+            failed = False
+            return response
+        except asyncio.CancelledError:
+            code = "CANCELLED"
+            raise
+        finally:
+            finish(context, started, failed, code)
+    return unary_wrapper
+
+
+async def _matching_ids(fetch_catalog, user_id: int, matches) -> List[int]:
+    catalog = await fetch_catalog(user_id)
+    return [item_id for item_id, item in catalog.items() if matches((item.get("name") or "").lower())]
+
+
+async def resolve_search_catalog(request) -> Tuple[Optional[List[int]], Optional[List[int]]]:
+    """Traduce los filtros por nombre a ids (None = sin filtro, [] = nada coincide).
+
+    Categoría: coincidencia parcial sin mayúsculas; tags: nombre exacto sin mayúsculas.
+    """
+    lookups = {}
+    if request.category:
+        wanted = request.category.lower()
+        lookups["category"] = _matching_ids(list_categories_async, request.user_id, lambda name: wanted in name)
+    if request.tags:
+        wanted_tags = {t.lower() for t in request.tags}
+        lookups["tags"] = _matching_ids(list_tags_async, request.user_id, lambda name: name in wanted_tags)
+    found = dict(zip(lookups, await asyncio.gather(*lookups.values())))
+    return found.get("category"), found.get("tags")
+
+
+async def expand_batch(tasks: List[Task], user_id: int):
+    """Categorías y tags de un lote de tareas, resueltos en paralelo"""
+    return await asyncio.gather(
+        resolve_categories_async((t.category_id for t in tasks if t.category_id), user_id),
+        resolve_tags_async((tid for t in tasks for tid in (t.tag_ids or [])), user_id),
+    )
+
+
+def to_search_result(task: Task, categories: Dict[int, Dict[str, Any]], tags: Dict[int, Dict[str, Any]]):
+    result = tasks_search_pb2.TaskSearchResult(
+        id=task.id,
+        title=task.title,
+        description=task.description or "",
+        completed=task.completed,
+        priority=task.priority,
+        due_date=task.due_date.isoformat() if task.due_date else "",
+        user_id=task.user_id,
+        created_at=task.created_at.isoformat() if task.created_at else "",
+        updated_at=task.updated_at.isoformat() if task.updated_at else ""
+    )
+    cat = categories.get(task.category_id) if task.category_id else None
+    if cat:
+        result.category.CopyFrom(common_pb2.CategorySummary(
+            id=str(cat.get("id")),
+            name=cat.get("name") or "",
+            color=cat.get("color") or ""
+        ))
+    result.tags.extend(
+        common_pb2.TagSummary(
+            id=str(tags[tid].get("id")),
+            name=tags[tid].get("name") or "",
+            color=tags[tid].get("color") or ""
+        ) for tid in (task.tag_ids or []) if tid in tags
+    )
+    return result
 
 
 class TasksSearchServicer(tasks_search_pb2_grpc.TasksSearchServiceServicer):
     """Implementación del servicio gRPC para búsqueda de tareas"""
-    
-    def SearchTasks(self, request, context):
+
+    @observed
+    async def SearchTasks(self, request, context):
         """Busca tareas basado en los criterios proporcionados"""
         try:
             # Validaciones
@@ -21,149 +174,144 @@ class TasksSearchServicer(tasks_search_pb2_grpc.TasksSearchServiceServicer):
                 context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
                 context.set_details("Query too long")
                 return tasks_search_pb2.SearchTasksResponse()
-            
+
             if request.limit <= 0:
                 limit = 20
             elif request.limit > 100:
                 limit = 100
             else:
                 limit = request.limit
-            
+
             skip = max(0, request.skip)
-            
-            # Obtener conexión a base de datos
-            db_gen = get_db()
-            db = next(db_gen)
-            
-            try:
-                # Construir query base (solo por usuario y texto)
-                query = db.query(Task).filter(Task.user_id == request.user_id)
-                
-                # Búsqueda de texto en title y description
-                if request.query:
-                    search_filter = or_(
-                        Task.title.ilike(f"%{request.query}%"),
-                        Task.description.ilike(f"%{request.query}%")
-                    )
-                    query = query.filter(search_filter)
-                
-                # Cargar tareas sin filtros de catálogo (se filtra en memoria por nombre)
-                tasks = query.order_by(Task.updated_at.desc()).all()
-                
-                filtered = []
-                requested_tags = list(request.tags)
-                requested_category = request.category or ""
-                req_cat_lower = requested_category.lower()
-                req_tags_lower = [t.lower() for t in requested_tags]
-                
-                for task in tasks:
-                    # Expandir categoría y tags vía HTTP
-                    cat = expand_category(task.category_id, request.user_id) if task.category_id else None
-                    tags = expand_tags(task.tag_ids or [], request.user_id)
-                    
-                    # Filtrado en memoria por nombre de categoría
-                    if requested_category:
-                        if not cat or req_cat_lower not in (cat.get("name") or "").lower():
-                            continue
-                    
-                    # Filtrado en memoria por nombre de tag (al menos uno debe coincidir)
-                    if req_tags_lower:
-                        tag_names_lower = [(t.get("name") or "").lower() for t in tags]
-                        if not any(name in tag_names_lower for name in req_tags_lower):
-                            continue
-                    
-                    # Construir resultados gRPC
-                    category_pb = None
-                    if cat:
-                        category_pb = common_pb2.CategorySummary(
-                            id=str(cat.get("id")),
-                            name=cat.get("name") or "",
-                            color=cat.get("color") or ""
-                        )
-                    tag_pbs = [
-                        common_pb2.TagSummary(
-                            id=str(t.get("id")),
-                            name=t.get("name") or "",
-                            color=t.get("color") or ""
-                        ) for t in tags
-                    ]
-                    
-                    result = tasks_search_pb2.TaskSearchResult(
-                        id=task.id,
-                        title=task.title,
-                        description=task.description or "",
-                        completed=task.completed,
-                        priority=task.priority,
-                        due_date=task.due_date.isoformat() if task.due_date else "",
-                        user_id=task.user_id,
-                        created_at=task.created_at.isoformat() if task.created_at else "",
-                        updated_at=task.updated_at.isoformat() if task.updated_at else ""
-                    )
-                    if category_pb:
-                        result.category.CopyFrom(category_pb)
-                    result.tags.extend(tag_pbs)
-                    filtered.append(result)
-                
-                total = len(filtered)
-                # Paginación en memoria
-                page_slice = filtered[skip:skip+limit]
-                
-                return tasks_search_pb2.SearchTasksResponse(
-                    tasks=page_slice,
-                    total=total
-                )
-                
-            finally:
-                db.close()
-                
+
+            # Nombres de categoría/tag -> ids con una consulta de catálogo por tipo
+            category_ids, tag_ids = await resolve_search_catalog(request)
+            if category_ids == [] or tag_ids == []:
+                return tasks_search_pb2.SearchTasksResponse(tasks=[], total=0)
+
+            # Filtro, conteo y paginación en Postgres
+            mode = SEARCH_MODES.get(request.mode, SEARCH_SUBSTRING)
+            filters, rank = search_filters(request.user_id, request.query, category_ids, tag_ids, mode)
+            async with AsyncSessionLocal() as db:
+                total = (await db.execute(search_count_stmt(filters))).scalar_one()
+                tasks = (await db.execute(search_page_stmt(filters, skip, limit, rank))).scalars().all() if skip < total else []
+
+            # Expandir solo la página, en lote
+            categories, tags = await expand_batch(tasks, request.user_id)
+            return tasks_search_pb2.SearchTasksResponse(
+                tasks=[to_search_result(t, categories, tags) for t in tasks],
+                total=total
+            )
+
         except Exception as e:
             context.set_code(grpc.StatusCode.INTERNAL)
             context.set_details(f"Internal server error: {str(e)}")
             return tasks_search_pb2.SearchTasksResponse()
 
+    @observed
+    async def StreamSearchTasks(self, request, context):
+        """Como SearchTasks, pero emite cada resultado según sale del cursor de servidor"""
+        if len(request.query) > 1000:
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT, "Query too long")
+        limit = min(request.limit, GRPC_STREAM_MAX_RESULTS) if request.limit > 0 else GRPC_STREAM_MAX_RESULTS
+        skip = max(0, request.skip)
+        try:
+            category_ids, tag_ids = await resolve_search_catalog(request)
+            if category_ids == [] or tag_ids == []:
+                return
+            mode = SEARCH_MODES.get(request.mode, SEARCH_SUBSTRING)
+            filters, rank = search_filters(request.user_id, request.query, category_ids, tag_ids, mode)
+            # yield_per: cursor de servidor (asyncpg), se leen GRPC_STREAM_BATCH_SIZE filas cada vez
+            stmt = search_page_stmt(filters, skip, limit, rank).execution_options(yield_per=GRPC_STREAM_BATCH_SIZE)
+            # Si el cliente cancela o vence el deadline, grpc.aio cancela esta corrutina
+            # y el `async with` cierra cursor y transacción
+            async with AsyncSessionLocal() as db:
+                result = await db.stream(stmt)
+                async for batch in result.scalars().partitions():
+                    categories, tags = await expand_batch(batch, request.user_id)
+                    for task in batch:
+                        # Cada yield espera a que gRPC acepte el mensaje (control de flujo HTTP/2)
+                        yield to_search_result(task, categories, tags)
+        except (asyncio.CancelledError, grpc.aio.AbortError):
+            raise
+        except Exception as e:
+            await context.abort(grpc.StatusCode.INTERNAL, f"Internal server error: {str(e)}")
+
 
-def serve_grpc():
-    """Inicia el servidor gRPC"""
-    import os
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
+def _server_credentials():
+    """Credenciales TLS/mTLS opcionales por entorno (None = sin TLS)"""
+    if os.getenv('GRPC_TLS_ENABLE', 'false').lower() != 'true':
+        return None
+    cert_path = os.getenv('GRPC_TLS_CERT_PATH', '')
+    key_path = os.getenv('GRPC_TLS_KEY_PATH', '')
+    ca_path = os.getenv('GRPC_TLS_CLIENT_CA_PATH', '')
+    with open(cert_path, 'rb') as f:
+        cert_chain = f.read()
+    with open(key_path, 'rb') as f:
+        private_key = f.read()
+    root_certs = None
+    require_client_auth = False
+    if ca_path:
+        with open(ca_path, 'rb') as f:
+            root_certs = f.read()
+            require_client_auth = True
+    return grpc.ssl_server_credentials(
+        [(private_key, cert_chain)],
+        root_certificates=root_certs,
+        require_client_auth=require_client_auth,
+    )
+
+
+def create_server() -> grpc.aio.Server:
+    server = grpc.aio.server(
+        maximum_concurrent_rpcs=GRPC_MAX_CONCURRENT_RPCS or None,
+        options=[
+            ("grpc.max_send_message_length", GRPC_MAX_MESSAGE_BYTES),
+            ("grpc.max_receive_message_length", GRPC_MAX_MESSAGE_BYTES),
+            ("grpc.keepalive_time_ms", GRPC_KEEPALIVE_TIME_MS),
+            ("grpc.keepalive_timeout_ms", GRPC_KEEPALIVE_TIMEOUT_MS),
+            ("grpc.keepalive_permit_without_calls", 1),
+            # Aceptar pings de clientes con keepalive igual o más lento que el nuestro
+            ("grpc.http2.min_ping_interval_without_data_ms", GRPC_KEEPALIVE_TIME_MS),
+        ],
+    )
     tasks_search_pb2_grpc.add_TasksSearchServiceServicer_to_server(
         TasksSearchServicer(), server
     )
-    
-    listen_addr = '[::]:50052'
-    # Soporte TLS/mTLS opcional por entorno
-    enable_tls = os.getenv('GRPC_TLS_ENABLE', 'false').lower() == 'true'
-    if enable_tls:
-        cert_path = os.getenv('GRPC_TLS_CERT_PATH', '')
-        key_path = os.getenv('GRPC_TLS_KEY_PATH', '')
-        ca_path = os.getenv('GRPC_TLS_CLIENT_CA_PATH', '')
-        try:
-            with open(cert_path, 'rb') as f:
-                cert_chain = f.read()
-            with open(key_path, 'rb') as f:
-                private_key = f.read()
-            root_certs = None
-            require_client_auth = False
-            if ca_path:
-                with open(ca_path, 'rb') as f:
-                    root_certs = f.read()
-                    require_client_auth = True
-            creds = grpc.ssl_server_credentials(
-                [(private_key, cert_chain)],
-                root_certificates=root_certs,
-                require_client_auth=require_client_auth,
-            )
-            server.add_secure_port(listen_addr, creds)
-            print(f"Starting Tasks gRPC server (TLS) on {listen_addr}")
-        except Exception as e:
-            server.add_insecure_port(listen_addr)
-            print(f"[WARN] TLS disabled due to error: {e}. Starting insecure gRPC at {listen_addr}")
+    try:
+        creds = _server_credentials()
+    except Exception as e:
+        creds = None
+        print(f"[WARN] TLS disabled due to error: {e}. Starting insecure gRPC at {GRPC_LISTEN_ADDR}")
+    if creds is not None:
+        server.add_secure_port(GRPC_LISTEN_ADDR, creds)
+        print(f"Starting Tasks gRPC server (TLS) on {GRPC_LISTEN_ADDR}")
     else:
-        server.add_insecure_port(listen_addr)
-        print(f"Starting Tasks gRPC server on {listen_addr}")
-    server.start()
-    server.wait_for_termination()
+        server.add_insecure_port(GRPC_LISTEN_ADDR)
+        print(f"Starting Tasks gRPC server on {GRPC_LISTEN_ADDR}")
+    return server
+
+
+async def start_grpc_server() -> grpc.aio.Server:
+    """Inicia el servidor gRPC en el event loop actual"""
+    global _server
+    _server = create_server()
+    await _server.start()
+    return _server
+
+
+async def stop_grpc_server() -> None:
+    """Deja de aceptar RPCs y espera hasta GRPC_SHUTDOWN_GRACE_SECONDS a las que están en curso"""
+    global _server
+    if _server is not None:
+        await _server.stop(GRPC_SHUTDOWN_GRACE_SECONDS)
+        _server = None
+
+
+async def serve_grpc():
+    server = await start_grpc_server()
+    await server.wait_for_termination()
 
 
 if __name__ == '__main__':
-    serve_grpc()
\ No newline at end of file
+    asyncio.run(serve_grpc())
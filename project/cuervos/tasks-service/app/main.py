@@ -1,13 +1,32 @@
+import asyncio
+import logging
+import os
 import threading
 from fastapi import FastAPI, Request, Response
 from prometheus_client import Counter, Histogram, CONTENT_TYPE_LATEST, generate_latest
 from sqlalchemy import text
-from app.routers.tasks import router as tasks_router
 from app.database.postgres import Base, engine
-from app.models.postgres_models import Task
+from app.models.postgres_models import SEARCH_VECTOR_SQL, Task
+
+# Stack async (asyncpg + httpx.AsyncClient + aio-pika) seleccionable al arrancar
+TASKS_ASYNC = os.getenv("TASKS_ASYNC", "false").lower() == "true"
+if TASKS_ASYNC:
+    from app.routers.tasks_async import router as tasks_router
+else:
+    from app.routers.tasks import router as tasks_router
 
 app = FastAPI(title="Tasks Service", version="0.1.0")
 
+logger = logging.getLogger(__name__)
+
+# Índices trigram (pg_trgm) para búsqueda por subcadena; requiere poder crear la extensión
+TASKS_SEARCH_TRGM = os.getenv("TASKS_SEARCH_TRGM", "true").lower() == "true"
+
+# Señales de parada para el consumidor de eventos de catálogo y el relay del outbox
+CATALOG_STOP = threading.Event()
+OUTBOX_STOP = threading.Event()
+OUTBOX_THREAD: threading.Thread | None = None
+
 REQUEST_COUNTER = Counter(
     "tasks_requests_total",
     "Total de solicitudes",
@@ -31,18 +50,67 @@ async def prometheus_middleware(request: Request, call_next):
 
 @app.on_event("startup")
 def on_startup():
-    # Crear tablas necesarias (solo tasks)
+    global OUTBOX_THREAD
+    # Crear tablas necesarias (tasks y catálogo local de tags/categorías)
     Base.metadata.create_all(bind=engine)
     # Asegurar que no haya FK y que exista tag_ids
     with engine.connect() as conn:
         conn.execute(text("ALTER TABLE IF EXISTS tasks DROP CONSTRAINT IF EXISTS tasks_category_id_fkey"))
         conn.execute(text("ALTER TABLE IF EXISTS tasks ADD COLUMN IF NOT EXISTS tag_ids INTEGER[]"))
+        # Tablas de catálogo local previas pueden no tener marca de sincronización
+        conn.execute(text("ALTER TABLE IF EXISTS tags ADD COLUMN IF NOT EXISTS synced_at TIMESTAMPTZ DEFAULT now()"))
+        conn.execute(text("ALTER TABLE IF EXISTS categories ADD COLUMN IF NOT EXISTS synced_at TIMESTAMPTZ DEFAULT now()"))
+        # Paginación por (updated_at, id): updated_at siempre con valor e índice compuesto por usuario
+        conn.execute(text("ALTER TABLE IF EXISTS tasks ALTER COLUMN updated_at SET DEFAULT now()"))
+        conn.execute(text("UPDATE tasks SET updated_at = created_at WHERE updated_at IS NULL"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_tasks_user_updated_id ON tasks (user_id, updated_at, id)"))
+        # Búsqueda full-text: tsvector generado (title peso A, description peso B) con índice GIN
+        conn.execute(text(f"ALTER TABLE IF EXISTS tasks ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ({SEARCH_VECTOR_SQL}) STORED"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_tasks_search_vector ON tasks USING GIN (search_vector)"))
         conn.commit()
-    
-    # Iniciar servidor gRPC en un hilo separado
-    from app.grpc.tasks_search_server import serve_grpc
-    grpc_thread = threading.Thread(target=serve_grpc, daemon=True)
-    grpc_thread.start()
+    if TASKS_SEARCH_TRGM:
+        try:
+            with engine.connect() as conn:
+                conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+                conn.execute(text("CREATE INDEX IF NOT EXISTS ix_tasks_title_trgm ON tasks USING GIN (title gin_trgm_ops)"))
+                conn.execute(text("CREATE INDEX IF NOT EXISTS ix_tasks_description_trgm ON tasks USING GIN (description gin_trgm_ops)"))
+                conn.commit()
+        except Exception as e:
+            # Sin pg_trgm el modo substring sigue funcionando, sin índice
+            logger.warning(f"pg_trgm no disponible: {e}")
+
+    # Mantener el catálogo local al día con eventos tag.*/category.*
+    from app.services.catalog_cache import CATALOG_CACHE_ENABLED, CATALOG_EVENTS_ENABLED, run_catalog_consumer
+    if CATALOG_CACHE_ENABLED and CATALOG_EVENTS_ENABLED:
+        catalog_thread = threading.Thread(target=run_catalog_consumer, args=(CATALOG_STOP,), daemon=True)
+        catalog_thread.start()
+
+    # Publicar los eventos del outbox (escritos en la misma transacción que las tareas)
+    from app.services.outbox import run_outbox_relay
+    OUTBOX_THREAD = threading.Thread(target=run_outbox_relay, args=(OUTBOX_STOP,), daemon=True)
+    OUTBOX_THREAD.start()
+
+@app.on_event("startup")
+async def start_grpc():
+    # Servidor gRPC (grpc.aio) en el mismo event loop que FastAPI
+    from app.grpc.tasks_search_server import start_grpc_server
+    await start_grpc_server()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    from app.services.serialization import close_client, aclose_async_client
+    from app.database.postgres_async import async_engine
+    from app.grpc.tasks_search_server import stop_grpc_server
+    # Primero gRPC: termina las RPCs en curso antes de cerrar clientes y pool async
+    await stop_grpc_server()
+    CATALOG_STOP.set()
+    OUTBOX_STOP.set()
+    close_client()
+    await aclose_async_client()
+    await async_engine.dispose()
+    # Dejar que el relay termine el lote en curso; lo pendiente sigue en la tabla
+    if OUTBOX_THREAD is not None:
+        await asyncio.to_thread(OUTBOX_THREAD.join, 5.0)
 
 app.include_router(tasks_router)
 
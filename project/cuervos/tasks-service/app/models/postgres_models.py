@@ -1,8 +1,16 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text
+from sqlalchemy import BigInteger, Column, Computed, Integer, String, Boolean, DateTime, Text
+from sqlalchemy.orm import deferred
 from sqlalchemy.sql import func
-from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB, TSVECTOR
 from app.database.postgres import Base
 
+# Configuración de texto de la búsqueda: 'simple' (sin stemming) porque hay contenido en varios idiomas
+SEARCH_TS_CONFIG = "simple"
+SEARCH_VECTOR_SQL = (
+    f"setweight(to_tsvector('{SEARCH_TS_CONFIG}', coalesce(title, '')), 'A') || "
+    f"setweight(to_tsvector('{SEARCH_TS_CONFIG}', coalesce(description, '')), 'B')"
+)
+
 class Task(Base):
     __tablename__ = "tasks"
     id = Column(Integer, primary_key=True, index=True)
@@ -15,4 +23,40 @@ class Task(Base):
     category_id = Column(Integer)
     tag_ids = Column(ARRAY(Integer))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
\ No newline at end of file
+    # Con valor desde la creación: es la clave del orden/keyset del listado
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    # Columna generada para búsqueda full-text (índice GIN); diferida para no leerla en los listados
+    search_vector = deferred(Column(TSVECTOR, Computed(SEARCH_VECTOR_SQL, persisted=True)))
+
+
+class Category(Base):
+    """Copia local de categorías (fuente: categories-service)"""
+    __tablename__ = "categories"
+    # Mismo id que en el servicio origen (no autoincremental)
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    name = Column(String, nullable=False, default="")
+    color = Column(String)
+    user_id = Column(Integer, index=True)
+    synced_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class Tag(Base):
+    """Copia local de tags (fuente: tags-service)"""
+    __tablename__ = "tags"
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    name = Column(String, nullable=False, default="")
+    color = Column(String)
+    user_id = Column(Integer, index=True)
+    synced_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class OutboxEvent(Base):
+    """Evento pendiente de publicar (outbox transaccional, ver services/outbox.py)"""
+    __tablename__ = "outbox_events"
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    routing_key = Column(String, nullable=False)
+    payload = Column(JSONB, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    next_attempt_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text)
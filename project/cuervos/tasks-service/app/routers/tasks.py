@@ -1,12 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, Header
+from fastapi import APIRouter, Depends, HTTPException, Header, Query
 from sqlalchemy.orm import Session
 from typing import Optional
 
 from app.database.postgres import get_db
-from app.models.postgres_models import Task
-from app.schemas.task_schemas import Task as TaskSchema, TaskCreate, TaskUpdate, PaginatedResponse
-from app.services.serialization import serialize_task
-from app.services.events import publish_event
+from app.schemas.task_schemas import Task as TaskSchema, TaskCreate, TaskUpdate, PaginatedResponse, TaskBulkCreate, TaskBulkPatch, BulkResponse
+from app.services.serialization import serialize_task, serialize_tasks
+from app.services import task_bulk
+from app.services.outbox import add_event
+from app.services.task_queries import apply_patch, build_task, count_tasks_stmt, PageQuery, task_by_id_stmt
 
 router = APIRouter(prefix="/tasks", tags=["tasks"])
 
@@ -15,114 +16,100 @@ def get_current_user_id(x_user_id: Optional[int] = Header(default=None)) -> int:
     """Obtiene el user_id desde cabecera `X-User-Id` o usa 1 por defecto."""
     return x_user_id or 1
 
+
+def page_query(user_id: int, page: int, size: int, cursor: Optional[str], include_total: bool) -> PageQuery:
+    try:
+        return PageQuery(user_id, page, size, cursor, include_total)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 @router.get("/", response_model=PaginatedResponse[TaskSchema])
-def read_tasks(page: int = 1, size: int = 20, user_id: int = Depends(get_current_user_id), db: Session = Depends(get_db)):
-    skip = (page - 1) * size
-    total = db.query(Task).filter(Task.user_id == user_id).count()
-    tasks = db.query(Task).filter(Task.user_id == user_id).offset(skip).limit(size).all()
-    items = [serialize_task(t, user_id) for t in tasks]
-    pages = (total + size - 1) // size
-    return {"items": items, "total": total, "page": page, "size": size, "pages": pages}
+def read_tasks(page: int = Query(1, ge=1), size: int = Query(20, ge=1), cursor: Optional[str] = None,
+               include_total: bool = True, user_id: int = Depends(get_current_user_id), db: Session = Depends(get_db)):
+    query = page_query(user_id, page, size, cursor, include_total)
+    rows = db.execute(query.stmt()).all()
+    total = db.execute(count_tasks_stmt(user_id)).scalar_one() if query.needs_count(rows) else None
+    items = serialize_tasks(query.tasks(rows), user_id)
+    return query.response(rows, items, total)
 
 @router.post("/", response_model=TaskSchema, status_code=201)
 def create_task(task_in: TaskCreate, user_id: int = Depends(get_current_user_id), db: Session = Depends(get_db)):
-    db_task = Task(
-        title=task_in.title,
-        description=task_in.description,
-        priority=task_in.priority,
-        due_date=task_in.due_date,
-        user_id=user_id,
-    )
-    # Category
-    if task_in.category_id and task_in.category_id.strip():
-        try:
-            cid = int(task_in.category_id)
-            db_task.category_id = cid
-        except (ValueError, TypeError):
-            pass
-    # Tags
-    if task_in.tag_ids:
-        tag_ints = []
-        for tid in task_in.tag_ids:
-            try:
-                tag_ints.append(int(tid))
-            except (ValueError, TypeError):
-                continue
-        db_task.tag_ids = tag_ints
+    db_task = build_task(task_in, user_id)
     db.add(db_task)
-    db.commit()
-    db.refresh(db_task)
-    publish_event("task.created", {
+    # flush para tener el id; el evento va en la misma transacción (outbox)
+    db.flush()
+    add_event(db, "task.created", {
         "event_type": "created",
         "entity": "task",
         "user_id": user_id,
         "id": db_task.id,
         "title": db_task.title,
     })
+    db.commit()
+    db.refresh(db_task)
     return serialize_task(db_task, user_id)
 
+@router.post("/bulk", response_model=BulkResponse)
+def bulk_create_tasks(body: TaskBulkCreate, user_id: int = Depends(get_current_user_id), db: Session = Depends(get_db)):
+    task_bulk.check_size(len(body.items))
+    results, pending, rows = task_bulk.plan_creates(body.items, user_id)
+    if rows:
+        ids = db.execute(task_bulk.insert_stmt(), rows).scalars().all()
+        results = task_bulk.finish_creates(results, pending, ids)
+        add_event(db, "task.bulk", task_bulk.bulk_event(user_id, created=ids))
+        db.commit()
+    return task_bulk.response(results)
+
+@router.patch("/bulk", response_model=BulkResponse)
+def bulk_patch_tasks(body: TaskBulkPatch, user_id: int = Depends(get_current_user_id), db: Session = Depends(get_db)):
+    task_bulk.check_size(len(body.updates) + len(body.deletes))
+    ids = task_bulk.target_ids(body)
+    existing = set(db.execute(task_bulk.existing_ids_stmt(user_id, ids)).scalars().all()) if ids else set()
+    results, rows, deletes = task_bulk.plan_patch(body, existing)
+    if rows:
+        db.execute(task_bulk.update_stmt(), rows)
+    if deletes:
+        db.execute(task_bulk.delete_stmt(user_id, deletes))
+    if rows or deletes:
+        updated = [row["id"] for row in rows]
+        add_event(db, "task.bulk", task_bulk.bulk_event(user_id, updated=updated, deleted=deletes))
+    db.commit()
+    return task_bulk.response(results)
+
 @router.get("/{task_id}", response_model=TaskSchema)
 def read_task(task_id: int, user_id: int = Depends(get_current_user_id), db: Session = Depends(get_db)):
-    task = db.query(Task).filter(Task.id == task_id, Task.user_id == user_id).first()
+    task = db.execute(task_by_id_stmt(task_id, user_id)).scalars().first()
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
     return serialize_task(task, user_id)
 
 @router.put("/{task_id}", response_model=TaskSchema)
 def update_task(task_id: int, patch: TaskUpdate, user_id: int = Depends(get_current_user_id), db: Session = Depends(get_db)):
-    task = db.query(Task).filter(Task.id == task_id, Task.user_id == user_id).first()
+    task = db.execute(task_by_id_stmt(task_id, user_id)).scalars().first()
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
-    if patch.title is not None:
-        task.title = patch.title
-    if patch.description is not None:
-        task.description = patch.description
-    if patch.completed is not None:
-        task.completed = patch.completed
-    if patch.priority is not None:
-        task.priority = patch.priority
-    if patch.due_date is not None:
-        task.due_date = patch.due_date
-    # Category
-    if patch.category_id is not None:
-        if patch.category_id and patch.category_id.strip():
-            try:
-                cid = int(patch.category_id)
-                task.category_id = cid
-            except (ValueError, TypeError):
-                task.category_id = None
-        else:
-            task.category_id = None
-    # Tags replace set when provided
-    if patch.tag_ids is not None:
-        tag_ints = []
-        for tid in patch.tag_ids:
-            try:
-                tag_ints.append(int(tid))
-            except (ValueError, TypeError):
-                continue
-        task.tag_ids = tag_ints
-    db.commit()
-    db.refresh(task)
-    publish_event("task.updated", {
+    apply_patch(task, patch)
+    add_event(db, "task.updated", {
         "event_type": "updated",
         "entity": "task",
         "user_id": user_id,
         "id": task.id,
     })
+    db.commit()
+    db.refresh(task)
     return serialize_task(task, user_id)
 
 @router.delete("/{task_id}", status_code=204)
 def delete_task(task_id: int, user_id: int = Depends(get_current_user_id), db: Session = Depends(get_db)):
-    task = db.query(Task).filter(Task.id == task_id, Task.user_id == user_id).first()
+    task = db.execute(task_by_id_stmt(task_id, user_id)).scalars().first()
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
     db.delete(task)
-    db.commit()
-    publish_event("task.deleted", {
+    add_event(db, "task.deleted", {
         "event_type": "deleted",
         "entity": "task",
         "user_id": user_id,
         "id": task_id,
     })
-    return None
\ No newline at end of file
+    db.commit()
+    return None
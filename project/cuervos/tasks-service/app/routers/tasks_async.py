@@ -0,0 +1,112 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database.postgres_async import get_async_db
+from app.routers.tasks import get_current_user_id, page_query
+from app.schemas.task_schemas import Task as TaskSchema, TaskCreate, TaskUpdate, PaginatedResponse, TaskBulkCreate, TaskBulkPatch, BulkResponse
+from app.services.serialization import serialize_tasks_async
+from app.services import task_bulk
+from app.services.outbox import add_event
+from app.services.task_queries import apply_patch, build_task, count_tasks_stmt, task_by_id_stmt
+
+# Variante async del router de tareas (TASKS_ASYNC=true): mismas rutas y respuestas que routers/tasks.py
+router = APIRouter(prefix="/tasks", tags=["tasks"])
+
+
+async def serialize_one(task, user_id: int) -> dict:
+    return (await serialize_tasks_async([task], user_id))[0]
+
+@router.get("/", response_model=PaginatedResponse[TaskSchema])
+async def read_tasks(page: int = Query(1, ge=1), size: int = Query(20, ge=1), cursor: Optional[str] = None,
+                     include_total: bool = True, user_id: int = Depends(get_current_user_id), db: AsyncSession = Depends(get_async_db)):
+    query = page_query(user_id, page, size, cursor, include_total)
+    rows = (await db.execute(query.stmt())).all()
+    total = None
+    if query.needs_count(rows):
+        total = (await db.execute(count_tasks_stmt(user_id))).scalar_one()
+    items = await serialize_tasks_async(query.tasks(rows), user_id)
+    return query.response(rows, items, total)
+
+@router.post("/", response_model=TaskSchema, status_code=201)
+async def create_task(task_in: TaskCreate, user_id: int = Depends(get_current_user_id), db: AsyncSession = Depends(get_async_db)):
+    db_task = build_task(task_in, user_id)
+    db.add(db_task)
+    # flush para tener el id; el evento va en la misma transacción (outbox)
+    await db.flush()
+    add_event(db, "task.created", {
+        "event_type": "created",
+        "entity": "task",
+        "user_id": user_id,
+        "id": db_task.id,
+        "title": db_task.title,
+    })
+    await db.commit()
+    await db.refresh(db_task)
+    return await serialize_one(db_task, user_id)
+
+@router.post("/bulk", response_model=BulkResponse)
+async def bulk_create_tasks(body: TaskBulkCreate, user_id: int = Depends(get_current_user_id), db: AsyncSession = Depends(get_async_db)):
+    task_bulk.check_size(len(body.items))
+    results, pending, rows = task_bulk.plan_creates(body.items, user_id)
+    if rows:
+        ids = (await db.execute(task_bulk.insert_stmt(), rows)).scalars().all()
+        results = task_bulk.finish_creates(results, pending, ids)
+        add_event(db, "task.bulk", task_bulk.bulk_event(user_id, created=ids))
+        await db.commit()
+    return task_bulk.response(results)
+
+@router.patch("/bulk", response_model=BulkResponse)
+async def bulk_patch_tasks(body: TaskBulkPatch, user_id: int = Depends(get_current_user_id), db: AsyncSession = Depends(get_async_db)):
+    task_bulk.check_size(len(body.updates) + len(body.deletes))
+    ids = task_bulk.target_ids(body)
+    existing = set((await db.execute(task_bulk.existing_ids_stmt(user_id, ids))).scalars().all()) if ids else set()
+    results, rows, deletes = task_bulk.plan_patch(body, existing)
+    if rows:
+        await db.execute(task_bulk.update_stmt(), rows)
+    if deletes:
+        await db.execute(task_bulk.delete_stmt(user_id, deletes))
+    if rows or deletes:
+        updated = [row["id"] for row in rows]
+        add_event(db, "task.bulk", task_bulk.bulk_event(user_id, updated=updated, deleted=deletes))
+    await db.commit()
+    return task_bulk.response(results)
+
+@router.get("/{task_id}", response_model=TaskSchema)
+async def read_task(task_id: int, user_id: int = Depends(get_current_user_id), db: AsyncSession = Depends(get_async_db)):
+    task = (await db.execute(task_by_id_stmt(task_id, user_id))).scalars().first()
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found")
+    return await serialize_one(task, user_id)
+
+@router.put("/{task_id}", response_model=TaskSchema)
+async def update_task(task_id: int, patch: TaskUpdate, user_id: int = Depends(get_current_user_id), db: AsyncSession = Depends(get_async_db)):
+    task = (await db.execute(task_by_id_stmt(task_id, user_id))).scalars().first()
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found")
+    apply_patch(task, patch)
+    add_event(db, "task.updated", {
+        "event_type": "updated",
+        "entity": "task",
+        "user_id": user_id,
+        "id": task.id,
+    })
+    await db.commit()
+    await db.refresh(task)
+    return await serialize_one(task, user_id)
+
+@router.delete("/{task_id}", status_code=204)
+async def delete_task(task_id: int, user_id: int = Depends(get_current_user_id), db: AsyncSession = Depends(get_async_db)):
+    task = (await db.execute(task_by_id_stmt(task_id, user_id))).scalars().first()
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found")
+    await db.delete(task)
+    add_event(db, "task.deleted", {
+        "event_type": "deleted",
+        "entity": "task",
+        "user_id": user_id,
+        "id": task_id,
+    })
+    await db.commit()
+    return None
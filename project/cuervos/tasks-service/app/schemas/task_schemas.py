@@ -6,10 +6,13 @@ T = TypeVar('T')
 
 class PaginatedResponse(BaseModel, Generic[T]):
     items: List[T]
-    total: int
+    # None con include_total=false
+    total: Optional[int] = None
     page: int
     size: int
-    pages: int
+    pages: Optional[int] = None
+    # Cursor para la página siguiente (None si no hay más)
+    next_cursor: Optional[str] = None
 
 class TaskBase(BaseModel):
     title: str
@@ -53,4 +56,26 @@ class Task(BaseModel):
     updated_at: Optional[datetime] = None
     status: Optional[str] = None
     category: Optional[CategorySummary] = None
-    tags: List[TagSummary] = []
\ No newline at end of file
+    tags: List[TagSummary] = []
+
+class TaskBulkCreate(BaseModel):
+    items: List[TaskCreate]
+
+class TaskBulkUpdateItem(TaskUpdate):
+    id: int
+
+class TaskBulkPatch(BaseModel):
+    updates: List[TaskBulkUpdateItem] = []
+    deletes: List[int] = []
+
+class BulkItemResult(BaseModel):
+    index: int  # posición en la lista de la petición (items, updates o deletes)
+    op: str  # create, update, delete
+    status: int
+    id: Optional[int] = None
+    error: Optional[str] = None
+
+class BulkResponse(BaseModel):
+    results: List[BulkItemResult]
+    succeeded: int
+    failed: int
@@ -0,0 +1,331 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+import pika
+from prometheus_client import Counter, Gauge, Histogram
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.database.postgres import SessionLocal
+from app.models.postgres_models import Category, Tag
+from app.services.events import RABBITMQ_URL, EXCHANGE_NAME
+
+# Caché read-through de catálogo (tags/categorías) por usuario:
+# memoria (LRU con TTL) -> tablas locales -> servicio origen (solo en miss o fila vencida).
+# Las tablas locales se mantienen al día consumiendo `tag.*` y `category.*` de tasknotes.events.
+CATALOG_CACHE_ENABLED = os.getenv("CATALOG_CACHE_ENABLED", "true").lower() == "true"
+CATALOG_CACHE_MAX_ENTRIES = int(os.getenv("CATALOG_CACHE_MAX_ENTRIES", "50000"))
+CATALOG_CACHE_TTL_SECONDS = float(os.getenv("CATALOG_CACHE_TTL_SECONDS", "300"))
+# Filas locales sin sincronizar en este tiempo se refrescan del servicio origen (por si se perdieron eventos)
+CATALOG_LOCAL_MAX_AGE_SECONDS = float(os.getenv("CATALOG_LOCAL_MAX_AGE_SECONDS", "3600"))
+CATALOG_EVENTS_ENABLED = os.getenv("CATALOG_EVENTS_ENABLED", "true").lower() == "true"
+
+MODELS = {"category": Category, "tag": Tag}
+
+logger = logging.getLogger("catalog")
+
+CATALOG_LOOKUPS = Counter(
+    "tasks_catalog_lookups_total",
+    "Resoluciones de catálogo por origen (memory/local/remote/missing)",
+    ["kind", "source"],
+)
+CATALOG_STALENESS = Histogram(
+    "tasks_catalog_staleness_seconds",
+    "Antigüedad desde la última sincronización de las entradas servidas",
+    ["kind"],
+    buckets=(1, 10, 60, 300, 900, 1800, 3600, 7200, 86400),
+)
+CATALOG_EVENTS = Counter(
+    "tasks_catalog_events_total",
+    "Eventos de catálogo aplicados a las tablas locales",
+    ["kind", "event_type"],
+)
+CATALOG_LAST_EVENT = Gauge(
+    "tasks_catalog_last_event_timestamp_seconds",
+    "Timestamp del último evento de catálogo aplicado",
+)
+
+
+def summary(item: Any) -> Dict[str, Any]:
+    return {"id": str(item.id), "name": item.name, "color": item.color}
+
+
+class CatalogCache:
+    """LRU en memoria (kind, user_id, id) -> (resumen o None si no existe, synced_at, cached_at)"""
+
+    def __init__(self, max_entries: int = 50000, ttl_seconds: float = 300.0):
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = max(0.0, ttl_seconds)
+        self._entries: "OrderedDict[Tuple[str, int, int], Tuple[Optional[Dict[str, Any]], float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_many(self, kind: str, ids: Iterable[int], user_id: int) -> Tuple[Dict[int, Tuple[Optional[Dict[str, Any]], float]], List[int]]:
+        found: Dict[int, Tuple[Optional[Dict[str, Any]], float]] = {}
+        missing: List[int] = []
+        now = time.monotonic()
+        with self._lock:
+            for item_id in ids:
+                key = (kind, user_id, item_id)
+                entry = self._entries.get(key)
+                if entry is None or now - entry[2] >= self.ttl_seconds:
+                    missing.append(item_id)
+                    continue
+                self._entries.move_to_end(key)
+                found[item_id] = (entry[0], entry[1])
+        return found, missing
+
+    def put_many(self, kind: str, user_id: int, items: Dict[int, Tuple[Optional[Dict[str, Any]], float]]) -> None:
+        now = time.monotonic()
+        with self._lock:
+            for item_id, (value, synced_at) in items.items():
+                key = (kind, user_id, item_id)
+                self._entries[key] = (value, synced_at, now)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, kind: str, user_id: int, item_id: int) -> None:
+        with self._lock:
+            self._entries.pop((kind, user_id, item_id), None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+CATALOG = CatalogCache(max_entries=CATALOG_CACHE_MAX_ENTRIES, ttl_seconds=CATALOG_CACHE_TTL_SECONDS)
+
+CATALOG_ENTRIES = Gauge("tasks_catalog_cache_entries", "Entradas en la caché de catálogo en memoria")
+CATALOG_ENTRIES.set_function(lambda: len(CATALOG))
+
+
+def remember(kind: str, user_id: int, items: Dict[int, Dict[str, Any]]) -> None:
+    """Guarda en memoria un catálogo ya obtenido del servicio origen (p. ej. el listado completo)"""
+    now = time.time()
+    CATALOG.put_many(kind, user_id, {item_id: (item, now) for item_id, item in items.items()})
+
+
+def upsert_stmt(kind: str, rows: List[Dict[str, Any]]):
+    model = MODELS[kind]
+    stmt = pg_insert(model.__table__).values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=[model.id],
+        set_={"name": stmt.excluded.name, "color": stmt.excluded.color, "user_id": stmt.excluded.user_id, "synced_at": stmt.excluded.synced_at},
+    )
+
+
+def upsert_rows(db, kind: str, rows: List[Dict[str, Any]]) -> None:
+    if rows:
+        db.execute(upsert_stmt(kind, rows))
+
+
+def _split_found(kind: str, ids: Iterable[int], user_id: int):
+    unique = sorted({int(i) for i in ids if i})
+    if not unique:
+        return {}, []
+    found, missing = CATALOG.get_many(kind, unique, user_id)
+    if found:
+        CATALOG_LOOKUPS.labels(kind=kind, source="memory").inc(len(found))
+    return found, missing
+
+
+def _finish(kind: str, found: Dict[int, Tuple[Optional[Dict[str, Any]], float]]) -> Dict[int, Dict[str, Any]]:
+    resolved: Dict[int, Dict[str, Any]] = {}
+    now = time.time()
+    for item_id, (value, synced_at) in found.items():
+        if value is None:
+            continue
+        CATALOG_STALENESS.labels(kind=kind).observe(max(0.0, now - synced_at))
+        resolved[item_id] = value
+    return resolved
+
+
+def _from_local_rows(kind: str, rows: List[Any], now: float):
+    """Filas locales -> (cargadas, ids a refrescar por antigüedad)"""
+    loaded: Dict[int, Tuple[Optional[Dict[str, Any]], float]] = {}
+    refresh: List[int] = []
+    for row in rows:
+        synced_at = row.synced_at.timestamp() if row.synced_at else 0.0
+        loaded[row.id] = (summary(row), synced_at)
+        if now - synced_at > CATALOG_LOCAL_MAX_AGE_SECONDS:
+            refresh.append(row.id)
+    CATALOG_LOOKUPS.labels(kind=kind, source="local").inc(len(loaded) - len(refresh))
+    return loaded, refresh
+
+
+def _remote_rows(remote: Dict[int, Dict[str, Any]], user_id: int, now: float) -> List[Dict[str, Any]]:
+    synced = datetime.fromtimestamp(now, tz=timezone.utc)
+    return [
+        {"id": item_id, "name": item.get("name") or "", "color": item.get("color"), "user_id": user_id, "synced_at": synced}
+        for item_id, item in remote.items()
+    ]
+
+
+def _merge_remote(kind: str, loaded, remote_ids: List[int], remote: Dict[int, Dict[str, Any]], now: float) -> None:
+    CATALOG_LOOKUPS.labels(kind=kind, source="remote").inc(len(remote))
+    for item_id, item in remote.items():
+        loaded[item_id] = (item, now)
+    # Ids inexistentes también se cachean (negativo) para no repetir la llamada remota;
+    # una respuesta vacía puede ser un fallo del servicio y no se cachea
+    for item_id in remote_ids if remote else ():
+        if item_id not in loaded:
+            loaded[item_id] = (None, now)
+            CATALOG_LOOKUPS.labels(kind=kind, source="missing").inc()
+
+
+def resolve(
+    kind: str,
+    ids: Iterable[int],
+    user_id: int,
+    fetch_remote: Callable[[List[int], int], Dict[int, Dict[str, Any]]],
+) -> Dict[int, Dict[str, Any]]:
+    """Resuelve ids de catálogo: memoria -> tabla local -> servicio origen (y persiste lo obtenido)"""
+    found, missing = _split_found(kind, ids, user_id)
+    if missing:
+        try:
+            loaded = _load_missing(kind, missing, user_id, fetch_remote)
+        except Exception as e:
+            # Catálogo local no disponible: se resuelve directo contra el servicio origen
+            logger.warning(f"Catálogo local no disponible ({kind}): {e}")
+            return fetch_remote(missing, user_id) | _finish(kind, found)
+        CATALOG.put_many(kind, user_id, loaded)
+        found.update(loaded)
+    return _finish(kind, found)
+
+
+def _load_missing(
+    kind: str,
+    missing: List[int],
+    user_id: int,
+    fetch_remote: Callable[[List[int], int], Dict[int, Dict[str, Any]]],
+) -> Dict[int, Tuple[Optional[Dict[str, Any]], float]]:
+    model = MODELS[kind]
+    now = time.time()
+    with SessionLocal() as db:
+        rows = db.query(model).filter(model.id.in_(missing), model.user_id == user_id).all()
+        loaded, refresh = _from_local_rows(kind, rows, now)
+        remote_ids = [i for i in missing if i not in loaded] + refresh
+        if remote_ids:
+            remote = fetch_remote(remote_ids, user_id)
+            try:
+                upsert_rows(db, kind, _remote_rows(remote, user_id, now))
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                logger.warning(f"No se pudo persistir catálogo local ({kind}): {e}")
+            _merge_remote(kind, loaded, remote_ids, remote, now)
+    return loaded
+
+
+async def resolve_async(
+    kind: str,
+    ids: Iterable[int],
+    user_id: int,
+    fetch_remote: Callable[[List[int], int], Awaitable[Dict[int, Dict[str, Any]]]],
+) -> Dict[int, Dict[str, Any]]:
+    """Variante async de `resolve` (AsyncSession + fetch remoto async); comparte la memoria"""
+    found, missing = _split_found(kind, ids, user_id)
+    if missing:
+        try:
+            loaded = await _load_missing_async(kind, missing, user_id, fetch_remote)
+        except Exception as e:
+            logger.warning(f"Catálogo local no disponible ({kind}): {e}")
+            return (await fetch_remote(missing, user_id)) | _finish(kind, found)
+        CATALOG.put_many(kind, user_id, loaded)
+        found.update(loaded)
+    return _finish(kind, found)
+
+
+async def _load_missing_async(
+    kind: str,
+    missing: List[int],
+    user_id: int,
+    fetch_remote: Callable[[List[int], int], Awaitable[Dict[int, Dict[str, Any]]]],
+) -> Dict[int, Tuple[Optional[Dict[str, Any]], float]]:
+    from sqlalchemy import select
+    from app.database.postgres_async import AsyncSessionLocal
+
+    model = MODELS[kind]
+    now = time.time()
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(select(model).where(model.id.in_(missing), model.user_id == user_id))
+        loaded, refresh = _from_local_rows(kind, result.scalars().all(), now)
+        remote_ids = [i for i in missing if i not in loaded] + refresh
+        if remote_ids:
+            remote = await fetch_remote(remote_ids, user_id)
+            try:
+                if remote:
+                    await db.execute(upsert_stmt(kind, _remote_rows(remote, user_id, now)))
+                    await db.commit()
+            except Exception as e:
+                await db.rollback()
+                logger.warning(f"No se pudo persistir catálogo local ({kind}): {e}")
+            _merge_remote(kind, loaded, remote_ids, remote, now)
+    return loaded
+
+
+def apply_event(routing_key: str, body: bytes) -> None:
+    kind, _, event_type = routing_key.partition(".")
+    if kind not in MODELS:
+        return
+    payload = json.loads(body)
+    item_id = int(payload["id"])
+    user_id = int(payload["user_id"])
+    with SessionLocal() as db:
+        if event_type == "deleted":
+            db.query(MODELS[kind]).filter(MODELS[kind].id == item_id).delete()
+        else:
+            upsert_rows(db, kind, [{
+                "id": item_id,
+                "name": payload.get("name") or "",
+                "color": payload.get("color"),
+                "user_id": user_id,
+                "synced_at": datetime.now(timezone.utc),
+            }])
+        db.commit()
+    CATALOG.invalidate(kind, user_id, item_id)
+    CATALOG_EVENTS.labels(kind=kind, event_type=event_type).inc()
+    CATALOG_LAST_EVENT.set(time.time())
+
+
+def run_catalog_consumer(stop_event: threading.Event) -> None:
+    """Consumidor bloqueante (hilo aparte) de eventos tag.*/category.*"""
+    while not stop_event.is_set():
+        connection = None
+        try:
+            connection = pika.BlockingConnection(pika.URLParameters(RABBITMQ_URL))
+            channel = connection.channel()
+            channel.exchange_declare(exchange=EXCHANGE_NAME, exchange_type="topic", durable=True)
+            # Cola exclusiva por réplica: cada réplica invalida su propia memoria
+            queue = channel.queue_declare(queue="", exclusive=True).method.queue
+            for kind in MODELS:
+                channel.queue_bind(exchange=EXCHANGE_NAME, queue=queue, routing_key=f"{kind}.*")
+            # Eventos perdidos sin conexión: la memoria se descarta; las filas locales caducan por antigüedad
+            CATALOG.clear()
+            logger.info(f"Catálogo local suscrito a {EXCHANGE_NAME}")
+            for method, _properties, body in channel.consume(queue, auto_ack=True, inactivity_timeout=1.0):
+                if stop_event.is_set():
+                    break
+                if method is None:
+                    continue
+                try:
+                    apply_event(method.routing_key, body)
+                except Exception as e:
+                    logger.warning(f"Evento de catálogo inválido '{method.routing_key}': {e}")
+        except Exception as e:
+            logger.warning(f"Consumidor de catálogo desconectado: {e}")
+            stop_event.wait(5.0)
+        finally:
+            try:
+                if connection is not None and connection.is_open:
+                    connection.close()
+            except Exception:
+                pass
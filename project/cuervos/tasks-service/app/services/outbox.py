@@ -0,0 +1,139 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+from prometheus_client import Counter, Gauge, Histogram
+from sqlalchemy import delete, func, select
+
+from app.database.postgres import SessionLocal
+from app.models.postgres_models import OutboxEvent
+from app.services.events import RABBITMQ_URL, EXCHANGE_NAME
+
+# Outbox transaccional: los routers guardan el evento en la misma transacción que el cambio
+# de la tarea y un relay en segundo plano lo publica en lotes con publisher confirms.
+# Entrega al menos una vez: `message_id` lleva el id del outbox para deduplicar.
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "200"))
+OUTBOX_POLL_INTERVAL_SECONDS = float(os.getenv("OUTBOX_POLL_INTERVAL_SECONDS", "0.5"))
+OUTBOX_RETRY_BASE_SECONDS = float(os.getenv("OUTBOX_RETRY_BASE_SECONDS", "1.0"))
+OUTBOX_RETRY_MAX_SECONDS = float(os.getenv("OUTBOX_RETRY_MAX_SECONDS", "300"))
+OUTBOX_PUBLISH_TIMEOUT_SECONDS = float(os.getenv("OUTBOX_PUBLISH_TIMEOUT_SECONDS", "10"))
+
+logger = logging.getLogger("outbox")
+
+OUTBOX_BACKLOG = Gauge("tasks_outbox_backlog", "Eventos pendientes en el outbox")
+OUTBOX_LAG = Gauge("tasks_outbox_lag_seconds", "Antigüedad del evento pendiente más viejo del outbox")
+OUTBOX_PUBLISHED = Counter("tasks_outbox_published_total", "Eventos del outbox publicados y confirmados")
+OUTBOX_FAILURES = Counter("tasks_outbox_publish_failures_total", "Publicaciones del outbox fallidas (se reintentan)")
+OUTBOX_DELIVERY_DELAY = Histogram(
+    "tasks_outbox_delivery_delay_seconds",
+    "Tiempo entre el commit del evento y su confirmación por RabbitMQ",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300),
+)
+
+
+def add_event(db, routing_key: str, payload: dict) -> None:
+    """Encola un evento en la sesión actual (Session o AsyncSession); se publica tras el commit"""
+    db.add(OutboxEvent(routing_key=routing_key, payload=payload))
+
+
+def retry_delay(attempts: int) -> float:
+    return min(OUTBOX_RETRY_MAX_SECONDS, OUTBOX_RETRY_BASE_SECONDS * (2 ** max(0, attempts - 1)))
+
+
+def _update_backlog(db) -> None:
+    pending, oldest = db.execute(select(func.count(), func.min(OutboxEvent.created_at))).one()
+    OUTBOX_BACKLOG.set(pending)
+    OUTBOX_LAG.set(max(0.0, (datetime.now(timezone.utc) - oldest).total_seconds()) if oldest else 0.0)
+
+
+def _message(event: OutboxEvent):
+    import aio_pika
+
+    return aio_pika.Message(
+        body=json.dumps(event.payload).encode("utf-8"),
+        content_type="application/json",
+        delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
+        message_id=str(event.id),
+    )
+
+
+async def relay_batch(exchange) -> int:
+    """Publica un lote de eventos vencidos; borra los confirmados y reprograma los fallidos"""
+    with SessionLocal() as db:
+        now = datetime.now(timezone.utc)
+        # SKIP LOCKED: varias réplicas pueden drenar el outbox sin repartirse el mismo evento
+        events: List[OutboxEvent] = db.execute(
+            select(OutboxEvent)
+            .where(OutboxEvent.next_attempt_at <= now)
+            .order_by(OutboxEvent.id)
+            .limit(OUTBOX_BATCH_SIZE)
+            .with_for_update(skip_locked=True)
+        ).scalars().all()
+        if events:
+            # Los confirms del lote se esperan juntos: un round-trip por lote, no por mensaje
+            results = await asyncio.gather(
+                *[exchange.publish(_message(e), routing_key=e.routing_key, timeout=OUTBOX_PUBLISH_TIMEOUT_SECONDS) for e in events],
+                return_exceptions=True,
+            )
+            confirmed = []
+            for event, result in zip(events, results):
+                if isinstance(result, BaseException):
+                    event.attempts += 1
+                    event.next_attempt_at = now + timedelta(seconds=retry_delay(event.attempts))
+                    event.last_error = str(result)[:500]
+                    OUTBOX_FAILURES.inc()
+                    continue
+                confirmed.append(event.id)
+                if event.created_at:
+                    OUTBOX_DELIVERY_DELAY.observe(max(0.0, (now - event.created_at).total_seconds()))
+            if confirmed:
+                db.execute(delete(OutboxEvent).where(OutboxEvent.id.in_(confirmed)), execution_options={"synchronize_session": False})
+                OUTBOX_PUBLISHED.inc(len(confirmed))
+            if len(confirmed) < len(events):
+                logger.warning(f"Outbox: {len(events) - len(confirmed)} eventos sin confirmar, se reintentarán")
+        db.commit()
+        _update_backlog(db)
+        return len(events)
+
+
+async def _relay_loop(stop_event: threading.Event) -> None:
+    import aio_pika
+
+    attempts = 0
+    while not stop_event.is_set():
+        connection = None
+        try:
+            connection = await aio_pika.connect(RABBITMQ_URL)
+            channel = await connection.channel(publisher_confirms=True)
+            exchange = await channel.declare_exchange(EXCHANGE_NAME, aio_pika.ExchangeType.TOPIC, durable=True)
+            attempts = 0
+            logger.info(f"Relay del outbox publicando en {EXCHANGE_NAME}")
+            while not stop_event.is_set():
+                if channel.is_closed:
+                    raise ConnectionError("canal AMQP cerrado")
+                if await relay_batch(exchange) < OUTBOX_BATCH_SIZE:
+                    await asyncio.sleep(OUTBOX_POLL_INTERVAL_SECONDS)
+        except Exception as e:
+            attempts += 1
+            logger.warning(f"Relay del outbox desconectado: {e}")
+            try:
+                with SessionLocal() as db:
+                    _update_backlog(db)
+            except Exception:
+                pass
+            stop_event.wait(retry_delay(attempts))
+        finally:
+            if connection is not None:
+                try:
+                    await connection.close()
+                except Exception:
+                    pass
+
+
+def run_outbox_relay(stop_event: threading.Event) -> None:
+    """Relay del outbox (hilo aparte con su propio event loop)"""
+    asyncio.run(_relay_loop(stop_event))
@@ -1,54 +1,188 @@
+import asyncio
 import os
-from typing import List, Dict, Any
+import threading
+from typing import Any, Dict, Iterable, List, Optional
 
 import httpx
 
 from app.models.postgres_models import Task
 from app.schemas.task_schemas import TagSummary, CategorySummary
+from app.services import catalog_cache
 
 # Base URLs de servicios centrales (con valores por defecto para entorno docker)
 TAGS_SERVICE_URL = os.getenv("TAGS_SERVICE_URL", "http://tags-service:8005")
 CATEGORIES_SERVICE_URL = os.getenv("CATEGORIES_SERVICE_URL", "http://categories-service:8006")
+EXPAND_TIMEOUT_SECONDS = float(os.getenv("EXPAND_TIMEOUT_SECONDS", "5.0"))
 
+# Cliente HTTP compartido (keep-alive); httpx.Client es seguro entre hilos del threadpool
+_client: Optional[httpx.Client] = None
+_client_lock = threading.Lock()
 
-def expand_category(category_id: int | None, user_id: int) -> Dict[str, Any] | None:
-    if not category_id:
+
+def _get_client() -> httpx.Client:
+    global _client
+    if _client is None or _client.is_closed:
+        with _client_lock:
+            if _client is None or _client.is_closed:
+                _client = httpx.Client(timeout=EXPAND_TIMEOUT_SECONDS)
+    return _client
+
+
+def close_client() -> None:
+    global _client
+    if _client is not None:
+        _client.close()
+        _client = None
+
+
+# Cliente async compartido para el stack async (TASKS_ASYNC=true)
+_async_client: Optional[httpx.AsyncClient] = None
+
+
+def _get_async_client() -> httpx.AsyncClient:
+    global _async_client
+    if _async_client is None or _async_client.is_closed:
+        _async_client = httpx.AsyncClient(timeout=EXPAND_TIMEOUT_SECONDS)
+    return _async_client
+
+
+async def aclose_async_client() -> None:
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+
+
+def _summary(item: Dict[str, Any]) -> Dict[str, Any]:
+    return {"id": str(item.get("id")), "name": item.get("name"), "color": item.get("color")}
+
+
+def _catalog_request(ids: Iterable[int], user_id: int):
+    unique = sorted({int(i) for i in ids if i})
+    if not unique:
         return None
-    url = f"{CATEGORIES_SERVICE_URL}/internal/categories"
-    headers = {"X-User-Id": str(user_id)}
-    params = {"ids": str(category_id)}
+    return {"X-User-Id": str(user_id)}, {"ids": ",".join(str(i) for i in unique)}
+
+
+def _parse_catalog(resp: httpx.Response) -> Dict[int, Dict[str, Any]]:
+    if resp.status_code != 200:
+        return {}
+    resolved: Dict[int, Dict[str, Any]] = {}
+    for item in resp.json() or []:
+        try:
+            resolved[int(item.get("id"))] = _summary(item)
+        except (TypeError, ValueError):
+            continue
+    return resolved
+
+
+def _fetch_catalog(url: str, ids: Iterable[int], user_id: int) -> Dict[int, Dict[str, Any]]:
+    """Resuelve varios ids con un único GET `?ids=1,2,3`; devuelve id -> resumen"""
+    request = _catalog_request(ids, user_id)
+    if request is None:
+        return {}
+    headers, params = request
+    try:
+        return _parse_catalog(_get_client().get(url, headers=headers, params=params))
+    except Exception:
+        return {}
+
+
+async def _fetch_catalog_async(url: str, ids: Iterable[int], user_id: int) -> Dict[int, Dict[str, Any]]:
+    request = _catalog_request(ids, user_id)
+    if request is None:
+        return {}
+    headers, params = request
+    try:
+        return _parse_catalog(await _get_async_client().get(url, headers=headers, params=params))
+    except Exception:
+        return {}
+
+
+def fetch_categories(category_ids: Iterable[int], user_id: int) -> Dict[int, Dict[str, Any]]:
+    return _fetch_catalog(f"{CATEGORIES_SERVICE_URL}/internal/categories", category_ids, user_id)
+
+
+def fetch_tags(tag_ids: Iterable[int], user_id: int) -> Dict[int, Dict[str, Any]]:
+    return _fetch_catalog(f"{TAGS_SERVICE_URL}/internal/tags", tag_ids, user_id)
+
+
+async def fetch_categories_async(category_ids: Iterable[int], user_id: int) -> Dict[int, Dict[str, Any]]:
+    return await _fetch_catalog_async(f"{CATEGORIES_SERVICE_URL}/internal/categories", category_ids, user_id)
+
+
+async def fetch_tags_async(tag_ids: Iterable[int], user_id: int) -> Dict[int, Dict[str, Any]]:
+    return await _fetch_catalog_async(f"{TAGS_SERVICE_URL}/internal/tags", tag_ids, user_id)
+
+
+def _remember_catalog(kind: str, user_id: int, resolved: Dict[int, Dict[str, Any]]) -> Dict[int, Dict[str, Any]]:
+    if resolved and catalog_cache.CATALOG_CACHE_ENABLED:
+        catalog_cache.remember(kind, user_id, resolved)
+    return resolved
+
+
+async def _list_catalog_async(kind: str, url: str, user_id: int) -> Dict[int, Dict[str, Any]]:
+    """Catálogo completo del usuario (GET sin `ids`); lo deja en memoria para expandir después"""
     try:
-        with httpx.Client(timeout=5.0) as client:
-            resp = client.get(url, headers=headers, params=params)
-            if resp.status_code != 200:
-                return None
-            data = resp.json() or []
-            if not data:
-                return None
-            cat = data[0]
-            return {"id": str(cat.get("id")), "name": cat.get("name"), "color": cat.get("color")}
+        resolved = _parse_catalog(await _get_async_client().get(url, headers={"X-User-Id": str(user_id)}))
     except Exception:
+        return {}
+    return _remember_catalog(kind, user_id, resolved)
+
+
+async def list_categories_async(user_id: int) -> Dict[int, Dict[str, Any]]:
+    return await _list_catalog_async("category", f"{CATEGORIES_SERVICE_URL}/internal/categories", user_id)
+
+
+async def list_tags_async(user_id: int) -> Dict[int, Dict[str, Any]]:
+    return await _list_catalog_async("tag", f"{TAGS_SERVICE_URL}/internal/tags", user_id)
+
+
+def resolve_categories(category_ids: Iterable[int], user_id: int) -> Dict[int, Dict[str, Any]]:
+    """Categorías vía catálogo local (read-through) o directo al servicio si está deshabilitado"""
+    if catalog_cache.CATALOG_CACHE_ENABLED:
+        return catalog_cache.resolve("category", category_ids, user_id, fetch_categories)
+    return fetch_categories(category_ids, user_id)
+
+
+def resolve_tags(tag_ids: Iterable[int], user_id: int) -> Dict[int, Dict[str, Any]]:
+    if catalog_cache.CATALOG_CACHE_ENABLED:
+        return catalog_cache.resolve("tag", tag_ids, user_id, fetch_tags)
+    return fetch_tags(tag_ids, user_id)
+
+
+async def resolve_categories_async(category_ids: Iterable[int], user_id: int) -> Dict[int, Dict[str, Any]]:
+    if catalog_cache.CATALOG_CACHE_ENABLED:
+        return await catalog_cache.resolve_async("category", category_ids, user_id, fetch_categories_async)
+    return await fetch_categories_async(category_ids, user_id)
+
+
+async def resolve_tags_async(tag_ids: Iterable[int], user_id: int) -> Dict[int, Dict[str, Any]]:
+    if catalog_cache.CATALOG_CACHE_ENABLED:
+        return await catalog_cache.resolve_async("tag", tag_ids, user_id, fetch_tags_async)
+    return await fetch_tags_async(tag_ids, user_id)
+
+
+def expand_category(category_id: int | None, user_id: int) -> Dict[str, Any] | None:
+    if not category_id:
         return None
+    return resolve_categories([category_id], user_id).get(category_id)
 
 
 def expand_tags(tag_ids: List[int], user_id: int) -> List[Dict[str, Any]]:
     if not tag_ids:
         return []
-    url = f"{TAGS_SERVICE_URL}/internal/tags"
-    headers = {"X-User-Id": str(user_id)}
-    params = {"ids": ",".join(str(i) for i in tag_ids)}
-    try:
-        with httpx.Client(timeout=5.0) as client:
-            resp = client.get(url, headers=headers, params=params)
-            if resp.status_code != 200:
-                return []
-            data = resp.json() or []
-            return [{"id": str(t.get("id")), "name": t.get("name"), "color": t.get("color")} for t in data]
-    except Exception:
-        return []
+    resolved = resolve_tags(tag_ids, user_id)
+    return [resolved[tid] for tid in tag_ids if tid in resolved]
 
 
-def serialize_task(task: Task, user_id: int) -> dict:
+def serialize_task(
+    task: Task,
+    user_id: int,
+    categories: Optional[Dict[int, Dict[str, Any]]] = None,
+    tags: Optional[Dict[int, Dict[str, Any]]] = None,
+) -> dict:
+    """Serializa una tarea; con `categories`/`tags` ya resueltos no vuelve a consultar el catálogo"""
     task_dict = {
         "id": task.id,
         "title": task.title,
@@ -62,11 +196,34 @@ def serialize_task(task: Task, user_id: int) -> dict:
         "status": "completed" if task.completed else "in_progress",
     }
     # Category expansion via Categories Service
-    task_dict["category"] = expand_category(task.category_id, user_id) if task.category_id else None
+    if categories is None:
+        categories = resolve_categories([task.category_id], user_id) if task.category_id else {}
+    task_dict["category"] = categories.get(task.category_id) if task.category_id else None
 
     # Tags expansion via Tags Service (usando task.tag_ids)
     tag_ids = task.tag_ids or []
-    tag_summaries = [TagSummary(id=str(ts["id"]), name=ts["name"], color=ts.get("color")).model_dump() for ts in expand_tags(tag_ids, user_id)]
-    task_dict["tags"] = tag_summaries
+    if tags is None:
+        tags = resolve_tags(tag_ids, user_id)
+    task_dict["tags"] = [
+        TagSummary(id=str(tags[tid]["id"]), name=tags[tid]["name"], color=tags[tid].get("color")).model_dump()
+        for tid in tag_ids
+        if tid in tags
+    ]
+
+    return task_dict
+
+
+def serialize_tasks(tasks: List[Task], user_id: int) -> List[dict]:
+    """Serializa una página resolviendo categorías y tags de todas las tareas en un solo lote"""
+    categories = resolve_categories((t.category_id for t in tasks if t.category_id), user_id)
+    tags = resolve_tags((tid for t in tasks for tid in (t.tag_ids or [])), user_id)
+    return [serialize_task(t, user_id, categories, tags) for t in tasks]
+
 
-    return task_dict
\ No newline at end of file
+async def serialize_tasks_async(tasks: List[Task], user_id: int) -> List[dict]:
+    """Como `serialize_tasks`, resolviendo categorías y tags en paralelo sin bloquear el event loop"""
+    categories, tags = await asyncio.gather(
+        resolve_categories_async((t.category_id for t in tasks if t.category_id), user_id),
+        resolve_tags_async((tid for t in tasks for tid in (t.tag_ids or [])), user_id),
+    )
+    return [serialize_task(t, user_id, categories, tags) for t in tasks]
@@ -0,0 +1,143 @@
+import os
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Set, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import delete, insert, select, update
+
+from app.models.postgres_models import Task
+from app.schemas.task_schemas import TaskBulkPatch, TaskCreate
+from app.services.task_queries import parse_category_id, parse_tag_ids, patch_values
+
+# Operaciones masivas (POST/PATCH /tasks/bulk): validación por ítem, un INSERT/UPDATE
+# multi-fila en una sola transacción y un único evento `task.bulk` con los ids afectados.
+TASKS_BULK_MAX_ITEMS = int(os.getenv("TASKS_BULK_MAX_ITEMS", "5000"))
+VALID_PRIORITIES = {"low", "medium", "high"}
+
+
+def check_size(count: int) -> None:
+    if count > TASKS_BULK_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Too many items (max {TASKS_BULK_MAX_ITEMS})")
+
+
+def result(index: int, op: str, status: int, task_id: Optional[int] = None, error: Optional[str] = None) -> dict:
+    return {"index": index, "op": op, "status": status, "id": task_id, "error": error}
+
+
+def response(results: List[dict]) -> dict:
+    succeeded = sum(1 for r in results if r["status"] < 400)
+    return {"results": results, "succeeded": succeeded, "failed": len(results) - succeeded}
+
+
+def validate_fields(title: Optional[str], priority: Optional[str]) -> Optional[str]:
+    if title is not None and not title.strip():
+        return "title must not be empty"
+    if priority is not None and priority not in VALID_PRIORITIES:
+        return f"invalid priority '{priority}'"
+    return None
+
+
+def task_row(task_in: TaskCreate, user_id: int) -> dict:
+    """Fila para el INSERT multi-fila; mismas reglas que `build_task`"""
+    return {
+        "title": task_in.title,
+        "description": task_in.description,
+        "completed": False,
+        "priority": task_in.priority,
+        "due_date": task_in.due_date,
+        "user_id": user_id,
+        "category_id": parse_category_id(task_in.category_id),
+        "tag_ids": parse_tag_ids(task_in.tag_ids) if task_in.tag_ids else None,
+    }
+
+
+def plan_creates(items: List[TaskCreate], user_id: int) -> Tuple[List[Optional[dict]], List[int], List[dict]]:
+    """(resultados con huecos para los válidos, índices válidos, filas a insertar)"""
+    results: List[Optional[dict]] = [None] * len(items)
+    pending: List[int] = []
+    rows: List[dict] = []
+    for index, item in enumerate(items):
+        error = validate_fields(item.title, item.priority)
+        if error:
+            results[index] = result(index, "create", 422, error=error)
+            continue
+        pending.append(index)
+        rows.append(task_row(item, user_id))
+    return results, pending, rows
+
+
+def insert_stmt():
+    # RETURNING en el orden de las filas enviadas (insertmanyvalues de SQLAlchemy 2.0)
+    return insert(Task).returning(Task.id, sort_by_parameter_order=True)
+
+
+def finish_creates(results: List[Optional[dict]], pending: List[int], ids: List[int]) -> List[dict]:
+    for index, task_id in zip(pending, ids):
+        results[index] = result(index, "create", 201, task_id)
+    return results
+
+
+def target_ids(body: TaskBulkPatch) -> List[int]:
+    return sorted({item.id for item in body.updates} | set(body.deletes))
+
+
+def existing_ids_stmt(user_id: int, ids: List[int]):
+    # FOR UPDATE: las filas no cambian de dueño ni desaparecen entre la comprobación y el UPDATE
+    return select(Task.id).where(Task.user_id == user_id, Task.id.in_(ids)).with_for_update()
+
+
+def plan_patch(body: TaskBulkPatch, existing: Set[int]) -> Tuple[List[dict], List[dict], List[int]]:
+    """(resultados, filas para UPDATE por clave primaria, ids a borrar)"""
+    results: List[dict] = []
+    rows: List[dict] = []
+    deletes: List[int] = []
+    now = datetime.now(timezone.utc)
+    # Un id solo puede aparecer una vez entre updates y deletes
+    seen: Dict[int, int] = {}
+    for task_id in [item.id for item in body.updates] + list(body.deletes):
+        seen[task_id] = seen.get(task_id, 0) + 1
+
+    def check(index: int, op: str, task_id: int) -> bool:
+        if seen[task_id] > 1:
+            results.append(result(index, op, 409, task_id, "id repeated in request"))
+        elif task_id not in existing:
+            results.append(result(index, op, 404, task_id, "Task not found"))
+        else:
+            return True
+        return False
+
+    for index, item in enumerate(body.updates):
+        if not check(index, "update", item.id):
+            continue
+        error = validate_fields(item.title, item.priority)
+        if error:
+            results.append(result(index, "update", 422, item.id, error))
+            continue
+        # updated_at explícito: el UPDATE masivo no aplica el onupdate del modelo
+        rows.append({"id": item.id, **patch_values(item), "updated_at": now})
+        results.append(result(index, "update", 200, item.id))
+    for index, task_id in enumerate(body.deletes):
+        if check(index, "delete", task_id):
+            deletes.append(task_id)
+            results.append(result(index, "delete", 204, task_id))
+    return results, rows, deletes
+
+
+def update_stmt():
+    # UPDATE por clave primaria con executemany (SQLAlchemy agrupa filas con las mismas columnas)
+    return update(Task)
+
+
+def delete_stmt(user_id: int, ids: List[int]):
+    return delete(Task).where(Task.user_id == user_id, Task.id.in_(ids))
+
+
+def bulk_event(user_id: int, created: List[int] = (), updated: List[int] = (), deleted: List[int] = ()) -> dict:
+    return {
+        "event_type": "bulk",
+        "entity": "task",
+        "user_id": user_id,
+        "created": list(created),
+        "updated": list(updated),
+        "deleted": list(deleted),
+    }
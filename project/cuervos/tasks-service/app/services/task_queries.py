@@ -0,0 +1,197 @@
+import base64
+import json
+import re
+from datetime import datetime
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, or_, select, tuple_
+
+from app.models.postgres_models import SEARCH_TS_CONFIG, Task
+from app.schemas.task_schemas import TaskCreate, TaskUpdate
+
+# Consultas y mapeos compartidos por los routers sync y async (mismo SQL en ambos stacks)
+
+
+def parse_category_id(value: Optional[str]) -> Optional[int]:
+    if not value or not value.strip():
+        return None
+    try:
+        return int(value)
+    except (ValueError, TypeError):
+        return None
+
+
+def parse_tag_ids(values: Iterable[str]) -> List[int]:
+    tag_ints = []
+    for tid in values:
+        try:
+            tag_ints.append(int(tid))
+        except (ValueError, TypeError):
+            continue
+    return tag_ints
+
+
+def build_task(task_in: TaskCreate, user_id: int) -> Task:
+    db_task = Task(
+        title=task_in.title,
+        description=task_in.description,
+        priority=task_in.priority,
+        due_date=task_in.due_date,
+        user_id=user_id,
+    )
+    # Category
+    category_id = parse_category_id(task_in.category_id)
+    if category_id is not None:
+        db_task.category_id = category_id
+    # Tags
+    if task_in.tag_ids:
+        db_task.tag_ids = parse_tag_ids(task_in.tag_ids)
+    return db_task
+
+
+def patch_values(patch: TaskUpdate) -> dict:
+    """Columnas a actualizar según los campos enviados en el patch"""
+    values = {}
+    for field in ("title", "description", "completed", "priority", "due_date"):
+        value = getattr(patch, field)
+        if value is not None:
+            values[field] = value
+    # Category ("" la quita)
+    if patch.category_id is not None:
+        values["category_id"] = parse_category_id(patch.category_id)
+    # Tags replace set when provided
+    if patch.tag_ids is not None:
+        values["tag_ids"] = parse_tag_ids(patch.tag_ids)
+    return values
+
+
+def apply_patch(task: Task, patch: TaskUpdate) -> None:
+    for field, value in patch_values(patch).items():
+        setattr(task, field, value)
+
+
+def count_tasks_stmt(user_id: int):
+    return select(func.count()).select_from(Task).where(Task.user_id == user_id)
+
+
+# Orden estable del listado: más recientes primero; id desempata (índice ix_tasks_user_updated_id)
+TASK_ORDER = (Task.updated_at.desc(), Task.id.desc())
+
+
+def encode_cursor(task: Task) -> str:
+    """Cursor opaco con la clave (updated_at, id) de la última tarea de la página."""
+    raw = json.dumps({"u": task.updated_at.isoformat(), "i": task.id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Lanza ValueError si el cursor no es válido."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(data["u"]), int(data["i"])
+    except (KeyError, TypeError, ValueError) as exc:
+        raise ValueError("invalid cursor") from exc
+
+
+class PageQuery:
+    """Plan de una página de GET /tasks/: keyset si hay cursor, offset si no.
+
+    Se pide una fila de más para saber si hay página siguiente sin contar. Con
+    include_total en modo offset el total viaja en la misma consulta (count(*) OVER ());
+    en modo cursor la ventana solo vería las filas posteriores, así que se cuenta aparte.
+    """
+
+    def __init__(self, user_id: int, page: int, size: int, cursor: Optional[str], include_total: bool):
+        self.user_id = user_id
+        self.page = page
+        self.size = size
+        self.after = decode_cursor(cursor) if cursor else None
+        self.include_total = include_total
+        self.windowed = include_total and self.after is None
+
+    def stmt(self):
+        columns = [Task, func.count().over().label("total")] if self.windowed else [Task]
+        stmt = select(*columns).where(Task.user_id == self.user_id)
+        if self.after is not None:
+            stmt = stmt.where(tuple_(Task.updated_at, Task.id) < tuple_(*self.after))
+        else:
+            stmt = stmt.offset((self.page - 1) * self.size)
+        return stmt.order_by(*TASK_ORDER).limit(self.size + 1)
+
+    def needs_count(self, rows) -> bool:
+        # Página fuera de rango en modo ventana: no hay filas de las que leer el total
+        return self.include_total and (not self.windowed or not rows)
+
+    def tasks(self, rows) -> List[Task]:
+        return [row[0] for row in rows[:self.size]]
+
+    def response(self, rows, items: list, total: Optional[int] = None) -> dict:
+        if self.windowed and rows:
+            total = rows[0].total
+        next_cursor = encode_cursor(rows[self.size - 1][0]) if len(rows) > self.size else None
+        pages = (total + self.size - 1) // self.size if total is not None else None
+        return {
+            "items": items,
+            "total": total,
+            "page": self.page,
+            "size": self.size,
+            "pages": pages,
+            "next_cursor": next_cursor,
+        }
+
+
+# Modos de búsqueda de texto de SearchTasks
+SEARCH_SUBSTRING = "substring"
+SEARCH_PREFIX = "prefix"
+SEARCH_FULLTEXT = "fulltext"
+
+
+def prefix_tsquery(query: str) -> Optional[str]:
+    """'informe tri' -> 'informe:* & tri:*' (solo letras/dígitos, sin operadores de tsquery)"""
+    terms = re.findall(r"[^\W_]+", query)
+    return " & ".join(f"{term}:*" for term in terms) or None
+
+
+def search_text(query: str, mode: str):
+    """(filtro, expresión de ranking o None) para el texto buscado según el modo"""
+    ts_query = None
+    if mode == SEARCH_FULLTEXT:
+        ts_query = func.websearch_to_tsquery(SEARCH_TS_CONFIG, query)
+    elif mode == SEARCH_PREFIX:
+        prefix = prefix_tsquery(query)
+        if prefix:
+            ts_query = func.to_tsquery(SEARCH_TS_CONFIG, prefix)
+    if ts_query is not None:
+        return Task.search_vector.op("@@")(ts_query), func.ts_rank(Task.search_vector, ts_query)
+    # Subcadena (o prefijo sin términos válidos): ILIKE, acelerado por los índices trigram
+    return or_(Task.title.ilike(f"%{query}%"), Task.description.ilike(f"%{query}%")), None
+
+
+def search_filters(user_id: int, query: str, category_ids: Optional[List[int]], tag_ids: Optional[List[int]],
+                   mode: str = SEARCH_SUBSTRING):
+    """(WHERE, ranking) de SearchTasks; `category_ids`/`tag_ids` ya traducidos desde nombres (None = sin filtro)"""
+    filters = [Task.user_id == user_id]
+    rank = None
+    if query:
+        text_filter, rank = search_text(query, mode)
+        filters.append(text_filter)
+    if category_ids is not None:
+        filters.append(Task.category_id.in_(category_ids))
+    if tag_ids is not None:
+        # Al menos un tag en común (operador && sobre INTEGER[])
+        filters.append(Task.tag_ids.overlap(tag_ids))
+    return filters, rank
+
+
+def search_count_stmt(filters: list):
+    return select(func.count()).select_from(Task).where(*filters)
+
+
+def search_page_stmt(filters: list, skip: int, limit: int, rank=None):
+    order = (rank.desc(), *TASK_ORDER) if rank is not None else TASK_ORDER
+    return select(Task).where(*filters).order_by(*order).offset(skip).limit(limit)
+
+
+def task_by_id_stmt(task_id: int, user_id: int):
+    return select(Task).where(Task.id == task_id, Task.user_id == user_id)